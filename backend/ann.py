@@ -0,0 +1,165 @@
+import copy
+import time
+from itertools import islice
+from typing import Dict, Optional
+
+import numpy as np
+
+# Hashed vector layout: industry, skill, interest and style buckets
+_INDUSTRY_DIMS = 16
+_SKILL_DIMS = 64
+_INTEREST_DIMS = 32
+_STYLE_DIMS = 16
+DIMENSIONS = _INDUSTRY_DIMS + _SKILL_DIMS + _INTEREST_DIMS + _STYLE_DIMS
+_SKILL_OFFSET = _INDUSTRY_DIMS
+_INTEREST_OFFSET = _SKILL_OFFSET + _SKILL_DIMS
+_STYLE_OFFSET = _INTEREST_OFFSET + _INTEREST_DIMS
+# Vocabularies of a MentorFeatureMatrix whose codes the vectors hash
+_VOCABULARIES = ('industries', 'skills', 'interests', 'styles')
+
+
+def _codes_per_entry(postings) -> np.ndarray:
+    return np.repeat(np.arange(len(postings.indptr) - 1), np.diff(postings.indptr))
+
+
+def mentor_vectors(matrix, rows: Optional[np.ndarray] = None) -> np.ndarray:
+    """Hashed profile vectors of the mentors of a MentorFeatureMatrix, or of some of its rows.
+
+    Each shared industry, skill, interest and compatible style adds roughly its weight in
+    calculate_match_score to the inner product with mentee_vector.
+    """
+    rows = np.arange(len(matrix)) if rows is None else rows
+    # Position of each matrix row among the requested ones, -1 for the others
+    position = np.full(len(matrix), -1, dtype=np.int64)
+    position[rows] = np.arange(len(rows))
+    vectors = np.zeros((len(rows), DIMENSIONS), dtype=np.float32)
+    industries = matrix.industry_codes[rows]
+    vectors[np.flatnonzero(industries >= 0), industries[industries >= 0] % _INDUSTRY_DIMS] += 0.2
+    for postings, offset, dims, weight in (
+        (matrix.skill_postings, _SKILL_OFFSET, _SKILL_DIMS, 0.05),
+        (matrix.interest_postings, _INTEREST_OFFSET, _INTEREST_DIMS, 0.05),
+    ):
+        positions = position[postings.rows]
+        kept = positions >= 0
+        np.add.at(vectors, (positions[kept], offset + _codes_per_entry(postings)[kept] % dims), weight)
+    styles = matrix.style_codes[rows]
+    vectors[np.flatnonzero(styles >= 0), _STYLE_OFFSET + styles[styles >= 0] % _STYLE_DIMS] += 0.15
+    return vectors
+
+
+def mentee_vector(query) -> np.ndarray:
+    """Query vector of a prepared mentee, see MentorFeatureMatrix._prepare"""
+    vector = np.zeros(DIMENSIONS, dtype=np.float32)
+    if query.industry_code >= 0:
+        vector[query.industry_code % _INDUSTRY_DIMS] = 1.0
+    for codes, offset, dims in (
+        (query.skill_codes, _SKILL_OFFSET, _SKILL_DIMS),
+        (query.interest_codes, _INTEREST_OFFSET, _INTEREST_DIMS),
+    ):
+        np.add.at(vector, offset + codes % dims, 1.0)
+    if query.compatible is not None:
+        np.add.at(vector, _STYLE_OFFSET + np.flatnonzero(query.compatible) % _STYLE_DIMS, 1.0)
+    return vector
+
+
+def _kmeans(vectors: np.ndarray, lists: int, iterations: int, seed: int) -> np.ndarray:
+    """Lloyd's k-means on a sample of the vectors"""
+    rng = np.random.default_rng(seed)
+    sample = vectors[rng.choice(len(vectors), min(len(vectors), lists * 64), replace=False)]
+    centroids = sample[rng.choice(len(sample), lists, replace=False)].copy()
+    for _ in range(iterations):
+        assignment = _nearest(sample, centroids)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assignment, sample)
+        counts = np.bincount(assignment, minlength=lists)
+        filled = counts > 0
+        centroids[filled] = sums[filled] / counts[filled, None]
+    return centroids
+
+
+def _nearest(vectors: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+    # argmin |v - c|^2 == argmax (v.c - |c|^2 / 2)
+    scores = vectors @ centroids.T - 0.5 * (centroids ** 2).sum(axis=1)
+    return scores.argmax(axis=1)
+
+
+class IVFIndex:
+    """Inverted-file ANN index over hashed mentor profile vectors.
+
+    Mentors are clustered with k-means; a search probes the clusters whose centroids have
+    the largest inner product with the mentee vector until ``candidates`` mentors are
+    collected. The candidates are then scored exactly by the caller. Centroids can be reused
+    across rebuilds of a pool so that only the cluster assignment is recomputed, as long as
+    the pool still ``fits`` them: vectors hash vocabulary codes, so centroids are only valid
+    while every value they were trained on keeps its code.
+    """
+
+    def __init__(self, matrix, lists: Optional[int] = None, iterations: int = 10,
+                 centroids: Optional[np.ndarray] = None, seed: int = 0,
+                 vocabularies: Optional[Dict[str, tuple]] = None):
+        started = time.perf_counter()
+        self.vectors = mentor_vectors(matrix)
+        size = len(self.vectors)
+        if centroids is None or len(centroids) > max(size, 1):
+            lists = lists or max(1, int(np.sqrt(size)))
+            lists = max(1, min(lists, size))
+            centroids = _kmeans(self.vectors, lists, iterations, seed) if size else np.zeros((1, DIMENSIONS), np.float32)
+            vocabularies = None
+        self.centroids = centroids
+        # Values in code order of the vocabularies the centroids were trained on
+        self.vocabularies = vocabularies if vocabularies is not None else {
+            name: tuple(getattr(matrix, name)) for name in _VOCABULARIES
+        }
+        assignment = _nearest(self.vectors, centroids) if size else np.zeros(0, dtype=np.int64)
+        # Empty rows of removed mentors belong to no list
+        assignment[~matrix.live] = -1
+        self._assign(assignment)
+        self.build_seconds = time.perf_counter() - started
+
+    def _assign(self, assignment: np.ndarray):
+        self.assignment = assignment
+        assigned = np.flatnonzero(assignment >= 0)
+        self.members = assigned[np.argsort(assignment[assigned], kind='stable')]
+        self.indptr = np.zeros(len(self.centroids) + 1, dtype=np.int64)
+        self.indptr[1:] = np.cumsum(np.bincount(assignment[assigned], minlength=len(self.centroids)))
+
+    def apply(self, matrix, changed: np.ndarray) -> 'IVFIndex':
+        """Index of a matrix derived with MentorFeatureMatrix.apply, assigning only the changed rows"""
+        started = time.perf_counter()
+        index = copy.copy(self)
+        index.vectors = np.zeros((len(matrix), DIMENSIONS), dtype=np.float32)
+        index.vectors[:len(self.vectors)] = self.vectors
+        assignment = np.full(len(matrix), -1, dtype=np.int64)
+        assignment[:len(self.assignment)] = self.assignment
+        changed = np.asarray(changed, dtype=np.int64)
+        index.vectors[changed] = mentor_vectors(matrix, changed)
+        live = changed[matrix.live[changed]]
+        assignment[changed] = -1
+        if len(live):
+            assignment[live] = _nearest(index.vectors[live], self.centroids)
+        index._assign(assignment)
+        index.build_seconds = time.perf_counter() - started
+        return index
+
+    def fits(self, matrix) -> bool:
+        """Whether the centroids apply to a matrix: every value trained on kept its code"""
+        return all(
+            tuple(islice(getattr(matrix, name), len(values))) == values
+            for name, values in self.vocabularies.items()
+        )
+
+    def search(self, query, candidates: int = 300) -> np.ndarray:
+        """Ascending rows of the mentors in the clusters closest to a prepared mentee"""
+        vector = mentee_vector(query)
+        order = np.argsort(-(self.centroids @ vector), kind='stable')
+        sizes = np.diff(self.indptr)[order]
+        probes = order[:int(np.searchsorted(np.cumsum(sizes), candidates)) + 1]
+        parts = [self.members[self.indptr[c]:self.indptr[c + 1]] for c in probes]
+        return np.sort(np.concatenate(parts)) if parts else np.zeros(0, dtype=np.int64)
+
+    def stats(self) -> dict:
+        return {
+            "lists": len(self.centroids),
+            "build_seconds": round(self.build_seconds, 4),
+            "memory_bytes": self.vectors.nbytes + self.centroids.nbytes + self.members.nbytes,
+        }
@@ -0,0 +1,98 @@
+import time
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+from scipy.sparse import csr_matrix
+from scipy.sparse.csgraph import min_weight_full_bipartite_matching
+
+from matching import MATCH_THRESHOLD, MentorFeatureMatrix
+
+DEFAULT_MENTOR_CAPACITY = 3
+
+
+def mentor_capacity(mentor: dict) -> int:
+    """Mentees a mentor takes at once; an unset capacity means the default, 0 means none"""
+    capacity = mentor.get("capacity")
+    return DEFAULT_MENTOR_CAPACITY if capacity is None else max(0, int(capacity))
+
+
+def solve_assignment(matrix: MentorFeatureMatrix, mentees: List[dict], capacities: Dict[str, int],
+                     candidates_per_mentee: int = 20, threshold: float = MATCH_THRESHOLD,
+                     semantic: Optional[Callable[[dict], np.ndarray]] = None, semantic_weight: float = 0.0) -> dict:
+    """Assign each mentee at most one mentor, maximizing the total match score under mentor capacities.
+
+    The score matrix is sparsified to each mentee's ``candidates_per_mentee`` best mentors
+    above the threshold, so memory grows with mentees x candidates instead of mentees x
+    mentors. Each mentor is replicated into one column per free slot of its capacity and
+    every mentee gets a private "unassigned" column, which turns the problem into a
+    min-weight full bipartite matching on a sparse graph. ``semantic`` maps a mentee to its
+    text similarities when the semantic weight is on.
+    """
+    started = time.perf_counter()
+    mentee_rows, mentor_rows, scores = [], [], []
+    pair_scores = {}
+    for i, mentee in enumerate(mentees):
+        similarity = semantic(mentee) if semantic is not None else None
+        for score, row in matrix.top_rows(mentee, candidates_per_mentee, threshold, similarity, semantic_weight):
+            mentee_rows.append(i)
+            mentor_rows.append(row)
+            scores.append(score)
+            pair_scores[i, row] = score
+    scoring_seconds = time.perf_counter() - started
+
+    started = time.perf_counter()
+    mentee_rows = np.array(mentee_rows, dtype=np.int64)
+    mentor_rows = np.array(mentor_rows, dtype=np.int64)
+    scores = np.array(scores, dtype=np.float64)
+    # Rows of removed mentors stay in the matrix until it is rebuilt and take nobody
+    slots = np.array([0 if mentor_id is None or not matrix.live[row]
+                      else max(0, int(capacities.get(mentor_id, DEFAULT_MENTOR_CAPACITY)))
+                      for row, mentor_id in enumerate(matrix.ids)], dtype=np.int64)
+    slot_start = np.concatenate([[0], np.cumsum(slots)[:-1]]) if len(slots) else np.zeros(0, dtype=np.int64)
+    total_slots = int(slots.sum())
+
+    # One edge per (mentee, mentor slot); costs stay positive so every edge is kept
+    ceiling = (scores.max() if len(scores) else 0.0) + 1.0
+    repeats = slots[mentor_rows]
+    edge_mentees = np.repeat(mentee_rows, repeats)
+    first_slot = np.repeat(slot_start[mentor_rows] - np.cumsum(repeats) + repeats, repeats)
+    edge_slots = first_slot + np.arange(len(edge_mentees))
+    edge_costs = ceiling - np.repeat(scores, repeats)
+
+    # Leaving a mentee unassigned costs as much as a zero score
+    dummy = np.arange(len(mentees))
+    graph = csr_matrix(
+        (np.concatenate([edge_costs, np.full(len(mentees), ceiling)]),
+         (np.concatenate([edge_mentees, dummy]), np.concatenate([edge_slots, total_slots + dummy]))),
+        shape=(len(mentees), total_slots + len(mentees)),
+    )
+    if len(mentees):
+        matched_mentees, matched_columns = min_weight_full_bipartite_matching(graph)
+    else:
+        matched_mentees, matched_columns = np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+    solve_seconds = time.perf_counter() - started
+
+    slot_owner = np.repeat(np.arange(len(slots)), slots)
+    assignments, unassigned = [], []
+    total_score = 0.0
+    for i, column in zip(matched_mentees, matched_columns):
+        if column >= total_slots:
+            unassigned.append(mentees[i]["id"])
+            continue
+        row = int(slot_owner[column])
+        score = pair_scores[i, row]
+        total_score += score
+        assignments.append({"mentee_id": mentees[i]["id"], "mentor_id": matrix.ids[row], "match_score": score})
+    return {
+        "assignments": assignments,
+        "unassigned": unassigned,
+        "stats": {
+            "mentees": len(mentees),
+            "mentors": len(matrix.row_of),
+            "mentor_slots": total_slots,
+            "edges": int(len(edge_costs)),
+            "total_score": round(total_score, 2),
+            "scoring_seconds": round(scoring_seconds, 3),
+            "solve_seconds": round(solve_seconds, 3),
+        },
+    }
@@ -0,0 +1,367 @@
+"""Matching benchmarks on synthetic profiles.
+
+Run from the backend directory, e.g.::
+
+    python benchmarks.py ann --mentors 200000
+    python benchmarks.py scorer
+    python benchmarks.py loop-latency --mentors 100000
+    python benchmarks.py layout --mentors 100000
+    python benchmarks.py layout --mentors 100000 --vocabulary 50000
+    python benchmarks.py cohorts --mentees 50000
+    python benchmarks.py llm-overhead
+    python benchmarks.py profile-batching --profiles 500
+"""
+import asyncio
+import json
+import random
+import time
+from typing import List
+
+import typer
+
+from matching import MentorFeatureMatrix, calculate_match_score, explain_match, match_score
+
+app = typer.Typer(help=__doc__)
+
+
+@app.callback()
+def main():
+    """Matching benchmarks on synthetic profiles"""
+
+
+INDUSTRIES = ["Technology", "Finance", "Healthcare", "Education", "Retail", "Energy", "Media", "Manufacturing",
+              "Consulting", "Government", "Telecom", "Logistics"]
+STYLES = ["collaborative", "direct", "analytical", "creative"]
+SKILL_WORDS = [f"skill{i}" for i in range(400)]
+INTEREST_WORDS = [f"interest{i}" for i in range(120)]
+
+
+def _zipf_word(rng: random.Random, prefix: str, size: int) -> str:
+    """Word of a vocabulary of ``size`` where the n-th word is about 1/n as frequent as the first"""
+    return f"{prefix}{int(size ** rng.random()) - 1}"
+
+
+def synthetic_profiles(count: int, role: str, seed: int = 0, vocabulary: int = 0) -> List[dict]:
+    """Profiles shaped like the ones created through POST /api/profiles.
+
+    By default skills come from 400 words and interests from 120. With ``vocabulary``, skills
+    and goal words are free text drawn from that many words and interests from a quarter as
+    many, with Zipf-like frequencies, as in user-entered profiles.
+    """
+    rng = random.Random(seed)
+    profiles = []
+    for i in range(count):
+        if vocabulary:
+            skills = {_zipf_word(rng, "skill", vocabulary) for _ in range(rng.randint(2, 8))}
+            goals = [" ".join(_zipf_word(rng, "skill", vocabulary) for _ in range(3)) for _ in range(rng.randint(1, 3))]
+            interests = {_zipf_word(rng, "interest", max(vocabulary // 4, 1)) for _ in range(rng.randint(1, 5))}
+        else:
+            # Skewed vocabularies, like real skills where a few are very common
+            skills = {SKILL_WORDS[min(int(rng.expovariate(1 / 60)), len(SKILL_WORDS) - 1)] for _ in range(rng.randint(2, 8))}
+            goals = [" ".join(rng.sample(SKILL_WORDS[:150], 3)) for _ in range(rng.randint(1, 3))]
+            interests = {INTEREST_WORDS[min(int(rng.expovariate(1 / 25)), len(INTEREST_WORDS) - 1)] for _ in range(rng.randint(1, 5))}
+        profiles.append({
+            "id": f"{role}-{seed}-{i}",
+            "name": f"{role.title()} {i}",
+            "role": role,
+            "current_position": "Engineer",
+            "industry": rng.choice(INDUSTRIES),
+            "experience_years": rng.randint(0, 30) if role == "mentor" else rng.randint(0, 8),
+            "skills": sorted(skills),
+            "goals": goals,
+            "bio": " ".join(rng.sample(SKILL_WORDS, 12)),
+            "interests": sorted(interests),
+            "ai_analysis": {"communication_style": rng.choice(STYLES), "mentorship_readiness": rng.randint(3, 10)},
+        })
+    return profiles
+
+
+class FakeChat:
+    """Stand-in for LlmChat answering after a fixed latency, keeping history like the real one"""
+
+    def __init__(self, session_id: str, system_message: str, latency: float = 0.05):
+        self.session_id = session_id
+        self.latency = latency
+        self.messages = [{"role": "system", "content": system_message}]
+
+    def with_model(self, provider: str, model: str):
+        return self
+
+    async def send_message(self, message) -> str:
+        self.messages.append({"role": "user", "content": message.text})
+        await asyncio.sleep(self.latency)
+        reply = json.dumps({"communication_style": "collaborative", "mentorship_readiness": 7})
+        self.messages.append({"role": "assistant", "content": reply})
+        return reply
+
+
+class FakeAnalysisChat(FakeChat):
+    """Fake model answering single and batched profile analysis prompts.
+
+    A reply takes ``latency`` plus ``per_profile`` seconds per analysis written, like output
+    tokens, and each analysis of a batch is dropped with probability ``drop_rate``.
+    """
+
+    def __init__(self, session_id: str, system_message: str, latency: float, per_profile: float,
+                 drop_rate: float, seed: int = 0):
+        super().__init__(session_id, system_message, latency)
+        self.per_profile = per_profile
+        self.drop_rate = drop_rate
+        self.rng = random.Random(seed)
+
+    async def send_message(self, message) -> str:
+        analysis = {"communication_style": "collaborative", "mentorship_readiness": 7, "skill_strengths": [],
+                    "growth_areas": [], "career_stage": "mid-level", "personality_traits": []}
+        count = message.text.count("### Profile ")
+        await asyncio.sleep(self.latency + self.per_profile * max(count, 1))
+        if not count:
+            return json.dumps(analysis)
+        return json.dumps({str(i): analysis for i in range(1, count + 1) if self.rng.random() >= self.drop_rate})
+
+
+class FakeMessage:
+    def __init__(self, text: str):
+        self.text = text
+
+
+def _timed(fn, *args, **kwargs):
+    started = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return result, time.perf_counter() - started
+
+
+@app.command()
+def ann(mentors: int = 100000, mentees: int = 200, k: int = 10, lists: str = "100,316,1000",
+        candidates: str = "100,300,1000,3000"):
+    """Recall@k and latency of IVF retrieval against exhaustive scoring"""
+    from ann import IVFIndex
+
+    matrix = MentorFeatureMatrix(synthetic_profiles(mentors, "mentor"))
+    queries = synthetic_profiles(mentees, "mentee", seed=1)
+    exact, exact_seconds = _timed(lambda: [
+        [m["id"] for m, _, _ in matrix.top_matches(q, k, prune=False)] for q in queries])
+    print(f"exhaustive: {exact_seconds / mentees * 1000:.2f} ms/query")
+    print(f"{'lists':>6} {'cands':>6} {'recall@' + str(k):>10} {'ms/query':>9} {'build s':>8}")
+    for list_count in (int(x) for x in lists.split(",")):
+        index = IVFIndex(matrix, lists=list_count)
+        for candidate_count in (int(x) for x in candidates.split(",")):
+            found, seconds = _timed(lambda: [
+                [m["id"] for m, _, _ in matrix.top_matches(q, k, ann=index, ann_candidates=candidate_count)]
+                for q in queries])
+            hits = sum(len(set(a) & set(b)) for a, b in zip(found, exact))
+            total = sum(len(b) for b in exact) or 1
+            print(f"{list_count:>6} {candidate_count:>6} {hits / total:>10.3f} "
+                  f"{seconds / mentees * 1000:>9.2f} {index.build_seconds:>8.2f}")
+
+
+@app.command()
+def scorer(mentors: int = 20000, mentees: int = 20, k: int = 10):
+    """Per-mentor cost of scoring with reasons against score-only scoring plus top-k reasons"""
+    pool = synthetic_profiles(mentors, "mentor")
+    queries = synthetic_profiles(mentees, "mentee", seed=1)
+
+    def with_reasons(mentee):
+        scored = [(calculate_match_score(mentor, mentee), mentor) for mentor in pool]
+        return sorted(((score, reasons) for (score, reasons), _ in scored if score > 0.3),
+                      key=lambda x: x[0], reverse=True)[:k]
+
+    def score_only(mentee):
+        scored = [(match_score(mentor, mentee), mentor) for mentor in pool]
+        top = sorted((x for x in scored if x[0] > 0.3), key=lambda x: x[0], reverse=True)[:k]
+        return [(score, explain_match(mentor, mentee)) for score, mentor in top]
+
+    pairs = mentors * mentees
+    before, before_seconds = _timed(lambda: [with_reasons(q) for q in queries])
+    after, after_seconds = _timed(lambda: [score_only(q) for q in queries])
+    assert before == after
+    print(f"{'scorer':>24} {'us/mentor':>10}")
+    print(f"{'calculate_match_score':>24} {before_seconds / pairs * 1e6:>10.2f}")
+    print(f"{'match_score + top-k':>24} {after_seconds / pairs * 1e6:>10.2f}")
+
+
+@app.command("loop-latency")
+def loop_latency(mentors: int = 100000, requests: int = 64, concurrency: int = 8, k: int = 10,
+                 modes: str = "inline,thread,process", workers: int = 4):
+    """Event-loop lag while concurrent match requests run inline or on a worker pool"""
+    from match_executor import LoopLagMonitor, MatchExecutor, init_matrix_worker, worker_top_rows
+
+    matrix = MentorFeatureMatrix(synthetic_profiles(mentors, "mentor"))
+    queries = synthetic_profiles(requests, "mentee", seed=1)
+
+    async def run(mode: str) -> dict:
+        executor = MatchExecutor(mode, workers=workers, max_queue=requests)
+        if executor.uses_processes:
+            executor.configure(0, init_matrix_worker, (matrix,))
+            await executor.run(worker_top_rows, queries[0], k, 0.3, None, 0.0)
+        monitor = LoopLagMonitor(interval=0.005)
+        monitor.start()
+        gate = asyncio.Semaphore(concurrency)
+
+        async def request(mentee):
+            async with gate:
+                if executor.uses_processes:
+                    return await executor.run(worker_top_rows, mentee, k, 0.3, None, 0.0)
+                return await executor.run(matrix.top_rows, mentee, k)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(request(q) for q in queries))
+        elapsed = time.perf_counter() - started
+        await monitor.stop()
+        executor.shutdown()
+        return {"requests_per_second": requests / elapsed, **monitor.stats()}
+
+    print(f"{'mode':>8} {'req/s':>8} {'lag p50':>8} {'lag p99':>8} {'lag max':>8}")
+    for mode in modes.split(","):
+        result = asyncio.run(run(mode))
+        print(f"{mode:>8} {result['requests_per_second']:>8.1f} {result['p50_ms']:>8.2f} "
+              f"{result['p99_ms']:>8.2f} {result['max_ms']:>8.2f}")
+
+
+@app.command()
+def layout(mentors: int = 100000, mentees: int = 20, sample: int = 5000, vocabulary: int = 0):
+    """Memory per mentor and scoring throughput of profile dicts against the encoded columns.
+
+    ``--vocabulary 50000`` draws free-text skills from a Zipf-like vocabulary far larger than
+    the bitsets cover, so the bitset path mixes popcounts with postings lookups.
+    """
+    import numpy as np
+
+    from match_cache import _sizeof
+
+    profiles = synthetic_profiles(mentors, "mentor", vocabulary=vocabulary)
+    queries = synthetic_profiles(mentees, "mentee", seed=1, vocabulary=vocabulary)
+    matrix, build_seconds = _timed(MentorFeatureMatrix, profiles)
+    rows = np.sort(np.random.default_rng(0).choice(mentors, min(sample, mentors), replace=False))
+    print(f"dict profiles: {sum(_sizeof(p) for p in profiles) / mentors:>8.0f} bytes/mentor")
+    print(f"columns:       {matrix.memory_bytes() / mentors:>8.0f} bytes/mentor (built in {build_seconds:.2f}s)")
+    for name, postings, bitsets in (("skills", matrix.skill_postings, matrix.skill_bits),
+                                    ("interests", matrix.interest_postings, matrix.interest_bits)):
+        entries = np.diff(postings.indptr)
+        covered = entries[bitsets.slots >= 0].sum() / max(entries.sum(), 1)
+        print(f"{name:>9}: {len(entries):>7} codes, {int((bitsets.slots >= 0).sum()):>5} with bits "
+              f"covering {covered:.1%} of mentor entries")
+
+    _, seconds = _timed(lambda: [[match_score(profiles[row], q) for row in rows] for q in queries])
+    print(f"{'dicts, match_score':>28} {len(rows) * mentees / seconds:>12,.0f} pairs/s")
+    _, seconds = _timed(lambda: [matrix.score(q) for q in queries])
+    print(f"{'columns, postings, all rows':>28} {mentors * mentees / seconds:>12,.0f} pairs/s")
+    sampled, seconds = _timed(lambda: [matrix._score_rows(matrix._prepare(q), rows, None, 0.0) for q in queries])
+    print(f"{'columns, bitsets, sample':>28} {len(rows) * mentees / seconds:>12,.0f} pairs/s")
+    bits, matrix.skill_bits, matrix.interest_bits = (matrix.skill_bits, matrix.interest_bits), None, None
+    postings_only, seconds = _timed(lambda: [matrix._score_rows(matrix._prepare(q), rows, None, 0.0) for q in queries])
+    matrix.skill_bits, matrix.interest_bits = bits
+    print(f"{'columns, postings, sample':>28} {len(rows) * mentees / seconds:>12,.0f} pairs/s")
+    assert all((a == b).all() for a, b in zip(sampled, postings_only))
+    assert all(score == match_score(profiles[row], q) for q, scores in zip(queries[:5], sampled)
+               for row, score in zip(rows, scores))
+
+
+@app.command()
+def cohorts(mentees: int = 50000, mentors: int = 5000, size: int = 8, text_weight: float = 0.2,
+            candidates: int = 3):
+    """Runtime and quality of cohort building"""
+    from cohorts import build_cohorts
+
+    result = build_cohorts(synthetic_profiles(mentees, "mentee", seed=1), synthetic_profiles(mentors, "mentor"),
+                           cohort_size=size, text_weight=text_weight, mentor_candidates=candidates)
+    for name, value in {**result["quality"], **result["timings"]}.items():
+        print(f"{name:>28} {value}")
+
+
+@app.command("llm-overhead")
+def llm_overhead(calls: int = 2000, concurrency: int = 32, pool: int = 8, latency: float = 0.01):
+    """Per-call cost of the pooled LLM client and its cache around a fake model"""
+    from llm_cache import LlmResponseCache
+    from llm_client import LlmClient
+
+    async def run() -> None:
+        chats = []
+
+        def create_chat(session_id, system):
+            chats.append(FakeChat(session_id, system, latency))
+            return chats[-1]
+
+        client = LlmClient(create_chat, "system", "fake", "fake", size=pool)
+        await client.start()
+        gate = asyncio.Semaphore(pool)
+
+        async def fresh_chat():
+            async with gate:
+                chat = FakeChat(f"s{time.time()}", "system", latency).with_model("fake", "fake")
+                await chat.send_message(FakeMessage("hello"))
+
+        async def pooled():
+            await client.send(FakeMessage("hello"))
+
+        for name, call in (("new chat per call", fresh_chat), ("pooled client", pooled)):
+            started = time.perf_counter()
+            for start in range(0, calls, concurrency):
+                await asyncio.gather(*(call() for _ in range(min(concurrency, calls - start))))
+            seconds = time.perf_counter() - started
+            print(f"{name:>18} {calls / seconds:>8.0f} calls/s")
+        stats = client.stats()
+        print(f"{'pool overhead':>18} {stats['mean_overhead_us']:>8.1f} us/call (model {stats['mean_model_ms']:.2f} ms)")
+        # The pool kept its chats, and each went back with only its system message
+        assert len(chats) == pool and all(len(chat.messages) == 1 for chat in chats)
+
+        client.cache = LlmResponseCache(ttls={"bench": 60})
+        await client.send(FakeMessage("hello"), site="bench")
+        started = time.perf_counter()
+        for _ in range(calls):
+            await client.send(FakeMessage("hello"), site="bench")
+        print(f"{'cache hit':>18} {(time.perf_counter() - started) / calls * 1e6:>8.1f} us/call")
+
+    asyncio.run(run())
+
+
+@app.command("profile-batching")
+def profile_batching(profiles: int = 500, batch_sizes: str = "1,4,16,32", pool: int = 8, latency: float = 0.5,
+                     per_profile: float = 0.02, drop_rate: float = 0.02):
+    """Profiles analyzed per minute with micro-batching against a fake LLM.
+
+    Every profile is then analyzed a second time, which the per-profile analysis cache
+    answers without a model call, batched or not.
+    """
+    from llm_cache import LlmResponseCache
+    from llm_client import LlmClient
+    from profile_batcher import ProfileAnalysisBatcher
+
+    queries = synthetic_profiles(profiles, "mentee")
+
+    def describe(profile: dict) -> str:
+        return f"Name: {profile['name']}\nSkills: {', '.join(profile['skills'])}\nBio: {profile['bio']}"
+
+    async def run(batch_size: int) -> dict:
+        client = LlmClient(lambda session_id, system: FakeAnalysisChat(session_id, system, latency, per_profile, drop_rate),
+                           "system", "fake", "fake", size=pool, cache=LlmResponseCache(ttls={"profile_analysis": 3600}))
+
+        async def analyze_one(profile: dict) -> dict:
+            return json.loads(await client.send(FakeMessage(describe(profile)), site="profile_analysis"))
+
+        async def send(prompt: str) -> str:
+            return await client.send(FakeMessage(prompt))
+
+        async def lookup(profile: dict):
+            cached = await client.cached(describe(profile), "profile_analysis")
+            return None if cached is None else json.loads(cached)
+
+        async def store(profile: dict, analysis: dict):
+            await client.remember(describe(profile), json.dumps(analysis), "profile_analysis")
+
+        batcher = ProfileAnalysisBatcher(send, describe, analyze_one, max_batch=batch_size, lookup=lookup, store=store)
+        started = time.perf_counter()
+        results = await asyncio.gather(*(batcher.analyze(profile) for profile in queries))
+        seconds = time.perf_counter() - started
+        assert all(result["communication_style"] for result in results)
+        calls = client.calls
+        await asyncio.gather(*(batcher.analyze(profile) for profile in queries))
+        return {"seconds": seconds, "calls": calls, "fallbacks": batcher.fallbacks, "repeat_calls": client.calls - calls}
+
+    print(f"{'batch':>6} {'profiles/min':>13} {'llm calls':>10} {'fallbacks':>10} {'repeat calls':>13}")
+    for batch_size in (int(x) for x in batch_sizes.split(",")):
+        report = asyncio.run(run(batch_size))
+        print(f"{batch_size:>6} {profiles / report['seconds'] * 60:>13,.0f} {report['calls']:>10} {report['fallbacks']:>10}"
+              f" {report['repeat_calls']:>13}")
+
+if __name__ == "__main__":
+    app()
@@ -0,0 +1,300 @@
+import time
+import zlib
+from typing import Dict, List, Optional
+
+import numpy as np
+from scipy import sparse
+from sklearn.cluster import MiniBatchKMeans
+from sklearn.decomposition import TruncatedSVD
+from sklearn.feature_extraction.text import TfidfVectorizer
+
+from matching import COMPATIBLE_STYLES, match_score
+from semantic import profile_text
+
+# Hashed mentee feature layout: industry, goal word, interest and style buckets, then
+# experience and readiness, weighted like their parts of calculate_match_score
+_INDUSTRY_DIMS = 16
+_WORD_DIMS = 64
+_INTEREST_DIMS = 32
+_STYLE_DIMS = 8
+_WORD_OFFSET = _INDUSTRY_DIMS
+_INTEREST_OFFSET = _WORD_OFFSET + _WORD_DIMS
+_STYLE_OFFSET = _INTEREST_OFFSET + _INTEREST_DIMS
+_EXPERIENCE = _STYLE_OFFSET + _STYLE_DIMS
+_READINESS = _EXPERIENCE + 1
+PROFILE_DIMENSIONS = _READINESS + 1
+
+
+def _bucket(value, dims: int) -> int:
+    return zlib.crc32(str(value).encode()) % dims
+
+
+def mentee_features(mentees: List[dict]) -> np.ndarray:
+    """Hashed vectors of the mentee fields calculate_match_score reads"""
+    vectors = np.zeros((len(mentees), PROFILE_DIMENSIONS), dtype=np.float32)
+    for row, mentee in enumerate(mentees):
+        if mentee.get('industry') is not None:
+            vectors[row, _bucket(mentee.get('industry'), _INDUSTRY_DIMS)] = 0.2
+        words = set()
+        for goal in mentee.get('goals') or []:
+            words.update(str(goal).lower().split())
+        for word in words:
+            vectors[row, _WORD_OFFSET + _bucket(word, _WORD_DIMS)] += 0.05
+        for interest in set(map(str, mentee.get('interests') or [])):
+            vectors[row, _INTEREST_OFFSET + _bucket(interest, _INTEREST_DIMS)] += 0.05
+        analysis = mentee.get('ai_analysis') or {}
+        if not isinstance(analysis, dict):
+            analysis = {}
+        if analysis.get('communication_style'):
+            vectors[row, _STYLE_OFFSET + _bucket(analysis['communication_style'], _STYLE_DIMS)] = 0.15
+        experience = mentee.get('experience_years', 0)
+        readiness = analysis.get('mentorship_readiness', 5)
+        vectors[row, _EXPERIENCE] = 0.15 * min(experience, 30) / 30 if isinstance(experience, (int, float)) else 0.0
+        vectors[row, _READINESS] = 0.1 * readiness / 10 if isinstance(readiness, (int, float)) else 0.05
+    return vectors
+
+
+def text_features(mentees: List[dict], vectorizer: Optional[TfidfVectorizer] = None,
+                  components: int = 32, seed: int = 0) -> np.ndarray:
+    """Unit-length TF-IDF vectors of the mentee texts reduced to ``components`` dimensions.
+
+    ``vectorizer`` is the fitted one of the semantic index, so that the text dimensions are
+    those mentors are matched on; without it one is fitted on the mentees.
+    """
+    texts = [profile_text(mentee) for mentee in mentees]
+    try:
+        tfidf = vectorizer.transform(texts) if vectorizer is not None else \
+            TfidfVectorizer(stop_words='english', sublinear_tf=True, dtype=np.float32).fit_transform(texts)
+    except ValueError:
+        return np.zeros((len(mentees), 0), dtype=np.float32)
+    components = min(components, tfidf.shape[1] - 1, len(mentees) - 1)
+    if components < 1:
+        return np.zeros((len(mentees), 0), dtype=np.float32)
+    reduced = TruncatedSVD(components, random_state=seed).fit_transform(tfidf).astype(np.float32)
+    norms = np.linalg.norm(reduced, axis=1, keepdims=True)
+    return reduced / np.where(norms > 0, norms, 1.0)
+
+
+def balanced_assign(vectors: np.ndarray, centroids: np.ndarray, capacities: np.ndarray,
+                    nearest: int = 8, chunk: int = 4096) -> np.ndarray:
+    """Cluster of each vector, filling no cluster beyond its capacity.
+
+    The ``nearest`` closest centroids of every vector are found in chunks. In each round
+    every unassigned vector proposes to its closest cluster not yet tried, and each cluster
+    accepts its closest proposals up to the room it has left. The few vectors whose nearest
+    clusters all filled up go to the closest cluster with room left.
+    """
+    count, clusters = len(vectors), len(centroids)
+    nearest = min(nearest, clusters)
+    half_norms = 0.5 * (centroids ** 2).sum(axis=1)
+    candidates = np.empty((count, nearest), dtype=np.int64)
+    distances = np.empty((count, nearest), dtype=np.float32)
+    for start in range(0, count, chunk):
+        # argmin |v - c|^2 == argmin (|c|^2 / 2 - v.c)
+        block = half_norms - vectors[start:start + chunk] @ centroids.T
+        top = np.argpartition(block, nearest - 1, axis=1)[:, :nearest]
+        block = np.take_along_axis(block, top, axis=1)
+        order = np.argsort(block, axis=1)
+        candidates[start:start + chunk] = np.take_along_axis(top, order, axis=1)
+        distances[start:start + chunk] = np.take_along_axis(block, order, axis=1)
+
+    labels = np.full(count, -1, dtype=np.int64)
+    room = capacities.astype(np.int64).copy()
+    tried = np.zeros(count, dtype=np.int64)
+    for _ in range(nearest):
+        rows = np.flatnonzero((labels < 0) & (tried < nearest))
+        if not len(rows):
+            break
+        proposed = candidates[rows, tried[rows]]
+        order = np.lexsort((distances[rows, tried[rows]], proposed))
+        rows, proposed = rows[order], proposed[order]
+        # Position of each proposal among those to the same cluster, closest first
+        rank = np.arange(len(rows)) - np.searchsorted(proposed, proposed)
+        accepted = rank < room[proposed]
+        labels[rows[accepted]] = proposed[accepted]
+        room -= np.bincount(proposed[accepted], minlength=clusters)
+        tried[rows[~accepted]] += 1
+    for row in np.flatnonzero(labels < 0):
+        open_clusters = np.flatnonzero(room > 0)
+        cluster = open_clusters[np.argmin(half_norms[open_clusters] - centroids[open_clusters] @ vectors[row])]
+        labels[row] = cluster
+        room[cluster] -= 1
+    return labels
+
+
+def _cluster_sums(vectors: np.ndarray, labels: np.ndarray, clusters: int) -> np.ndarray:
+    """Per-cluster sums of the vectors, as one sparse one-hot product"""
+    one_hot = sparse.csr_matrix((np.ones(len(labels), dtype=vectors.dtype), (labels, np.arange(len(labels)))),
+                                shape=(clusters, len(labels)))
+    return np.asarray(one_hot @ vectors)
+
+
+def _kmeans(vectors: np.ndarray, clusters: int, iterations: int = 20, seed: int = 0) -> np.ndarray:
+    """Lloyd's k-means from randomly chosen vectors; empty clusters keep their centroid"""
+    rng = np.random.default_rng(seed)
+    centroids = vectors[rng.choice(len(vectors), clusters, replace=False)].copy()
+    for _ in range(iterations):
+        assignment = (vectors @ centroids.T - 0.5 * (centroids ** 2).sum(axis=1)).argmax(axis=1)
+        counts = np.bincount(assignment, minlength=clusters)
+        filled = counts > 0
+        centroids[filled] = _cluster_sums(vectors, assignment, clusters)[filled] / counts[filled, None]
+    return centroids
+
+
+def balanced_kmeans(vectors: np.ndarray, capacities: np.ndarray, leaf: int = 256, seed: int = 0) -> np.ndarray:
+    """Cluster labels with exactly ``capacities[c]`` vectors in cluster ``c``.
+
+    Up to ``leaf`` clusters are found with k-means and filled with balanced_assign. More
+    clusters are built top-down: mini-batch k-means first splits the vectors into groups of
+    about ``leaf`` clusters each, sized for a consecutive range of the capacities, and every
+    group is clustered on its own, so k-means never runs with thousands of centroids.
+    """
+    clusters = len(capacities)
+    if clusters == 1:
+        return np.zeros(len(vectors), dtype=np.int64)
+    if clusters <= leaf:
+        return balanced_assign(vectors, _kmeans(vectors, clusters, iterations=20, seed=seed), capacities)
+    groups = -(-clusters // leaf)
+    kmeans = MiniBatchKMeans(groups, batch_size=4096, n_init=1, random_state=seed).fit(vectors)
+    ranges = np.array_split(np.arange(clusters), groups)
+    group_labels = balanced_assign(vectors, kmeans.cluster_centers_.astype(np.float32),
+                                   np.array([capacities[r].sum() for r in ranges]))
+    labels = np.empty(len(vectors), dtype=np.int64)
+    for group, cluster_range in enumerate(ranges):
+        rows = np.flatnonzero(group_labels == group)
+        labels[rows] = cluster_range[0] + balanced_kmeans(vectors[rows], capacities[cluster_range], leaf, seed)
+    return labels
+
+
+def mentor_affinity_vectors(mentors: List[dict]) -> np.ndarray:
+    """Mentor vectors whose inner product with mentee_features approximates the match score.
+
+    Industry, skills against goal words, interests and compatible styles are covered; the
+    experience gap and readiness are left to the exact rescoring of the candidates.
+    """
+    vectors = np.zeros((len(mentors), PROFILE_DIMENSIONS), dtype=np.float32)
+    for row, mentor in enumerate(mentors):
+        if mentor.get('industry') is not None:
+            vectors[row, _bucket(mentor.get('industry'), _INDUSTRY_DIMS)] = 1.0
+        # One shared skill scores 0.2 and one shared interest 1/3 of 0.15 weight
+        for skill in set(map(str, mentor.get('skills') or [])):
+            vectors[row, _WORD_OFFSET + _bucket(skill, _WORD_DIMS)] = 4.0
+        for interest in set(map(str, mentor.get('interests') or [])):
+            vectors[row, _INTEREST_OFFSET + _bucket(interest, _INTEREST_DIMS)] = 1.0
+        analysis = mentor.get('ai_analysis') or {}
+        style = analysis.get('communication_style') if isinstance(analysis, dict) else None
+        for compatible in COMPATIBLE_STYLES.get(style, []) if isinstance(style, str) else []:
+            if compatible:
+                vectors[row, _STYLE_OFFSET + _bucket(compatible, _STYLE_DIMS)] = 1.0
+    return vectors
+
+
+def _top_mentors(centroids: np.ndarray, mentor_vectors: np.ndarray, candidates: int,
+                 chunk: int = 1024) -> np.ndarray:
+    """The ``candidates`` mentors with the largest affinity to each cohort centroid"""
+    candidates = min(candidates, len(mentor_vectors))
+    top = np.empty((len(centroids), candidates), dtype=np.int64)
+    for start in range(0, len(centroids), chunk):
+        affinity = centroids[start:start + chunk] @ mentor_vectors.T
+        top[start:start + chunk] = np.argpartition(-affinity, candidates - 1, axis=1)[:, :candidates]
+    return top
+
+
+def _mean_distance(vectors: np.ndarray, labels: np.ndarray, clusters: int) -> float:
+    """Mean distance of the vectors to the mean of their cluster"""
+    counts = np.bincount(labels, minlength=clusters).astype(np.float32)
+    means = _cluster_sums(vectors, labels, clusters) / np.maximum(counts, 1)[:, None]
+    return float(np.linalg.norm(vectors - means[labels], axis=1).mean())
+
+
+def build_cohorts(mentees: List[dict], mentors: List[dict], cohort_size: int = 8, text_weight: float = 0.2,
+                  vectorizer: Optional[TfidfVectorizer] = None, mentor_candidates: int = 3,
+                  cohorts_per_mentor: int = 1, seed: int = 0) -> dict:
+    """Group mentees into cohorts of at most ``cohort_size`` and give every cohort a mentor.
+
+    Mentees are embedded with their scoring features and their TF-IDF text (weighted by
+    ``text_weight``) and split by balanced_kmeans into ceil(n / cohort_size) cohorts whose
+    sizes differ by at most one. The ``mentor_candidates`` mentors closest to each cohort
+    centroid are rescored exactly against every member, and cohorts take the mentor with the
+    best mean score, greedily from the best pair, each mentor leading at most
+    ``cohorts_per_mentor`` cohorts. Cohorts are left without a mentor once every mentor is
+    taken.
+    """
+    timings = {}
+    started = time.perf_counter()
+    count = len(mentees)
+    if count == 0:
+        return {"cohorts": [], "quality": {}, "timings": {}}
+
+    vectors = mentee_features(mentees)
+    if text_weight > 0:
+        vectors = np.hstack([vectors, text_weight * text_features(mentees, vectorizer, seed=seed)])
+    timings["features_seconds"] = time.perf_counter() - started
+
+    # Clustering (balanced mini-batch k-means)
+    step = time.perf_counter()
+    clusters = -(-count // cohort_size)
+    capacities = np.full(clusters, count // clusters, dtype=np.int64)
+    capacities[:count % clusters] += 1
+    labels = balanced_kmeans(vectors, capacities, seed=seed)
+    timings["clustering_seconds"] = time.perf_counter() - step
+
+    # Mentor per cohort
+    step = time.perf_counter()
+    members = [[] for _ in range(clusters)]
+    for row, label in enumerate(labels):
+        members[label].append(row)
+    sizes = np.bincount(labels, minlength=clusters)
+    # Cohort centroids in the profile dimensions are the mean mentee vectors of the members
+    centroids = _cluster_sums(vectors[:, :PROFILE_DIMENSIONS], labels, clusters) / sizes[:, None]
+    affinity_vectors = mentor_affinity_vectors(mentors)
+    room = np.full(len(mentors), cohorts_per_mentor, dtype=np.int64)
+    mentor_of: Dict[int, tuple] = {}
+    remaining = np.arange(clusters)
+    # Cohorts whose candidates were all taken by better pairs retry with the mentors left
+    while len(remaining) and room.any():
+        open_mentors = np.flatnonzero(room > 0)
+        top = _top_mentors(centroids[remaining], affinity_vectors[open_mentors], mentor_candidates)
+        pairs = []
+        for cluster, candidates in zip(remaining, open_mentors[top]):
+            rows = members[cluster]
+            for mentor in candidates:
+                mean = sum(match_score(mentors[mentor], mentees[row]) for row in rows) / len(rows)
+                pairs.append((-mean, int(cluster), int(mentor)))
+        pairs.sort()
+        for negative_mean, cluster, mentor in pairs:
+            if cluster not in mentor_of and room[mentor] > 0:
+                mentor_of[cluster] = (mentor, -negative_mean)
+                room[mentor] -= 1
+        remaining = np.array([cluster for cluster in remaining if cluster not in mentor_of], dtype=np.int64)
+    timings["mentor_seconds"] = time.perf_counter() - step
+
+    cohorts = []
+    for cluster, rows in enumerate(members):
+        mentor, mean = mentor_of.get(cluster, (None, None))
+        cohorts.append({
+            "mentee_ids": [mentees[row]["id"] for row in rows],
+            "mentor_id": mentors[mentor]["id"] if mentor is not None else None,
+            "mean_match_score": round(mean, 4) if mean is not None else None,
+        })
+
+    # Quality: spread within cohorts against a random partition of the same sizes
+    spread = _mean_distance(vectors, labels, clusters)
+    baseline = _mean_distance(vectors, np.random.default_rng(seed).permutation(labels), clusters)
+    scored = [cohort["mean_match_score"] for cohort in cohorts if cohort["mentor_id"] is not None]
+    quality: Dict[str, object] = {
+        "cohorts": clusters,
+        "min_size": int(sizes.min()),
+        "max_size": int(sizes.max()),
+        "mean_distance_to_centroid": round(spread, 4),
+        "random_partition_distance": round(baseline, 4),
+        "spread_reduction": round(1 - spread / baseline, 4) if baseline else 0.0,
+        "cohorts_with_mentor": len(scored),
+        "mean_mentor_score": round(float(np.mean(scored)), 4) if scored else None,
+    }
+    timings["total_seconds"] = time.perf_counter() - started
+    return {
+        "cohorts": cohorts,
+        "quality": quality,
+        "timings": {name: round(seconds, 3) for name, seconds in timings.items()},
+    }
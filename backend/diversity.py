@@ -0,0 +1,39 @@
+from typing import List, Sequence
+
+import numpy as np
+
+from ann import mentor_vectors
+from matching import MentorFeatureMatrix
+
+
+def feature_vectors(mentors: Sequence[dict]) -> np.ndarray:
+    """Unit-length hashed profile vectors of the mentors, see ann.mentor_vectors"""
+    vectors = mentor_vectors(MentorFeatureMatrix(list(mentors)))
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.where(norms > 0, norms, 1.0)
+
+
+def mmr_order(relevance: np.ndarray, vectors: np.ndarray, k: int, lam: float) -> List[int]:
+    """Indices of ``k`` items picked by maximal marginal relevance.
+
+    Each pick maximizes ``lam * relevance - (1 - lam) * max similarity to the picks so far``;
+    the running maximum is updated with one vectorized column of the similarity matrix per
+    pick. ``lam = 1`` keeps the relevance order.
+    """
+    count = len(relevance)
+    k = min(k, count)
+    if k == 0:
+        return []
+    similarity = vectors @ vectors.T
+    closest = np.zeros(count, dtype=np.float64)
+    available = np.ones(count, dtype=bool)
+    picks = []
+    for _ in range(k):
+        gain = lam * relevance - (1 - lam) * closest
+        gain[~available] = -np.inf
+        # argmax returns the first maximum, so ties keep the relevance order
+        pick = int(np.argmax(gain))
+        picks.append(pick)
+        available[pick] = False
+        np.maximum(closest, similarity[:, pick], out=closest)
+    return picks
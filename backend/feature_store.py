@@ -0,0 +1,605 @@
+import asyncio
+import logging
+import time
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+from pymongo.errors import OperationFailure, PyMongoError
+
+from ann import IVFIndex
+from diversity import feature_vectors, mmr_order
+from match_executor import MatchExecutor, init_matrix_worker, worker_top_rows
+from matching import MATCH_THRESHOLD, MentorFeatureMatrix, explain_match
+from sharding import ShardedMatcher
+from snapshot import FeatureSnapshots
+
+# Fields the matcher reads from a mentor profile, for scoring and for the match listing
+MENTOR_FIELDS = [
+    "id", "name", "role", "current_position", "industry", "experience_years", "skills", "interests",
+    "ai_analysis.communication_style", "ai_analysis.mentorship_readiness", "capacity",
+]
+# Extra fields needed to build the semantic text of a mentor
+SEMANTIC_FIELDS = ["bio", "goals"]
+
+# Error code returned by servers that do not support change streams (standalone mongod)
+CHANGE_STREAMS_UNSUPPORTED = 40573
+
+
+class Matches(list):
+    """(mentor, score, reasons) results of MentorFeatureStore.top_matches.
+
+    ``version`` is the version of the mentor pool they were ranked on; it trails the store's
+    ``version`` when process workers still held an older pool.
+    """
+
+    def __init__(self, items=(), version: Optional[int] = None):
+        super().__init__(items)
+        self.version = version
+
+
+class MentorFeatureStore:
+    """Process-local mentor features kept fresh from user_profiles.
+
+    Compact mentor documents are loaded once at startup, then inserts, updates and deletes are
+    applied from a change stream on user_profiles. When change streams are unavailable (a
+    standalone mongod) the collection is polled every ``poll_interval`` seconds instead.
+    Matching is served from memory without reading candidates from the database.
+
+    Pools of at least ``ann_min_mentors`` mentors (0 disables it) are searched through an IVF
+    index that retrieves about ``ann_candidates`` mentors to score exactly; see
+    ``python benchmarks.py ann`` for choosing these values.
+
+    Changes reach the matrix and the IVF index as per-row deltas on the next match. Full
+    builds (the initial load, compacting the rows of removed mentors, retraining the IVF
+    centroids) run in a thread and are swapped in with the changes made meanwhile. Process
+    workers get the changed pool at most every ``reconfigure_interval`` seconds, and the
+    semantic index is saved at most every ``semantic_save_interval`` seconds.
+
+    Change streams need a replica set; a local single-node one is enough for testing:
+    ``mongod --replSet rs0`` followed by ``rs.initiate()`` in mongosh.
+    """
+
+    def __init__(self, collection, semantic_index=None, semantic_weight: float = 0.0,
+                 poll_interval: float = 30.0, batch_size: int = 1000, ann_min_mentors: int = 0,
+                 ann_candidates: int = 1000, executor: Optional[MatchExecutor] = None, shards: int = 0,
+                 snapshots: Optional[FeatureSnapshots] = None, snapshot_interval: float = 1.0,
+                 reconfigure_interval: float = 30.0, semantic_save_interval: float = 30.0):
+        self.collection = collection
+        self.semantic_index = semantic_index
+        self.semantic_weight = semantic_weight
+        self.poll_interval = poll_interval
+        self.batch_size = batch_size
+        self.ann_min_mentors = ann_min_mentors
+        self.ann_candidates = ann_candidates
+        self._ann: Optional[IVFIndex] = None
+        self._ann_trained_size = 0
+        self.executor = executor
+        self.reconfigure_interval = reconfigure_interval
+        self.semantic_save_interval = semantic_save_interval
+        # With snapshots, one worker publishes its matrix and the others map the newest version
+        self.snapshots = snapshots
+        self.snapshot_interval = snapshot_interval
+        self.snapshot_version: Optional[int] = None
+        self.publishing = False
+        # Local writes a follower left to the leader's next snapshot
+        self.deferred_writes = 0
+        self._publish_task: Optional[asyncio.Task] = None
+        self._publish_pending = False
+        self._version = 0
+        self.mode = "stopped"
+        self.profiles: Dict[str, dict] = {}
+        self._object_ids: Dict[object, str] = {}
+        self._updated: Dict[str, dict] = {}
+        self._updated_at: Dict[object, object] = {}
+        self._matrix: Optional[MentorFeatureMatrix] = None
+        # Changes not applied to the matrix yet, and the ones made during each running full build
+        self._pending: Dict[str, Optional[dict]] = {}
+        self._change_logs: List[Dict[str, Optional[dict]]] = []
+        self._build_lock = asyncio.Lock()
+        self._rebuild_task: Optional[asyncio.Task] = None
+        # Full builds so far; row numbers only change with one
+        self._layout = 0
+        self._configured_layout: Optional[int] = None
+        self._configured_at = 0.0
+        self._semantic_save_task: Optional[asyncio.Task] = None
+        self.builds = {"deltas": 0, "full": 0}
+        self._semantic_rows: Optional[np.ndarray] = None
+        self._loaded = asyncio.Event()
+        self._load_lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+        self.pruning = {"scored": 0, "skipped": 0}
+        # Called with (mentor_id, mentor) on every change, mentor is None for removals and
+        # both are None after a full reload
+        self.listeners: List[Callable[[Optional[str], Optional[dict]], None]] = []
+        # Industry shards in worker processes replace the local matrix for find_matches
+        self.sharded: Optional[ShardedMatcher] = None
+        if shards and not self.uses_semantic:
+            self.sharded = ShardedMatcher(shards, lambda: self.profiles)
+            self.listeners.append(self.sharded.mentor_changed)
+
+    @property
+    def uses_semantic(self) -> bool:
+        return self.semantic_index is not None and self.semantic_weight > 0
+
+    @property
+    def version(self) -> int:
+        """Version of the pool served to matching, bumped whenever changes are applied to it"""
+        return self._version
+
+    @property
+    def following(self) -> bool:
+        """Whether the pool is mapped from snapshots another worker publishes"""
+        return self.snapshots is not None and not self.publishing
+
+    def _projection(self) -> dict:
+        fields = MENTOR_FIELDS + (SEMANTIC_FIELDS if self.uses_semantic else []) + ["updated_at"]
+        return {field: 1 for field in fields}
+
+    def _compact(self, doc: dict) -> dict:
+        """Keep only the projected fields of a full profile document"""
+        compact = {"_id": doc.get("_id")}
+        for field in self._projection():
+            if "." in field:
+                parent, child = field.split(".", 1)
+                value = doc.get(parent)
+                if isinstance(value, dict) and child in value:
+                    compact.setdefault(parent, {})[child] = value[child]
+            elif field in doc:
+                compact[field] = doc[field]
+        return compact
+
+    def _notify(self, mentor_id: Optional[str], mentor: Optional[dict]):
+        for listener in self.listeners:
+            listener(mentor_id, mentor)
+        if self.publishing:
+            self._publish_pending = True
+            if self._publish_task is None:
+                self._publish_task = asyncio.get_running_loop().create_task(self._publish())
+
+    # Mutations
+
+    def upsert(self, doc: dict):
+        """Add, replace or drop a profile depending on its role.
+
+        A follower leaves the change to the leader, which sees it on its change stream, and
+        picks it up with the next snapshot instead of rebuilding its mapped pool.
+        """
+        if self.following:
+            self.deferred_writes += 1
+            return
+        if doc.get("role") != "mentor":
+            self.remove(doc.get("_id"), doc.get("id"))
+            return
+        mentor = self._compact(doc)
+        object_id = mentor.pop("_id", None)
+        updated_at = mentor.pop("updated_at", None)
+        if object_id is not None:
+            self._object_ids[object_id] = mentor["id"]
+            self._updated_at[object_id] = updated_at
+        if mentor["id"] in self.profiles:
+            self._updated[mentor["id"]] = mentor
+        self.profiles[mentor["id"]] = mentor
+        self._changed(mentor["id"], mentor)
+        self._notify(mentor["id"], mentor)
+
+    def remove(self, object_id=None, profile_id: Optional[str] = None):
+        if self.following:
+            self.deferred_writes += 1
+            return
+        if profile_id is None:
+            profile_id = self._object_ids.get(object_id)
+        if object_id is None:
+            object_id = next((oid for oid, pid in self._object_ids.items() if pid == profile_id), None)
+        self._object_ids.pop(object_id, None)
+        self._updated_at.pop(object_id, None)
+        self._updated.pop(profile_id, None)
+        if self.profiles.pop(profile_id, None) is not None:
+            self._changed(profile_id, None)
+            self._notify(profile_id, None)
+
+    def _changed(self, mentor_id: str, mentor: Optional[dict]):
+        self._pending[mentor_id] = mentor
+        for changes in self._change_logs:
+            changes[mentor_id] = mentor
+
+    def apply_change(self, change: dict):
+        """Apply one change stream event"""
+        operation = change.get("operationType")
+        if operation == "delete":
+            self.remove(change["documentKey"]["_id"])
+        elif operation in ("insert", "update", "replace"):
+            doc = change.get("fullDocument")
+            if doc is None:
+                # Deleted before the update could be looked up
+                self.remove(change["documentKey"]["_id"])
+            else:
+                self.upsert(doc)
+
+    # Loading and refreshing
+
+    async def load(self):
+        """Load every mentor from the collection, replacing the current contents"""
+        async with self._load_lock:
+            profiles, object_ids, updated_at = {}, {}, {}
+            cursor = self.collection.find({"role": "mentor"}, self._projection()).batch_size(self.batch_size)
+            async for mentor in cursor:
+                object_id = mentor.pop("_id")
+                object_ids[object_id] = mentor["id"]
+                updated_at[object_id] = mentor.pop("updated_at", None)
+                profiles[mentor["id"]] = mentor
+            self.profiles, self._object_ids, self._updated_at = profiles, object_ids, updated_at
+            self._updated = {}
+            await self._rebuild()
+            self._loaded.set()
+        self._notify(None, None)
+        logging.info(f"Mentor feature store loaded {len(profiles)} mentors")
+
+    async def poll(self):
+        """Reconcile with the collection by comparing ids and update times.
+
+        Inserts and deletes are always detected, edits only when they bump updated_at.
+        """
+        seen = {}
+        cursor = self.collection.find({"role": "mentor"}, {"_id": 1, "updated_at": 1}).batch_size(self.batch_size)
+        async for doc in cursor:
+            seen[doc["_id"]] = doc.get("updated_at")
+        for object_id in set(self._object_ids) - set(seen):
+            self.remove(object_id)
+        stale = [oid for oid, updated_at in seen.items()
+                 if oid not in self._object_ids or self._updated_at.get(oid) != updated_at]
+        for start in range(0, len(stale), self.batch_size):
+            batch = stale[start:start + self.batch_size]
+            async for doc in self.collection.find({"_id": {"$in": batch}}, self._projection()):
+                self.upsert(doc)
+
+    async def _watch(self):
+        resume_token = None
+        while True:
+            try:
+                pipeline = [{"$match": {"operationType": {"$in": ["insert", "update", "replace", "delete"]}}}]
+                async with self.collection.watch(pipeline, full_document="updateLookup", resume_after=resume_token) as stream:
+                    self.mode = "change_stream"
+                    if resume_token is None:
+                        # Loading after the stream is open means no change can fall in between
+                        await self.load()
+                    async for change in stream:
+                        self.apply_change(change)
+                        resume_token = stream.resume_token
+            except OperationFailure as e:
+                if e.code == CHANGE_STREAMS_UNSUPPORTED:
+                    logging.info("Change streams unavailable, polling mentor profiles instead")
+                    await self._poll_forever()
+                    return
+                logging.error(f"Mentor change stream error: {e}")
+                resume_token = None
+            except PyMongoError as e:
+                logging.error(f"Mentor change stream error: {e}")
+            await asyncio.sleep(1)
+
+    async def _poll_forever(self):
+        self.mode = "polling"
+        if not self._loaded.is_set():
+            await self.load()
+        while True:
+            try:
+                await self.poll()
+            except PyMongoError as e:
+                logging.error(f"Mentor feature store poll error: {e}")
+            await asyncio.sleep(self.poll_interval)
+
+    # Snapshots
+
+    async def _publish(self):
+        """Publish the pool after changes, at most once per ``snapshot_interval`` seconds"""
+        try:
+            while self._publish_pending:
+                await asyncio.sleep(self.snapshot_interval)
+                self._publish_pending = False
+                matrix = self.matrix()
+                semantic = self.semantic_index.get_state() if self.uses_semantic else None
+                self.snapshot_version = await asyncio.to_thread(self.snapshots.publish, matrix, semantic)
+        except Exception as e:
+            logging.error(f"Mentor feature snapshot publish error: {e}")
+        finally:
+            self._publish_task = None
+
+    async def _swap(self, version: int):
+        """Serve from a published snapshot instead of a locally built matrix.
+
+        Listeners hear about the mentors that differ from the previous snapshot one by one;
+        only the first snapshot, or one replacing most of the pool, counts as a full reload.
+        """
+        matrix, semantic = await asyncio.to_thread(self.snapshots.load, version)
+        if semantic is not None and self.semantic_index is not None:
+            self.semantic_index.set_state(**semantic)
+        matrix.pruning = self.pruning
+        ann = await asyncio.to_thread(self._build_ann, matrix)
+        previous = self.profiles if self._loaded.is_set() else None
+        self.profiles = {mentor["id"]: mentor for mentor in matrix.profiles if mentor is not None}
+        self._object_ids, self._updated_at, self._updated = {}, {}, {}
+        if self.uses_semantic:
+            self._semantic_rows = self.semantic_index.rows(matrix.ids)
+        self._ann = ann
+        self._matrix = matrix
+        self._version += 1
+        self._layout += 1
+        self.snapshot_version = version
+        self._loaded.set()
+        changes = None
+        if previous is not None:
+            changes = [(mentor_id, None) for mentor_id in previous.keys() - self.profiles.keys()]
+            changes += [(mentor_id, mentor) for mentor_id, mentor in self.profiles.items()
+                        if previous.get(mentor_id) != mentor]
+        if changes is None or len(changes) > len(self.profiles) // 2:
+            self._notify(None, None)
+            return
+        for mentor_id, mentor in changes:
+            self._notify(mentor_id, mentor)
+
+    async def _follow(self):
+        """Map each newly published snapshot, and take over publishing if the leader is gone"""
+        self.mode = "snapshot"
+        while True:
+            if self.snapshots.acquire_leader():
+                logging.info("Taking over mentor feature snapshot publishing")
+                self.publishing = True
+                await self._watch()
+                return
+            version = self.snapshots.current()
+            if version is not None and version != self.snapshot_version:
+                try:
+                    await self._swap(version)
+                except Exception as e:
+                    logging.error(f"Mentor feature snapshot load error: {e}")
+            await asyncio.sleep(self.snapshot_interval)
+
+    async def start(self, timeout: float = 30.0):
+        """Keep the store fresh in the background and wait for the initial load"""
+        if self.snapshots is not None and not self.snapshots.acquire_leader():
+            self._task = asyncio.create_task(self._follow())
+        else:
+            self.publishing = self.snapshots is not None
+            self._task = asyncio.create_task(self._watch())
+        try:
+            await asyncio.wait_for(self._loaded.wait(), timeout)
+        except asyncio.TimeoutError:
+            logging.error("Mentor feature store did not finish loading, it will load on first use")
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        for name in ('_publish_task', '_rebuild_task', '_semantic_save_task'):
+            task = getattr(self, name)
+            if task is not None:
+                task.cancel()
+                setattr(self, name, None)
+        if self.sharded is not None:
+            self.sharded.shutdown()
+        self.mode = "stopped"
+
+    # Matching
+
+    def matrix(self) -> MentorFeatureMatrix:
+        """Encoded mentor pool with the changes made so far applied"""
+        if self._matrix is None:
+            # Only before the first load finished; later full builds run off the event loop
+            self._pending = {}
+            matrix = MentorFeatureMatrix(list(self.profiles.values()), self.pruning)
+            self._install(matrix, self._build_ann(matrix), full=True)
+        elif self._pending:
+            pending, self._pending = self._pending, {}
+            self._install(*self._apply(self._matrix, self._ann, pending))
+            if self._needs_rebuild() and self._rebuild_task is None:
+                try:
+                    self._rebuild_task = asyncio.get_running_loop().create_task(self._background_rebuild())
+                except RuntimeError:
+                    pass  # No event loop to build on; the deltas keep serving
+        return self._matrix
+
+    def _apply(self, matrix: MentorFeatureMatrix, ann: Optional[IVFIndex],
+               changes: Dict[str, Optional[dict]]) -> tuple:
+        """Matrix and IVF index with the changes applied as per-row deltas"""
+        removals = [mentor_id for mentor_id, mentor in changes.items() if mentor is None]
+        updated = matrix.apply([mentor for mentor in changes.values() if mentor is not None], removals)
+        if ann is not None and len(updated.row_of) >= self.ann_min_mentors:
+            changed = [updated.row_of[mentor_id] for mentor_id, mentor in changes.items() if mentor is not None]
+            changed += [matrix.row_of[mentor_id] for mentor_id in removals if mentor_id in matrix.row_of]
+            ann = ann.apply(updated, np.array(changed, dtype=np.int64))
+        else:
+            ann = None
+        self.builds["deltas"] += 1
+        return updated, ann
+
+    def _needs_rebuild(self) -> bool:
+        """Whether the rows of removed mentors or the pool's growth call for a full build"""
+        matrix = self._matrix
+        live = len(matrix.row_of)
+        if matrix.empty_rows > max(live // 4, 64):
+            return True
+        if not self.ann_min_mentors or live < self.ann_min_mentors:
+            return False
+        return self._ann is None or live >= 2 * self._ann_trained_size
+
+    async def _rebuild(self):
+        """Build the matrix and IVF index anew in a thread and swap them in with the changes made meanwhile"""
+        async with self._build_lock:
+            changes: Dict[str, Optional[dict]] = {}
+            self._change_logs.append(changes)
+            try:
+                matrix = await asyncio.to_thread(MentorFeatureMatrix, list(self.profiles.values()), self.pruning)
+                ann = await asyncio.to_thread(self._build_ann, matrix)
+            finally:
+                self._change_logs.remove(changes)
+            if changes:
+                matrix, ann = self._apply(matrix, ann, changes)
+            # Everything pending is part of the new build
+            self._pending = {}
+            self._install(matrix, ann, full=True)
+
+    async def _background_rebuild(self):
+        try:
+            await self._rebuild()
+        except Exception as e:
+            logging.error(f"Mentor feature matrix rebuild error: {e}")
+        finally:
+            self._rebuild_task = None
+
+    def _install(self, matrix: MentorFeatureMatrix, ann: Optional[IVFIndex], full: bool = False):
+        if full:
+            self._layout += 1
+            self.builds["full"] += 1
+        if self.uses_semantic:
+            self.semantic_index.sync(list(self.profiles.values()), updated=list(self._updated.values()), save=False)
+            self._semantic_rows = self.semantic_index.rows(matrix.ids)
+            self._save_semantic_later()
+        self._updated = {}
+        self._ann = ann
+        self._matrix = matrix
+        self._version += 1
+
+    def _save_semantic_later(self):
+        if self._semantic_save_task is not None:
+            return
+        try:
+            self._semantic_save_task = asyncio.get_running_loop().create_task(self._save_semantic())
+        except RuntimeError:
+            self.semantic_index.save()
+
+    async def _save_semantic(self):
+        """Write the semantic index at most once per ``semantic_save_interval``, off the event loop"""
+        try:
+            await asyncio.sleep(self.semantic_save_interval)
+            self._semantic_save_task = None
+            await asyncio.to_thread(self.semantic_index.save, self.semantic_index.get_state())
+        except Exception as e:
+            logging.error(f"Semantic index save error: {e}")
+        finally:
+            if self._semantic_save_task is asyncio.current_task():
+                self._semantic_save_task = None
+
+    def _build_ann(self, matrix: MentorFeatureMatrix) -> Optional[IVFIndex]:
+        if not self.ann_min_mentors or len(matrix) < self.ann_min_mentors:
+            return None
+        # Centroids are retrained once the pool has doubled since the last training, or when
+        # a rebuild handed out vocabulary codes anew and the hashed vectors changed meaning
+        if self._ann is not None and len(matrix) < 2 * self._ann_trained_size and self._ann.fits(matrix):
+            return IVFIndex(matrix, centroids=self._ann.centroids, vocabularies=self._ann.vocabularies)
+        self._ann_trained_size = len(matrix)
+        return IVFIndex(matrix)
+
+    def semantic_similarity(self, mentee: dict) -> Optional[np.ndarray]:
+        """Text similarity of the mentee to every mentor of the current matrix"""
+        if not self.uses_semantic:
+            return None
+        self.matrix()
+        return self.semantic_index.similarity(mentee, self._semantic_rows)
+
+    async def top_matches(self, mentee: dict, limit: int, threshold: float = MATCH_THRESHOLD,
+                          batch_size: int = 1000, diversity: Optional[float] = None,
+                          diversity_candidates: int = 200,
+                          penalty: Optional[Callable[[dict], float]] = None) -> Matches:
+        """Best mentors for a mentee, served from memory.
+
+        ``penalty`` maps a mentor to a non-negative deduction ranking it lower; scores are
+        returned unchanged. With ``diversity`` (the MMR lambda, 1 = pure score) the best
+        ``diversity_candidates`` mentors are re-ranked by maximal marginal relevance before the
+        top ``limit`` are kept. Candidates are ranked on scores alone and reasons are only
+        built for the mentors returned. The results carry the pool version they were ranked
+        on, see Matches.
+        """
+        if not self._loaded.is_set():
+            if self.following:
+                # A follower serves the leader's snapshots only, never a pool of its own
+                await self._loaded.wait()
+            else:
+                await self.load()
+        if diversity is None:
+            matrix, semantic, version, ranked = await self._ranked(mentee, limit, threshold, batch_size, penalty)
+            return Matches(self._explain(mentee, matrix, semantic, ranked), version)
+        matrix, semantic, version, candidates = await self._ranked(mentee, max(limit, diversity_candidates),
+                                                                   threshold, batch_size, penalty)
+        vectors = feature_vectors([mentor for mentor, _, _ in candidates])
+        relevance = np.array([score - (penalty(mentor) if penalty else 0.0) for mentor, score, _ in candidates],
+                             dtype=np.float64)
+        chosen = [candidates[i] for i in mmr_order(relevance, vectors, limit, diversity)]
+        return Matches(self._explain(mentee, matrix, semantic, chosen), version)
+
+    async def _ranked(self, mentee: dict, limit: int, threshold: float, batch_size: int,
+                      penalty: Optional[Callable[[dict], float]] = None) -> tuple:
+        """Best mentors as (mentor, score, row) ranked by score less the penalty, without reasons.
+
+        Returned after the matrix and text similarities the rows refer to, both None when the
+        mentors come from the shards, and the version of the pool that ranked them.
+        """
+        if penalty is None:
+            return await self._top_rows(mentee, limit, threshold, batch_size)
+        fetch = limit * 4
+        while True:
+            matrix, semantic, version, top = await self._top_rows(mentee, fetch, threshold, batch_size)
+            # sorted is stable, so equal adjusted scores keep the score order
+            ranked = sorted(top, key=lambda item: item[1] - penalty(item[0]), reverse=True)
+            # Penalties only lower scores: once the k-th adjusted score beats the lowest
+            # fetched score, no mentor beyond the fetched ones can enter the top k
+            if len(top) < fetch or ranked[limit - 1][1] - penalty(ranked[limit - 1][0]) > top[-1][1]:
+                return matrix, semantic, version, ranked[:limit]
+            fetch *= 4
+
+    async def _top_rows(self, mentee: dict, limit: int, threshold: float, batch_size: int) -> tuple:
+        """Best mentors by score as (mentor, score, row), see _ranked"""
+        if self.sharded is not None:
+            top = await self.sharded.top_rows(mentee, limit, threshold, batch_size)
+            # A mentor removed while the shards were queried is left out
+            mentors = [(self.profiles.get(mentor_id), score) for score, mentor_id in top]
+            return None, None, self._version, [(mentor, score, None) for mentor, score in mentors if mentor is not None]
+        matrix = self.matrix()
+        semantic = self.semantic_similarity(mentee)
+        options = {"batch_size": batch_size, "ann_candidates": self.ann_candidates}
+        version = self._version
+        if self.executor is None:
+            top = matrix.top_rows(mentee, limit, threshold, semantic, self.semantic_weight, ann=self._ann, **options)
+        elif self.executor.uses_processes:
+            # Workers hold their own copy of the pool, restarted when the rows were renumbered or at
+            # most every reconfigure_interval otherwise; until then removed mentors are left out of
+            # their results and other changes are missing from them
+            if self.executor.configured_version != self._version and (
+                    self._configured_layout != self._layout
+                    or time.monotonic() - self._configured_at >= self.reconfigure_interval):
+                ann = (self._ann.centroids, self._ann.vocabularies) if self._ann is not None else (None, None)
+                self.executor.configure(self._version, init_matrix_worker, (matrix, *ann))
+                self._configured_layout = self._layout
+                self._configured_at = time.monotonic()
+            version = self.executor.configured_version
+            top = await self.executor.run(worker_top_rows, mentee, limit, threshold, semantic,
+                                          self.semantic_weight, **options)
+        else:
+            top = await self.executor.run(matrix.top_rows, mentee, limit, threshold, semantic,
+                                          self.semantic_weight, ann=self._ann, **options)
+        # Rows of mentors removed since the workers were configured are left out
+        mentors = [(matrix.profiles[row] if row < len(matrix.profiles) else None, score, row) for score, row in top]
+        return matrix, semantic, version, [(mentor, score, row) for mentor, score, row in mentors if mentor is not None]
+
+    def _explain(self, mentee: dict, matrix: Optional[MentorFeatureMatrix], semantic: Optional[np.ndarray],
+                 ranked: List[tuple]) -> List[tuple]:
+        """(mentor, score, reasons) of _ranked results"""
+        if matrix is None:
+            return [(mentor, score, explain_match(mentor, mentee)) for mentor, score, _ in ranked]
+        return matrix.explain_rows(mentee, [(score, row) for _, score, row in ranked], semantic, self.semantic_weight)
+
+    def stats(self) -> dict:
+        return {
+            "mode": self.mode,
+            "mentors": len(self.profiles),
+            "pruning": self.pruning,
+            "matrix": {"rows": len(self._matrix), "empty_rows": self._matrix.empty_rows,
+                       **self.builds} if self._matrix is not None else None,
+            "ann": self._ann.stats() if self._ann is not None else None,
+            "executor": self.executor.stats() if self.executor is not None else None,
+            "shards": self.sharded.stats() if self.sharded is not None else None,
+            "snapshot": {"version": self.snapshot_version, "publishing": self.publishing,
+                         "deferred_writes": self.deferred_writes} if self.snapshots else None,
+        }
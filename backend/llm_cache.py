@@ -0,0 +1,103 @@
+import hashlib
+import json
+import logging
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Dict, Optional, Tuple
+
+from pymongo.errors import PyMongoError
+
+
+def cache_key(model: str, system_message: str, prompt: str) -> str:
+    """Content address of one LLM request"""
+    return hashlib.sha256(json.dumps([model, system_message, prompt]).encode()).hexdigest()
+
+
+class LlmResponseCache:
+    """Two-tier cache of LLM replies keyed by a hash of model, system message and prompt.
+
+    Replies are kept in an in-memory LRU of ``max_entries`` and, when a collection is given,
+    in MongoDB where a TTL index on ``expires_at`` removes them, so they survive restarts and
+    are shared by the workers. ``ttls`` gives the lifetime in seconds per call site; sites
+    without one are not cached. Memory hits never await; persistent hits are promoted to
+    memory.
+    """
+
+    def __init__(self, collection=None, max_entries: int = 4096, ttls: Optional[Dict[str, float]] = None):
+        self.collection = collection
+        self.max_entries = max_entries
+        self.ttls = ttls or {}
+        self._entries: "OrderedDict[str, Tuple[str, float]]" = OrderedDict()
+        self.sites: Dict[str, Dict[str, int]] = {}
+        self.hit_seconds = 0.0
+
+    async def ensure_indexes(self):
+        if self.collection is not None:
+            await self.collection.create_index("expires_at", expireAfterSeconds=0)
+
+    def _count(self, site: str, outcome: str):
+        counts = self.sites.setdefault(site, {"memory_hits": 0, "persistent_hits": 0, "misses": 0})
+        counts[outcome] += 1
+
+    def _remember(self, key: str, response: str, expires: float):
+        self._entries[key] = (response, expires)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    async def get(self, key: str, site: str) -> Optional[str]:
+        started = time.perf_counter()
+        entry = self._entries.get(key)
+        if entry is not None:
+            if entry[1] > time.time():
+                self._entries.move_to_end(key)
+                self._count(site, "memory_hits")
+                self.hit_seconds += time.perf_counter() - started
+                return entry[0]
+            del self._entries[key]
+        if self.collection is not None:
+            try:
+                doc = await self.collection.find_one({"_id": key, "expires_at": {"$gt": datetime.utcnow()}})
+            except PyMongoError as e:
+                logging.error(f"LLM cache read error: {e}")
+                doc = None
+            if doc is not None:
+                expires = time.time() + (doc["expires_at"] - datetime.utcnow()).total_seconds()
+                self._remember(key, doc["response"], expires)
+                self._count(site, "persistent_hits")
+                return doc["response"]
+        self._count(site, "misses")
+        return None
+
+    async def put(self, key: str, response: str, site: str):
+        ttl = self.ttls[site]
+        self._remember(key, response, time.time() + ttl)
+        if self.collection is None:
+            return
+        now = datetime.utcnow()
+        try:
+            await self.collection.replace_one(
+                {"_id": key},
+                {"response": response, "site": site, "created_at": now, "expires_at": now + timedelta(seconds=ttl)},
+                upsert=True
+            )
+        except PyMongoError as e:
+            logging.error(f"LLM cache write error: {e}")
+
+    def stats(self) -> dict:
+        hits = sum(c["memory_hits"] + c["persistent_hits"] for c in self.sites.values())
+        memory_hits = sum(c["memory_hits"] for c in self.sites.values())
+        lookups = hits + sum(c["misses"] for c in self.sites.values())
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "persistent": self.collection is not None,
+            "lookups": lookups,
+            "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+            "mean_memory_hit_us": round(self.hit_seconds / memory_hits * 1e6, 2) if memory_hits else None,
+            "sites": {
+                site: {**counts, "hit_rate": round(1 - counts["misses"] / max(sum(counts.values()), 1), 4)}
+                for site, counts in self.sites.items()
+            },
+        }
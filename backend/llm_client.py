@@ -0,0 +1,176 @@
+import asyncio
+import json
+import time
+import uuid
+from typing import Callable, Optional, Tuple
+
+from llm_cache import LlmResponseCache, cache_key
+
+
+def _is_json(text) -> bool:
+    try:
+        json.loads(text)
+    except (TypeError, ValueError):
+        return False
+    return True
+
+
+async def _close_chat(chat):
+    close = getattr(chat, "close", None)
+    if close is not None:
+        result = close()
+        if asyncio.iscoroutine(result):
+            await result
+
+
+class LlmClient:
+    """A bounded pool of long-lived chat clients shared by every AI call of a worker.
+
+    ``start`` creates ``size`` chats with ``create_chat(session_id, system_message)`` bound to
+    the model with ``with_model``; they are kept for the life of the worker so their HTTP
+    connections are reused. A call checks a chat out, so at most ``size`` calls reach the
+    model at once and the others wait for a free chat, and puts it back afterwards with its
+    ``messages`` cut back to what it held when created and a fresh session id, so no history
+    leaks between calls. A chat whose call failed, or whose history cannot be cut back, is
+    closed and replaced by a new one. ``stats`` reports the time spent waiting, in the model
+    and around it.
+
+    With a ``cache`` (an LlmResponseCache), calls naming a call site with a TTL are answered
+    from it when the same model, system message and prompt were sent before. Only replies
+    that parse as JSON are cached: every call site expects JSON and falls back otherwise.
+    """
+
+    def __init__(self, create_chat: Callable, system_message: str, provider: str, model: str, size: int = 8,
+                 cache: Optional[LlmResponseCache] = None):
+        self.create_chat = create_chat
+        self.system_message = system_message
+        self.provider = provider
+        self.model = model
+        self.size = size
+        self.cache = cache
+        # Idle chats with the length of their history right after creation
+        self._chats: Optional[asyncio.Queue] = None
+        self.in_flight = 0
+        self.recycled = 0
+        self.calls = 0
+        self.errors = 0
+        self.waiting = 0
+        self.wait_seconds = 0.0
+        self.overhead_seconds = 0.0
+        self.model_seconds = 0.0
+
+    def _new_chat(self) -> Tuple[object, Optional[int]]:
+        chat = self.create_chat(f"mentormatch_{uuid.uuid4().hex}", self.system_message).with_model(self.provider, self.model)
+        messages = getattr(chat, "messages", None)
+        return chat, len(messages) if isinstance(messages, list) else None
+
+    async def start(self):
+        if self._chats is not None:
+            return
+        chats = asyncio.Queue()
+        for _ in range(self.size):
+            chats.put_nowait(self._new_chat())
+        self._chats = chats
+
+    async def close(self):
+        chats, self._chats = self._chats, None
+        while chats is not None and not chats.empty():
+            await _close_chat(chats.get_nowait()[0])
+
+    async def _check_in(self, chats: asyncio.Queue, pooled: Tuple[object, Optional[int]], failed: bool):
+        """Return a chat to the pool with a clean conversation, or a new chat in its place"""
+        chat, created_length = pooled
+        messages = getattr(chat, "messages", None)
+        if chats is not self._chats:
+            # The pool was closed while the call ran
+            await _close_chat(chat)
+            return
+        if failed or created_length is None or not isinstance(messages, list) or len(messages) < created_length:
+            self.recycled += 1
+            chats.put_nowait(self._new_chat())
+            await _close_chat(chat)
+            return
+        del messages[created_length:]
+        if hasattr(chat, "session_id"):
+            chat.session_id = f"mentormatch_{uuid.uuid4().hex}"
+        chats.put_nowait(pooled)
+
+    def _cache_key(self, text: str, site: Optional[str]) -> Optional[str]:
+        if self.cache is None or not self.cache.ttls.get(site):
+            return None
+        return cache_key(f"{self.provider}/{self.model}", self.system_message, text)
+
+    async def cached(self, text: str, site: str) -> Optional[str]:
+        """Cached reply to a prompt sent from ``site``, None when there is none"""
+        key = self._cache_key(text, site)
+        return None if key is None else await self.cache.get(key, site)
+
+    async def remember(self, text: str, response: str, site: str):
+        """Cache a reply to a prompt obtained some other way, e.g. split from a batched call"""
+        key = self._cache_key(text, site)
+        if key is not None and _is_json(response):
+            await self.cache.put(key, response, site)
+
+    async def send(self, message, site: Optional[str] = None) -> str:
+        """Send one message in a clean conversation on a pooled chat and return the model's reply"""
+        key = self._cache_key(message.text, site)
+        if key is not None:
+            cached = await self.cache.get(key, site)
+            if cached is not None:
+                return cached
+        response = await self._send(message)
+        if key is not None and _is_json(response):
+            await self.cache.put(key, response, site)
+        return response
+
+    async def _send(self, message) -> str:
+        started = time.perf_counter()
+        if self._chats is None:
+            await self.start()
+        chats = self._chats
+        self.waiting += 1
+        try:
+            pooled = await chats.get()
+        finally:
+            self.waiting -= 1
+        waited = time.perf_counter() - started
+        model_seconds = 0.0
+        failed = False
+        self.in_flight += 1
+        try:
+            sent = time.perf_counter()
+            try:
+                return await pooled[0].send_message(message)
+            except Exception:
+                self.errors += 1
+                failed = True
+                raise
+            except BaseException:
+                # A cancelled call may leave the chat mid-request
+                failed = True
+                raise
+            finally:
+                model_seconds = time.perf_counter() - sent
+        finally:
+            self.in_flight -= 1
+            await self._check_in(chats, pooled, failed)
+            self.calls += 1
+            self.wait_seconds += waited
+            self.model_seconds += model_seconds
+            self.overhead_seconds += time.perf_counter() - started - waited - model_seconds
+
+    def stats(self) -> dict:
+        calls = self.calls or 1
+        return {
+            "model": f"{self.provider}/{self.model}",
+            "max_concurrency": self.size,
+            "in_flight": self.in_flight,
+            "idle": self._chats.qsize() if self._chats is not None else 0,
+            "waiting": self.waiting,
+            "calls": self.calls,
+            "errors": self.errors,
+            "recycled": self.recycled,
+            "mean_wait_ms": round(self.wait_seconds / calls * 1000, 3),
+            "mean_model_ms": round(self.model_seconds / calls * 1000, 3),
+            "mean_overhead_us": round(self.overhead_seconds / calls * 1e6, 2),
+        }
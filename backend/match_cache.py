@@ -0,0 +1,263 @@
+import math
+import sys
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+from matching import COMPATIBLE_STYLES, MATCH_THRESHOLD, _is_number, _is_plain_mentor, _is_str_list, match_score
+
+
+def _sizeof(value: Any) -> int:
+    """Approximate deep size of JSON-like values"""
+    size = sys.getsizeof(value)
+    if isinstance(value, dict):
+        size += sum(_sizeof(k) + _sizeof(v) for k, v in value.items())
+    elif isinstance(value, (list, tuple)):
+        size += sum(_sizeof(item) for item in value)
+    return size
+
+
+# Mentee fields read by calculate_match_score
+_MENTEE_FIELDS = ('id', 'industry', 'experience_years', 'goals', 'interests')
+_ANALYSIS_FIELDS = ('communication_style', 'mentorship_readiness')
+
+
+def _scoring_view(mentee: dict) -> dict:
+    """The part of a mentee document the scorer reads, to keep entries small"""
+    view = {field: mentee[field] for field in _MENTEE_FIELDS if field in mentee}
+    analysis = mentee.get('ai_analysis', {})
+    if isinstance(analysis, dict):
+        view['ai_analysis'] = {field: analysis[field] for field in _ANALYSIS_FIELDS if field in analysis}
+    elif 'ai_analysis' in mentee:
+        view['ai_analysis'] = analysis
+    return view
+
+
+class _Entry:
+    __slots__ = ('mentee', 'matches', 'top_k', 'threshold', 'size', 'mentor_ids', 'features', 'bucket')
+
+    def __init__(self, mentee: dict, matches: List[dict], top_k: int, threshold: float):
+        self.mentee = _scoring_view(mentee)
+        self.matches = matches
+        self.top_k = top_k
+        self.threshold = threshold
+        self.size = _sizeof(self.mentee) + _sizeof(matches)
+        self.mentor_ids = {match["mentor_id"] for match in matches}
+        self.features = _mentee_features(self.mentee)
+        self.bucket = self._bucket()
+
+    def floor(self) -> float:
+        """Lowest score a mentor needs to take a place in this top-k"""
+        if len(self.matches) < self.top_k:
+            return self.threshold
+        return max(self.threshold, self.matches[-1]["match_score"])
+
+    def _bucket(self) -> Optional[int]:
+        """Floor less the mentee's own readiness part, in hundredths rounded down.
+
+        A mentor sharing no industry, goal word or interest with the mentee scores at most
+        its experience, style and readiness parts plus this readiness part. None for mentees
+        whose fields the scorer may fail on, which are always rescored.
+        """
+        if self.features is None:
+            return None
+        readiness = self.mentee.get('ai_analysis', {}).get('mentorship_readiness', 5)
+        return math.floor((self.floor() - readiness / 20 * 0.1) * 100)
+
+    def could_enter(self, mentor: dict) -> bool:
+        """Whether a new or edited mentor could take a place in this top-k"""
+        score = match_score(mentor, self.mentee)
+        if score <= self.threshold:
+            return False
+        if len(self.matches) < self.top_k:
+            return True
+        # Ties may go either way depending on pool order, so they invalidate too
+        return score >= self.matches[-1]["match_score"]
+
+
+def _mentee_features(mentee: dict) -> Optional[frozenset]:
+    """Industry, goal words and interests through which a mentor can share with the mentee.
+
+    None when a field is not of the plain types calculate_match_score expects.
+    """
+    analysis = mentee.get('ai_analysis', {})
+    industry = mentee.get('industry')
+    goals = mentee.get('goals', [])
+    interests = mentee.get('interests', [])
+    if not (isinstance(analysis, dict) and isinstance(industry, (str, type(None)))
+            and _is_str_list(goals) and _is_str_list(interests)
+            and _is_number(mentee.get('experience_years', 0))
+            and _is_number(analysis.get('mentorship_readiness', 5))):
+        return None
+    features = {('industry', industry)}
+    for goal in goals:
+        features.update(('word', word) for word in goal.lower().split())
+    features.update(('interest', interest) for interest in interests)
+    return frozenset(features)
+
+
+def _mentor_reach(mentor: dict) -> Optional[Tuple[set, int]]:
+    """Features a mentor shares through, and its best score without sharing any, in hundredths.
+
+    None for mentors the vectorized scorer treats as exotic, which are checked against every entry.
+    """
+    if not _is_plain_mentor(mentor):
+        return None
+    analysis = mentor.get('ai_analysis', {})
+    features = {('industry', mentor.get('industry'))}
+    features.update(('word', skill) for skill in mentor.get('skills', []))
+    features.update(('interest', interest) for interest in mentor.get('interests', []))
+    style = analysis.get('communication_style', '')
+    compatible = isinstance(style, str) and style in COMPATIBLE_STYLES
+    bound = 0.15 + (0.15 if compatible else 0.0) + analysis.get('mentorship_readiness', 5) / 20 * 0.1
+    # Margin for the rounding of the score and float error
+    return features, math.floor(bound * 100) + 2
+
+
+class MatchCache:
+    """LRU cache of find_matches results keyed by mentee id, mentee version and k.
+
+    The mentee version is its updated_at, so editing a mentee makes its old entries
+    unreachable. Mentor changes only drop the entries whose top-k they can affect: a removed
+    or edited mentor invalidates the entries it appears in, and a new or edited mentor the
+    entries it would enter. With ``exact_rescoring`` off (e.g. when the text similarity is
+    part of the score) any mentor change clears the cache.
+
+    Entries are indexed by mentee id, by the mentors they list and by the features their
+    mentee shares through, so a mentor change only rescores the entries it can reach: those
+    sharing an industry, goal word or interest with it, plus those whose floor is low enough
+    to be entered without sharing anything.
+    """
+
+    def __init__(self, max_bytes: int = 64 * 1024 * 1024, exact_rescoring: bool = True):
+        self.max_bytes = max_bytes
+        self.exact_rescoring = exact_rescoring
+        self.generation = 0
+        self._entries: "OrderedDict[Tuple[str, Any, int], _Entry]" = OrderedDict()
+        self._by_mentee: Dict[str, Set[tuple]] = {}
+        self._by_mentor: Dict[str, Set[tuple]] = {}
+        self._by_feature: Dict[tuple, Set[tuple]] = {}
+        self._by_bucket: Dict[Optional[int], Set[tuple]] = {}
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.evictions = 0
+        self.rescored = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, mentee_id: str, version: Any, top_k: int) -> Optional[List[dict]]:
+        key = (mentee_id, version, top_k)
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry.matches
+
+    def put(self, mentee: dict, version: Any, top_k: int, matches: List[dict], generation: int,
+            threshold: float = MATCH_THRESHOLD):
+        """Store a result computed while the cache was at ``generation``"""
+        if generation != self.generation:
+            # A mentor changed while the result was being computed
+            return
+        self.invalidate_mentee(mentee["id"])
+        entry = _Entry(mentee, matches, top_k, threshold)
+        if entry.size > self.max_bytes:
+            return
+        key = (mentee["id"], version, top_k)
+        self._entries[key] = entry
+        self._link(key, entry)
+        self._bytes += entry.size
+        while self._bytes > self.max_bytes:
+            evicted_key, evicted = self._entries.popitem(last=False)
+            self._unlink(evicted_key, evicted)
+            self._bytes -= evicted.size
+            self.evictions += 1
+
+    def _link(self, key, entry: _Entry):
+        self._by_mentee.setdefault(key[0], set()).add(key)
+        for mentor_id in entry.mentor_ids:
+            self._by_mentor.setdefault(mentor_id, set()).add(key)
+        for feature in entry.features or ():
+            self._by_feature.setdefault(feature, set()).add(key)
+        self._by_bucket.setdefault(entry.bucket, set()).add(key)
+
+    def _unlink(self, key, entry: _Entry):
+        for index, values in ((self._by_mentee, (key[0],)), (self._by_mentor, entry.mentor_ids),
+                              (self._by_feature, entry.features or ()), (self._by_bucket, (entry.bucket,))):
+            for value in values:
+                keys = index.get(value)
+                if keys is not None:
+                    keys.discard(key)
+                    if not keys:
+                        del index[value]
+
+    def _drop(self, key):
+        entry = self._entries.pop(key)
+        self._unlink(key, entry)
+        self._bytes -= entry.size
+        self.invalidations += 1
+
+    def invalidate_mentee(self, mentee_id: str):
+        for key in list(self._by_mentee.get(mentee_id, ())):
+            self._drop(key)
+
+    def clear(self):
+        self.generation += 1
+        self.invalidations += len(self._entries)
+        self._entries.clear()
+        for index in (self._by_mentee, self._by_mentor, self._by_feature, self._by_bucket):
+            index.clear()
+        self._bytes = 0
+
+    def _reachable(self, mentor: dict) -> Iterable[tuple]:
+        """Keys of the entries a new or edited mentor could enter, a superset"""
+        reach = _mentor_reach(mentor)
+        if reach is None:
+            return list(self._entries)
+        features, bound = reach
+        keys = set(self._by_bucket.get(None, ()))
+        for feature in features:
+            keys.update(self._by_feature.get(feature, ()))
+        for bucket, bucket_keys in self._by_bucket.items():
+            if bucket is not None and bucket <= bound:
+                keys.update(bucket_keys)
+        return keys
+
+    def mentor_changed(self, mentor_id: Optional[str], mentor: Optional[dict]):
+        """Drop the entries a mentor insert, edit (``mentor`` given) or removal can affect.
+
+        A call without a mentor id means the whole pool was reloaded.
+        """
+        if mentor_id is None or not self.exact_rescoring:
+            self.clear()
+            return
+        self.generation += 1
+        for key in list(self._by_mentor.get(mentor_id, ())):
+            self._drop(key)
+        if mentor is None:
+            return
+        for key in list(self._reachable(mentor)):
+            entry = self._entries.get(key)
+            if entry is None:
+                continue
+            self.rescored += 1
+            if entry.could_enter(mentor):
+                self._drop(key)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "size_bytes": self._bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            "invalidations": self.invalidations,
+            "evictions": self.evictions,
+            "rescored_on_mentor_change": self.rescored,
+        }
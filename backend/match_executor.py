@@ -0,0 +1,181 @@
+import asyncio
+import functools
+import multiprocessing
+import time
+from collections import deque
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from ann import IVFIndex
+from matching import MentorFeatureMatrix
+
+EXECUTOR_MODES = ("inline", "thread", "process")
+
+
+class MatchQueueFull(Exception):
+    """Raised when no matching slot frees up within the queue timeout"""
+
+
+class MatchExecutor:
+    """Runs CPU-bound matching off the event loop with a bounded queue.
+
+    ``thread`` mode scores the shared in-memory matrix in a thread pool; the NumPy kernels
+    release the GIL for most of their work. ``process`` mode scores in worker processes that
+    hold their own copy of the mentor pool, set through ``configure``; they are spawned rather
+    than forked from the threaded server process. ``inline`` runs on the event loop like
+    before. At most ``workers + max_queue`` jobs are admitted at a time; a job that cannot
+    get a slot within ``queue_timeout`` seconds raises MatchQueueFull.
+    """
+
+    def __init__(self, mode: str = "thread", workers: Optional[int] = None, max_queue: int = 32,
+                 queue_timeout: float = 2.0):
+        if mode not in EXECUTOR_MODES:
+            raise ValueError(f"Unknown match executor mode {mode!r}, expected one of {EXECUTOR_MODES}")
+        self.mode = mode
+        self.workers = workers or 4
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self._slots = asyncio.Semaphore(self.workers + max_queue)
+        self._pool: Optional[Executor] = None
+        self.configured_version = None
+        self.pending = 0
+        self.completed = 0
+        self.rejected = 0
+        if mode == "thread":
+            self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="match")
+
+    @property
+    def uses_processes(self) -> bool:
+        return self.mode == "process"
+
+    def configure(self, version, initializer: Callable, initargs: tuple):
+        """Restart the process workers with new state; jobs already running finish on the old ones"""
+        if not self.uses_processes:
+            return
+        old = self._pool
+        self._pool = ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context("spawn"),
+                                         initializer=initializer, initargs=initargs)
+        self.configured_version = version
+        if old is not None:
+            old.shutdown(wait=False)
+
+    async def run(self, fn: Callable, *args, **kwargs):
+        """Run ``fn`` on the pool once a queue slot is free"""
+        try:
+            await asyncio.wait_for(self._slots.acquire(), self.queue_timeout)
+        except asyncio.TimeoutError:
+            self.rejected += 1
+            raise MatchQueueFull(f"{self.workers + self.max_queue} matching jobs already queued")
+        self.pending += 1
+        try:
+            call = functools.partial(fn, *args, **kwargs)
+            if self._pool is None:
+                return call()
+            if not self.uses_processes:
+                return await asyncio.get_running_loop().run_in_executor(self._pool, call)
+            return await self._submit(call)
+        finally:
+            self.pending -= 1
+            self.completed += 1
+            self._slots.release()
+
+    async def _submit(self, call: Callable):
+        # Process workers are spawned by the submit that first needs them and are sent the
+        # pool state then, so submit from a thread rather than on the event loop
+        loop = asyncio.get_running_loop()
+        while True:
+            pool = self._pool
+            try:
+                future = await loop.run_in_executor(None, pool.submit, call)
+            except RuntimeError:
+                if pool is self._pool:
+                    raise
+                # Shut down by configure meanwhile, the job goes to the new workers
+                continue
+            return await asyncio.wrap_future(future)
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False)
+            self._pool = None
+
+    def stats(self) -> dict:
+        return {
+            "mode": self.mode,
+            "workers": self.workers,
+            "max_queue": self.max_queue,
+            "pending": self.pending,
+            "completed": self.completed,
+            "rejected": self.rejected,
+        }
+
+
+# Mentor pool of a matching worker process, set once by the pool initializer
+_worker_matrix: Optional[MentorFeatureMatrix] = None
+_worker_ann: Optional[IVFIndex] = None
+
+
+def init_matrix_worker(matrix: MentorFeatureMatrix, ann_centroids: Optional[np.ndarray] = None,
+                       ann_vocabularies: Optional[Dict[str, tuple]] = None):
+    """Take a copy of the store's matrix, so rows and vocabulary codes are the same as in the store.
+
+    The IVF index is rebuilt on the store's centroids, or retrained if the vocabularies they
+    were trained on do not fit the matrix.
+    """
+    global _worker_matrix, _worker_ann
+    _worker_matrix = matrix
+    _worker_ann = None
+    if ann_centroids is not None:
+        _worker_ann = IVFIndex(matrix, centroids=ann_centroids, vocabularies=ann_vocabularies)
+        if not _worker_ann.fits(matrix):
+            _worker_ann = IVFIndex(matrix)
+
+
+def worker_top_rows(mentee: dict, limit: int, threshold: float, semantic: Optional[np.ndarray],
+                    semantic_weight: float, **options) -> List[Tuple[float, int]]:
+    """MentorFeatureMatrix.top_rows on the worker's own matrix"""
+    return _worker_matrix.top_rows(mentee, limit, threshold, semantic, semantic_weight, ann=_worker_ann, **options)
+
+
+class LoopLagMonitor:
+    """Measures how late the event loop wakes up from a short sleep.
+
+    The lag is the time other coroutines had to wait for the loop, e.g. while a handler ran
+    CPU-bound code on it. The last ``window`` samples are kept.
+    """
+
+    def __init__(self, interval: float = 0.05, window: int = 1200):
+        self.interval = interval
+        self.samples = deque(maxlen=window)
+        self._task: Optional[asyncio.Task] = None
+
+    async def _sample(self):
+        while True:
+            started = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            self.samples.append(time.perf_counter() - started - self.interval)
+
+    def start(self):
+        self._task = asyncio.create_task(self._sample())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def stats(self) -> dict:
+        if not self.samples:
+            return {"samples": 0}
+        lags = np.array(self.samples) * 1000
+        return {
+            "samples": len(lags),
+            "p50_ms": round(float(np.percentile(lags, 50)), 2),
+            "p99_ms": round(float(np.percentile(lags, 99)), 2),
+            "max_ms": round(float(lags.max()), 2),
+        }
@@ -0,0 +1,380 @@
+"""Offline match computation.
+
+Scores every mentee against every mentor in a process pool, keeps each mentee's top N and
+stores them in mentorship_matches, so the API can serve matches with one indexed read.
+
+Run from the backend directory::
+
+    python match_jobs.py run --top-n 5 --workers 4
+    python match_jobs.py run --resume  # continue from the last checkpoint
+    python match_jobs.py compact       # collapse duplicate (mentor_id, mentee_id) rows
+"""
+import asyncio
+import json
+import logging
+import multiprocessing
+import os
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from pathlib import Path
+from typing import Awaitable, Callable, Iterable, List, Optional, Set, Tuple
+
+import numpy as np
+from pymongo import DeleteMany, UpdateOne
+from pymongo.errors import OperationFailure
+
+from feature_store import MENTOR_FIELDS
+from matching import MATCH_THRESHOLD, MentorFeatureMatrix
+from semantic import SemanticIndex
+from single_flight import LeaderLease
+
+ROOT_DIR = Path(__file__).parent
+DEFAULT_CHECKPOINT = ROOT_DIR / 'data' / 'match_job_checkpoint.json'
+
+# Mentee fields read by calculate_match_score
+MENTEE_FIELDS = [
+    "id", "industry", "experience_years", "goals", "interests",
+    "ai_analysis.communication_style", "ai_analysis.mentorship_readiness",
+]
+# Further mentee fields read by semantic.profile_text
+SEMANTIC_FIELDS = ["bio", "skills"]
+
+# Order in which duplicate rows of a pair are kept by compact_matches, best first
+STATUS_PRIORITY = ["active", "accepted", "completed", "declined", "pending"]
+
+# Mentor pool of each worker process and, with a semantic weight, the semantic index with
+# the index rows of the pool and the weight, set once by the pool initializer
+_worker_matrix: Optional[MentorFeatureMatrix] = None
+_worker_semantic: Optional[Tuple[SemanticIndex, np.ndarray, float]] = None
+
+
+def _init_worker(mentors: List[dict], semantic_state: Optional[dict] = None, semantic_weight: float = 0.0):
+    global _worker_matrix, _worker_semantic
+    _worker_matrix = MentorFeatureMatrix(mentors)
+    _worker_semantic = None
+    if semantic_state is not None and semantic_weight:
+        index = SemanticIndex()
+        index.set_state(**semantic_state)
+        _worker_semantic = (index, index.rows(_worker_matrix.ids), semantic_weight)
+
+
+def _score_mentees(mentees: List[dict], top_n: int, threshold: float) -> Tuple[List[tuple], int]:
+    """Top mentors of each mentee as (mentee_id, [(mentor_id, score, reasons)]), and the
+    number of pairs scored for them, which pruning keeps below mentees times mentors"""
+    scored = _worker_matrix.pruning["scored"]
+    results = []
+    for mentee in mentees:
+        semantic, semantic_weight = None, 0.0
+        if _worker_semantic is not None:
+            index, rows, semantic_weight = _worker_semantic
+            semantic = index.similarity(mentee, rows)
+        top = _worker_matrix.top_matches(mentee, top_n, threshold, semantic, semantic_weight)
+        results.append((mentee["id"], [(mentor["id"], score, reasons) for mentor, score, reasons in top]))
+    return results, _worker_matrix.pruning["scored"] - scored
+
+
+def match_upsert(mentor_id: str, mentee_id: str, score: float, reasons: List[str], now: datetime) -> UpdateOne:
+    """Upsert of a match row keyed by the (mentor_id, mentee_id) pair, keeping its status"""
+    return UpdateOne(
+        {"mentor_id": mentor_id, "mentee_id": mentee_id},
+        {
+            "$set": {"match_score": score, "match_reasons": reasons, "computed_at": now},
+            "$setOnInsert": {"id": str(uuid.uuid4()), "status": "pending", "created_at": now},
+        },
+        upsert=True,
+    )
+
+
+def mentee_match_writes(mentee_id: str, top: List[tuple], now: datetime, keep_ids: Iterable[str] = ()) -> list:
+    """Bulk operations storing a mentee's top (mentor_id, score, reasons) matches.
+
+    Pending rows of mentors that fell out of the top are removed, except those listed in
+    ``keep_ids`` (see session_match_ids); accepted and active matches keep their status and
+    are never removed.
+    """
+    operations = [match_upsert(mentor_id, mentee_id, score, reasons, now) for mentor_id, score, reasons in top]
+    stale = {
+        "mentee_id": mentee_id,
+        "status": "pending",
+        "mentor_id": {"$nin": [mentor_id for mentor_id, _, _ in top]}
+    }
+    keep_ids = list(keep_ids)
+    if keep_ids:
+        stale["id"] = {"$nin": keep_ids}
+    operations.append(DeleteMany(stale))
+    return operations
+
+
+async def session_match_ids(db, query: dict) -> Set[str]:
+    """Ids of the matches that sessions matching ``query`` belong to.
+
+    Sessions are created on pending matches too, so a pending row with sessions must
+    outlive its mentor dropping out of the mentee's top.
+    """
+    return set(await db.mentorship_sessions.distinct("match_id", query))
+
+
+async def ensure_match_indexes(db) -> bool:
+    """Create the mentorship_matches indexes, False when duplicates block the unique one"""
+    await db.mentorship_matches.create_index([("mentee_id", 1), ("match_score", -1)])
+    await db.mentorship_matches.create_index("id")
+    # session_match_ids looks sessions up by mentee or mentor
+    await db.mentorship_sessions.create_index("mentee_id")
+    await db.mentorship_sessions.create_index("mentor_id")
+    # MenteePool.refresh reads the profiles edited since its newest update time
+    await db.user_profiles.create_index("updated_at")
+    try:
+        await db.mentorship_matches.create_index([("mentor_id", 1), ("mentee_id", 1)], unique=True)
+    except OperationFailure as e:
+        logging.warning(f"Unique match index not created, run 'python match_jobs.py compact': {e}")
+        return False
+    return True
+
+
+async def compact_matches(db) -> dict:
+    """Collapse duplicate rows of a (mentor_id, mentee_id) pair into one.
+
+    The row with the most advanced status is kept, the newest one among equals. Sessions
+    pointing at a removed row are moved to the kept one. Afterwards the unique index is created.
+    """
+    pairs = removed = sessions = 0
+    rank = {status: i for i, status in enumerate(STATUS_PRIORITY)}
+    duplicates = db.mentorship_matches.aggregate([
+        {"$group": {
+            "_id": {"mentor_id": "$mentor_id", "mentee_id": "$mentee_id"},
+            "rows": {"$push": {"_id": "$_id", "id": "$id", "status": "$status", "created_at": "$created_at"}},
+            "count": {"$sum": 1}
+        }},
+        {"$match": {"count": {"$gt": 1}}}
+    ], allowDiskUse=True)
+    async for group in duplicates:
+        rows = sorted(group["rows"], key=lambda row: row.get("created_at") or datetime.min, reverse=True)
+        rows.sort(key=lambda row: rank.get(row.get("status"), len(rank)))
+        keep, drop = rows[0], rows[1:]
+        dropped_ids = [row["id"] for row in drop if row.get("id")]
+        if dropped_ids and keep.get("id"):
+            result = await db.mentorship_sessions.update_many(
+                {"match_id": {"$in": dropped_ids}}, {"$set": {"match_id": keep["id"]}}
+            )
+            sessions += result.modified_count
+        result = await db.mentorship_matches.delete_many({"_id": {"$in": [row["_id"] for row in drop]}})
+        removed += result.deleted_count
+        pairs += 1
+    return {
+        "duplicate_pairs": pairs,
+        "rows_removed": removed,
+        "sessions_repointed": sessions,
+        "unique_index": await ensure_match_indexes(db),
+    }
+
+
+def _load_checkpoint(path: Path) -> dict:
+    try:
+        return json.loads(path.read_text())
+    except (OSError, ValueError):
+        return {}
+
+
+def _save_checkpoint(path: Path, state: dict):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix('.tmp')
+    tmp.write_text(json.dumps(state))
+    os.replace(tmp, path)
+
+
+async def compute_all_matches(db, top_n: int = 5, workers: Optional[int] = None, chunk_size: int = 200,
+                              threshold: float = MATCH_THRESHOLD, checkpoint_path: Optional[Path] = DEFAULT_CHECKPOINT,
+                              resume: bool = False, progress: Optional[Callable[[dict], None]] = None,
+                              semantic_index=None, semantic_weight: float = 0.0) -> dict:
+    """Score all mentees against all mentors and store each mentee's top N matches.
+
+    Mentees are processed in id order in chunks of ``chunk_size``; after each chunk is written
+    the last mentee id is checkpointed so an interrupted run can continue with ``resume``.
+    Pending rows of a mentee that fell out of its top N are removed; accepted and active
+    matches are never touched. With a ``semantic_weight`` the text similarity from
+    ``semantic_index`` is blended in like in MentorFeatureStore, so the stored matches are
+    the ones find_matches serves.
+    """
+    if semantic_weight and semantic_index is None:
+        raise ValueError("A semantic weight needs the semantic index the API server matches with")
+    started = time.perf_counter()
+    # Mentees are paged by id, which needs an index on large collections
+    await db.user_profiles.create_index("id")
+    await ensure_match_indexes(db)
+    state = _load_checkpoint(checkpoint_path) if resume and checkpoint_path else {}
+    last_id = state.get("last_mentee_id")
+
+    mentors = await db.user_profiles.find({"role": "mentor"}, {f: 1 for f in MENTOR_FIELDS} | {"_id": 0}).to_list(None)
+    mentee_query = {"role": "mentee"}
+    total = await db.user_profiles.count_documents(mentee_query)
+    if last_id is not None:
+        mentee_query["id"] = {"$gt": last_id}
+    fields = MENTEE_FIELDS + (SEMANTIC_FIELDS if semantic_weight else [])
+    cursor = db.user_profiles.find(mentee_query, {f: 1 for f in fields} | {"_id": 0}).sort("id", 1)
+
+    done = state.get("mentees", 0)
+    considered = 0
+    pairs = 0
+    stored = 0
+    loop = asyncio.get_running_loop()
+    workers = workers or os.cpu_count() or 1
+    # Spawned rather than forked: the job also runs inside the threaded API server
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"),
+                             initializer=_init_worker,
+                             initargs=(mentors, semantic_index.get_state() if semantic_weight else None,
+                                       semantic_weight)) as pool:
+        pending = []
+
+        async def flush(future, chunk_last_id):
+            nonlocal done, considered, pairs, stored
+            results, scored = await future
+            now = datetime.utcnow()
+            keep_ids = await session_match_ids(db, {"mentee_id": {"$in": [mentee_id for mentee_id, _ in results]}})
+            operations = []
+            for mentee_id, top in results:
+                operations.extend(mentee_match_writes(mentee_id, top, now, keep_ids))
+                stored += len(top)
+            if operations:
+                await db.mentorship_matches.bulk_write(operations, ordered=False)
+            done += len(results)
+            considered += len(results) * len(mentors)
+            pairs += scored
+            elapsed = time.perf_counter() - started
+            report = {
+                "mentees_done": done,
+                "mentees_total": total,
+                "pairs_considered": considered,
+                "pairs_scored": pairs,
+                "pairs_per_second": round(pairs / elapsed, 1) if elapsed else 0.0,
+                "elapsed_seconds": round(elapsed, 2),
+            }
+            if checkpoint_path:
+                _save_checkpoint(checkpoint_path, {"last_mentee_id": chunk_last_id, "mentees": done})
+            if progress:
+                progress(report)
+
+        chunk = []
+        async for mentee in cursor:
+            chunk.append(mentee)
+            if len(chunk) == chunk_size:
+                pending.append((loop.run_in_executor(pool, _score_mentees, chunk, top_n, threshold), chunk[-1]["id"]))
+                chunk = []
+                # Keep every worker busy while bounding the results held in memory
+                if len(pending) > workers * 2:
+                    await flush(*pending.pop(0))
+        if chunk:
+            pending.append((loop.run_in_executor(pool, _score_mentees, chunk, top_n, threshold), chunk[-1]["id"]))
+        for future, chunk_last_id in pending:
+            await flush(future, chunk_last_id)
+
+    if checkpoint_path and checkpoint_path.exists():
+        # A finished run starts from scratch next time
+        checkpoint_path.unlink()
+    elapsed = time.perf_counter() - started
+    return {
+        "mentors": len(mentors),
+        "mentees": done,
+        "pairs_considered": considered,
+        "pairs_scored": pairs,
+        "matches_stored": stored,
+        "elapsed_seconds": round(elapsed, 2),
+        "pairs_per_second": round(pairs / elapsed, 1) if elapsed else 0.0,
+    }
+
+
+async def _while_holding(lease: LeaderLease, job: Awaitable[dict]) -> Optional[dict]:
+    """Result of ``job``, renewing ``lease`` while it runs; None when the lease is lost and the job stopped"""
+    task = asyncio.ensure_future(job)
+    try:
+        while True:
+            done, _ = await asyncio.wait({task}, timeout=lease.lease_seconds / 3)
+            if done:
+                return task.result()
+            if not await lease.hold():
+                logging.warning("Match job lease taken over by another worker, job stopped")
+                return None
+    finally:
+        task.cancel()
+
+
+async def run_periodically(db, interval_seconds: float, lease: Optional[LeaderLease] = None, **kwargs):
+    """Background task recomputing all matches every ``interval_seconds``.
+
+    Every uvicorn worker starts it, so with a ``lease`` only the worker holding it runs the
+    job; the lease should outlive a few intervals, like the one of IncrementalMatchScheduler.
+    """
+    try:
+        while True:
+            await asyncio.sleep(interval_seconds)
+            try:
+                if lease is None:
+                    summary = await compute_all_matches(db, resume=True, **kwargs)
+                elif await lease.hold():
+                    summary = await _while_holding(lease, compute_all_matches(db, resume=True, **kwargs))
+                else:
+                    continue
+                if summary is not None:
+                    logging.info(f"Match job finished: {summary}")
+            except Exception as e:
+                logging.error(f"Match job error: {e}")
+    finally:
+        if lease is not None:
+            await lease.release()
+
+
+def _connect():
+    from dotenv import load_dotenv
+    from motor.motor_asyncio import AsyncIOMotorClient
+
+    load_dotenv(ROOT_DIR / '.env')
+    client = AsyncIOMotorClient(os.environ['MONGO_URL'])
+    return client, client[os.environ['DB_NAME']]
+
+
+def run(
+    top_n: int = 5,
+    workers: Optional[int] = None,
+    chunk_size: int = 200,
+    resume: bool = False,
+    checkpoint: Path = DEFAULT_CHECKPOINT,
+):
+    """Compute and store the top mentor matches of every mentee"""
+    client, db = _connect()
+    # Blend in text similarity like the API server, from the index it saves
+    semantic_weight = float(os.environ.get('SEMANTIC_MATCH_WEIGHT', '0'))
+    semantic_index = None
+    if semantic_weight > 0:
+        semantic_index = SemanticIndex(Path(os.environ.get('SEMANTIC_INDEX_PATH', ROOT_DIR / 'data' / 'semantic_index.joblib')))
+        if not semantic_index.load():
+            client.close()
+            raise SystemExit("SEMANTIC_MATCH_WEIGHT is set but no semantic index was found, start the API server first")
+
+    def report(progress: dict):
+        print(f"{progress['mentees_done']}/{progress['mentees_total']} mentees, "
+              f"{progress['pairs_per_second']} pairs/sec", flush=True)
+
+    summary = asyncio.run(compute_all_matches(
+        db, top_n=top_n, workers=workers, chunk_size=chunk_size,
+        checkpoint_path=checkpoint, resume=resume, progress=report,
+        semantic_index=semantic_index, semantic_weight=semantic_weight,
+    ))
+    print(json.dumps(summary, indent=2))
+    client.close()
+
+
+def compact():
+    """Collapse duplicate stored matches and create the unique (mentor_id, mentee_id) index"""
+    client, db = _connect()
+    print(json.dumps(asyncio.run(compact_matches(db)), indent=2))
+    client.close()
+
+
+if __name__ == "__main__":
+    import typer
+
+    app = typer.Typer(help=__doc__)
+    app.command()(run)
+    app.command()(compact)
+    app()
@@ -0,0 +1,189 @@
+import asyncio
+import logging
+import time
+from datetime import datetime
+from typing import Dict, Optional
+
+from match_jobs import MENTEE_FIELDS, mentee_match_writes, session_match_ids
+from matching import MATCH_THRESHOLD
+from reverse_matching import MenteePool, update_mentor_matches
+from single_flight import LeaderLease
+
+
+class IncrementalMatchScheduler:
+    """Background recomputation of the stored matches touched by profile changes.
+
+    Changed mentors arrive through MentorFeatureStore.listeners; changed mentees are the ones
+    whose updated_at moved past the last tick, read into the resident MenteePool. Each tick first brings every mentee's stored
+    matches up to date with the dirty mentors (one mentor x all mentees pass each), then
+    recomputes the top N of the dirty mentees (one mentee x all mentors pass each). At most
+    ``max_pairs`` pairs are scored per tick; whatever does not fit stays dirty for the next.
+    A full reload of the mentor pool carries no change information and is left to the
+    periodic full match job.
+
+    Every uvicorn worker sees the same changes, so with a ``lease`` only the worker holding
+    it ticks. The others keep the changes of the last two intervals, which the leader has
+    had time to process, and pick them up if they take the lease over. Mentor changes are
+    scored by update_mentor_matches, so it does not run with a semantic weight.
+    """
+
+    def __init__(self, db, mentor_store, interval_seconds: float = 60.0, max_pairs: int = 2_000_000,
+                 top_n: int = 5, threshold: float = MATCH_THRESHOLD, lease: Optional[LeaderLease] = None,
+                 mentees: Optional[MenteePool] = None, semantic_weight: float = 0.0):
+        self.db = db
+        self.mentor_store = mentor_store
+        self.interval_seconds = interval_seconds
+        self.max_pairs = max_pairs
+        self.top_n = top_n
+        self.threshold = threshold
+        self.lease = lease
+        self.semantic_weight = semantic_weight
+        self.mentees = mentees if mentees is not None else MenteePool(db)
+        self.dirty_mentors: Dict[str, Optional[dict]] = {}
+        self.dirty_mentees = set()
+        self.watermark = datetime.utcnow()
+        # Changes of the previous interval while another worker leads, and when it began
+        self._standby_mentors: Dict[str, Optional[dict]] = {}
+        self._standby_since = self.watermark
+        self.totals = {"ticks": 0, "standby_ticks": 0, "pairs_scored": 0, "full_recompute_pairs": 0}
+        self.last_tick: Optional[dict] = None
+
+    def mentor_changed(self, mentor_id: Optional[str], mentor: Optional[dict]):
+        if mentor_id is not None:
+            self.dirty_mentors[mentor_id] = mentor
+
+    async def _collect_mentees(self):
+        """Bring the resident mentees up to date and mark the ones edited since the watermark.
+
+        The pool is refreshed by other callers too and a worker taking the lease over rewinds
+        the watermark, so edited mentees are read off the scheduler's own watermark rather
+        than taken from what this refresh applied.
+        """
+        await self.mentees.refresh()
+        edited = self.db.user_profiles.find({"role": "mentee", "updated_at": {"$gt": self.watermark}},
+                                            {"_id": 0, "id": 1, "updated_at": 1})
+        async for profile in edited:
+            if profile.get("id") in self.mentees.matrix.row_of:
+                self.dirty_mentees.add(profile["id"])
+            self.watermark = max(self.watermark, profile["updated_at"])
+
+    async def _remove_mentor(self, mentor_id: str):
+        """Drop a removed mentor's pending matches without sessions; the mentees losing one get refilled"""
+        stale = {"mentor_id": mentor_id, "status": "pending",
+                 "id": {"$nin": list(await session_match_ids(self.db, {"mentor_id": mentor_id}))}}
+        mentee_ids = await self.db.mentorship_matches.distinct("mentee_id", stale)
+        await self.db.mentorship_matches.delete_many(stale)
+        self.dirty_mentees.update(mentee_ids)
+
+    async def _recompute_mentee(self, mentee_id: str):
+        mentee = await self.db.user_profiles.find_one({"id": mentee_id, "role": "mentee"}, {f: 1 for f in MENTEE_FIELDS} | {"_id": 0})
+        if mentee is None:
+            return
+        top = await self.mentor_store.top_matches(mentee, self.top_n, self.threshold)
+        await self.db.mentorship_matches.bulk_write(mentee_match_writes(
+            mentee_id, [(mentor["id"], score, reasons) for mentor, score, reasons in top], datetime.utcnow(),
+            await session_match_ids(self.db, {"mentee_id": mentee_id})
+        ), ordered=False)
+
+    async def tick(self) -> dict:
+        """Process as much of the dirty set as the pair budget allows"""
+        async with self.mentees.lock:
+            return await self._tick()
+
+    async def _tick(self) -> dict:
+        started = time.perf_counter()
+        await self._collect_mentees()
+        matrix = self.mentees.matrix
+        mentors = len(self.mentor_store.profiles)
+        mentees = len(matrix)
+        budget = self.max_pairs
+        pairs = mentors_done = mentees_done = removed = 0
+
+        for mentor_id in list(self.dirty_mentors):
+            # The first item of a tick always runs so that a huge pool cannot stall the queue
+            if pairs and pairs + mentees > budget:
+                break
+            mentor = self.dirty_mentors.pop(mentor_id)
+            if mentor is None:
+                await self._remove_mentor(mentor_id)
+                removed += 1
+                continue
+            summary = await update_mentor_matches(self.db, mentor, matrix, self.top_n, self.threshold,
+                                                  self.mentees.batch_size, self.semantic_weight)
+            self.dirty_mentees.update(summary["recompute"])
+            pairs += len(matrix)
+            mentors_done += 1
+
+        for mentee_id in list(self.dirty_mentees):
+            if pairs and pairs + mentors > budget:
+                break
+            self.dirty_mentees.discard(mentee_id)
+            await self._recompute_mentee(mentee_id)
+            pairs += mentors
+            mentees_done += 1
+
+        # A full recompute would rescore every pair whenever anything changed
+        full = mentors * mentees if pairs or removed else 0
+        self.totals["ticks"] += 1
+        self.totals["pairs_scored"] += pairs
+        self.totals["full_recompute_pairs"] += full
+        self.last_tick = {
+            "mentors_processed": mentors_done,
+            "mentees_processed": mentees_done,
+            "mentors_removed": removed,
+            "pairs_scored": pairs,
+            "full_recompute_pairs": full,
+            "skipped_ratio": round(1 - pairs / full, 4) if full else 0.0,
+            "mentors_pending": len(self.dirty_mentors),
+            "mentees_pending": len(self.dirty_mentees),
+            "elapsed_seconds": round(time.perf_counter() - started, 3),
+        }
+        return self.last_tick
+
+    def _standby(self):
+        """Forget the changes the leader has had a full interval to process"""
+        now = datetime.utcnow()
+        self._standby_mentors, self.dirty_mentors = self.dirty_mentors, {}
+        self.watermark, self._standby_since = self._standby_since, now
+        self.totals["standby_ticks"] += 1
+
+    def _take_over(self):
+        logging.info("Taking over incremental match recomputation")
+        self.dirty_mentors = {**self._standby_mentors, **self.dirty_mentors}
+        self._standby_mentors = {}
+
+    async def run_forever(self):
+        if self.semantic_weight:
+            logging.error("Incremental match recomputation not started: reverse matching has no semantic component")
+            return
+        try:
+            while True:
+                await asyncio.sleep(self.interval_seconds)
+                try:
+                    if self.lease is not None:
+                        leading = self.lease.held
+                        if not await self.lease.hold():
+                            self._standby()
+                            continue
+                        if not leading:
+                            self._take_over()
+                    report = await self.tick()
+                    if report["pairs_scored"]:
+                        logging.info(f"Incremental match recomputation: {report}")
+                except Exception as e:
+                    logging.error(f"Incremental match recomputation error: {e}")
+        finally:
+            if self.lease is not None:
+                await self.lease.release()
+
+    def stats(self) -> dict:
+        full = self.totals["full_recompute_pairs"]
+        return {
+            **self.totals,
+            "skipped_ratio": round(1 - self.totals["pairs_scored"] / full, 4) if full else 0.0,
+            "mentors_pending": len(self.dirty_mentors),
+            "mentees_pending": len(self.dirty_mentees),
+            "leader": self.lease.held if self.lease is not None else True,
+            "mentee_pool": self.mentees.stats(),
+            "last_tick": self.last_tick,
+        }
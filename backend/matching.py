@@ -0,0 +1,734 @@
+import copy
+import heapq
+import logging
+import pickle
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+# Minimum score a mentor needs to be suggested to a mentee
+MATCH_THRESHOLD = 0.3
+
+COMPATIBLE_STYLES = {
+    'collaborative': ['collaborative', 'analytical'],
+    'direct': ['direct', 'analytical'],
+    'analytical': ['analytical', 'collaborative', 'direct'],
+    'creative': ['creative', 'collaborative']
+}
+
+# Largest integer a float64 column holds exactly
+_MAX_EXACT_INT = 2 ** 53
+
+# The most frequent skill and interest codes, up to this many, get packed per-mentor bitsets;
+# overlaps with the rarer codes are counted from their short postings lists
+BITSET_MAX_CODES = 1024
+
+# Set bits per byte, for NumPy versions without np.bitwise_count
+_POPCOUNT_TABLE = np.array([bin(i).count('1') for i in range(256)], dtype=np.uint8)
+
+
+def _score_components(mentor_profile: dict, mentee_profile: dict, reasons: Optional[List[str]]) -> float:
+    """Unrounded match score; reasons are only formatted when a list is passed in"""
+    score = 0.0
+
+    # Industry alignment (20%)
+    if mentor_profile.get('industry') == mentee_profile.get('industry'):
+        score += 0.2
+        if reasons is not None:
+            reasons.append(f"Same industry: {mentor_profile.get('industry')}")
+
+    # Experience gap (15%) - mentor should have more experience
+    exp_gap = mentor_profile.get('experience_years', 0) - mentee_profile.get('experience_years', 0)
+    if exp_gap >= 3:
+        score += 0.15
+        if reasons is not None:
+            reasons.append(f"Good experience gap: {exp_gap} years")
+    elif exp_gap >= 1:
+        score += 0.1
+        if reasons is not None:
+            reasons.append(f"Moderate experience gap: {exp_gap} years")
+
+    # Skills overlap (25%)
+    mentor_skills = set(mentor_profile.get('skills', []))
+    mentee_goals_skills = set()
+    for goal in mentee_profile.get('goals', []):
+        mentee_goals_skills.update(goal.lower().split())
+
+    skill_overlap = len(mentor_skills.intersection(mentee_goals_skills))
+    if skill_overlap > 0:
+        skill_score = min(skill_overlap / 5, 0.25)
+        score += skill_score
+        if reasons is not None:
+            reasons.append(f"Skills alignment: {skill_overlap} matching areas")
+
+    # Communication style compatibility (15%)
+    mentor_style = mentor_profile.get('ai_analysis', {}).get('communication_style', '')
+    mentee_style = mentee_profile.get('ai_analysis', {}).get('communication_style', '')
+    if mentor_style and mentee_style:
+        if mentee_style in COMPATIBLE_STYLES.get(mentor_style, []):
+            score += 0.15
+            if reasons is not None:
+                reasons.append(f"Compatible communication styles: {mentor_style}-{mentee_style}")
+
+    # Interest alignment (15%)
+    mentor_interests = set(mentor_profile.get('interests', []))
+    mentee_interests = set(mentee_profile.get('interests', []))
+    interest_overlap = len(mentor_interests.intersection(mentee_interests))
+    if interest_overlap > 0:
+        interest_score = min(interest_overlap / 3, 0.15)
+        score += interest_score
+        if reasons is not None:
+            reasons.append(f"Shared interests: {interest_overlap} common areas")
+
+    # Mentorship readiness (10%)
+    mentor_readiness = mentor_profile.get('ai_analysis', {}).get('mentorship_readiness', 5)
+    mentee_readiness = mentee_profile.get('ai_analysis', {}).get('mentorship_readiness', 5)
+    readiness_score = (mentor_readiness + mentee_readiness) / 20
+    score += readiness_score * 0.1
+    return score
+
+
+def match_score(mentor_profile: dict, mentee_profile: dict) -> float:
+    """Score of calculate_match_score without building the reasons"""
+    try:
+        return round(_score_components(mentor_profile, mentee_profile, None), 2)
+    except Exception as e:
+        logging.error(f"Match score calculation error: {e}")
+        return 0.5
+
+
+def calculate_match_score(mentor_profile: dict, mentee_profile: dict) -> tuple[float, List[str]]:
+    """Calculate mentorship match score using AI and similarity algorithms"""
+    try:
+        reasons = []
+        score = _score_components(mentor_profile, mentee_profile, reasons)
+        return round(score, 2), reasons
+    except Exception as e:
+        logging.error(f"Match score calculation error: {e}")
+        return 0.5, ["Basic compatibility assessment"]
+
+
+def explain_match(mentor_profile: dict, mentee_profile: dict) -> List[str]:
+    """Reasons of calculate_match_score, meant for the few mentors that are actually shown"""
+    return calculate_match_score(mentor_profile, mentee_profile)[1]
+
+
+def _is_number(value) -> bool:
+    return isinstance(value, (int, float)) and not (isinstance(value, int) and abs(value) >= _MAX_EXACT_INT)
+
+
+def _is_str_list(value) -> bool:
+    return isinstance(value, list) and all(isinstance(item, str) for item in value)
+
+
+def _is_plain_mentor(mentor: dict) -> bool:
+    """Whether a mentor only holds values the vectorized scorer reproduces exactly"""
+    analysis = mentor.get('ai_analysis', {})
+    if not isinstance(analysis, dict):
+        return False
+    style = analysis.get('communication_style', '')
+    return (
+        isinstance(mentor.get('industry'), (str, type(None)))
+        and _is_number(mentor.get('experience_years', 0))
+        and _is_str_list(mentor.get('skills', []))
+        and _is_str_list(mentor.get('interests', []))
+        and (isinstance(style, str) or not style)
+        and _is_number(analysis.get('mentorship_readiness', 5))
+    )
+
+
+def _round2(raw: np.ndarray) -> np.ndarray:
+    """Vectorized round(x, 2) that agrees with Python's round on every input"""
+    rounded = np.round(raw, 2)
+    scaled = raw * 100
+    # np.round and round() can only disagree next to a .5 boundary
+    for i in np.flatnonzero(np.abs(scaled - np.floor(scaled) - 0.5) < 1e-6):
+        rounded[i] = round(float(raw[i]), 2)
+    return rounded
+
+
+class _Vocab(dict):
+    """Maps hashable values to dense integer codes"""
+
+    def code(self, value) -> int:
+        code = self.get(value)
+        if code is None:
+            code = self[value] = len(self)
+        return code
+
+
+class MentorFeatureMatrix:
+    """Mentor pool encoded as NumPy columns so a mentee is scored against every mentor in one pass.
+
+    Scores are identical to calculate_match_score. Mentors holding values the columns cannot
+    represent exactly (e.g. a non-numeric mentorship_readiness) are kept aside and scored with
+    calculate_match_score directly.
+
+    ``apply`` derives the matrix of a changed pool by re-encoding only the changed rows. Rows
+    keep their positions across it, so a removed mentor leaves an empty row (a None profile)
+    that is never scored, until a matrix is built anew from the live profiles.
+    """
+
+    def __init__(self, mentors: List[Optional[dict]], pruning: Optional[Dict[str, int]] = None):
+        self.profiles = mentors
+        self.ids = [mentor.get('id') if mentor is not None else None for mentor in mentors]
+        self.row_of = {mentor.get('id'): row for row, mentor in enumerate(mentors) if mentor is not None}
+        self.industries = _Vocab()
+        self.skills = _Vocab()
+        self.interests = _Vocab()
+        self.styles = _Vocab()
+        self.exotic: Dict[int, dict] = {}
+
+        size = len(mentors)
+        self.industry_codes = np.full(size, -1, dtype=np.int32)
+        self.experience = np.zeros(size, dtype=np.float64)
+        self.style_codes = np.full(size, -1, dtype=np.int32)
+        self.readiness = np.zeros(size, dtype=np.float64)
+        # False for the rows left empty by removed mentors
+        self.live = np.array([mentor is not None for mentor in mentors], dtype=bool)
+        pairs = ([], [], [], [])
+
+        for row, mentor in enumerate(mentors):
+            if mentor is not None:
+                self._encode(row, mentor, *pairs)
+        skill_rows, skill_ids, interest_rows, interest_ids = (np.array(values, dtype=np.int32) for values in pairs)
+
+        # Inverted indexes from skill and interest codes to mentor rows
+        self.skill_postings = _Postings(skill_ids, skill_rows, len(self.skills))
+        self.interest_postings = _Postings(interest_ids, interest_rows, len(self.interests))
+        # Packed bitsets of the most frequent codes, for counting overlaps on small row sets
+        self.skill_bits = _Bitsets.build(self.skill_postings, len(self.skills), size)
+        self.interest_bits = _Bitsets.build(self.interest_postings, len(self.interests), size)
+        self._index()
+        # Candidates scored vs. skipped by pruning, can be shared across rebuilds of a pool
+        self.pruning = pruning if pruning is not None else {"scored": 0, "skipped": 0}
+
+    def _encode(self, row: int, mentor: dict, skill_rows: list, skill_ids: list, interest_rows: list,
+                interest_ids: list):
+        """Fill the columns of one row and collect its skill and interest (row, code) pairs"""
+        if not _is_plain_mentor(mentor):
+            self.exotic[row] = mentor
+            return
+        analysis = mentor.get('ai_analysis', {})
+        self.industry_codes[row] = self.industries.code(mentor.get('industry'))
+        self.experience[row] = mentor.get('experience_years', 0)
+        style = analysis.get('communication_style', '')
+        if style:
+            self.style_codes[row] = self.styles.code(style)
+        self.readiness[row] = analysis.get('mentorship_readiness', 5)
+        for skill in set(mentor.get('skills', [])):
+            skill_rows.append(row)
+            skill_ids.append(self.skills.code(skill))
+        for interest in set(mentor.get('interests', [])):
+            interest_rows.append(row)
+            interest_ids.append(self.interests.code(interest))
+
+    def _index(self):
+        """Industry index, pruning bounds and style table derived from the columns"""
+        plain = np.flatnonzero(self.industry_codes >= 0).astype(np.int32)
+        self.industry_postings = _Postings(self.industry_codes[plain], plain, len(self.industries))
+        self._plain_rows = plain
+        self._max_experience = float(self.experience[plain].max()) if len(plain) else 0.0
+        self._max_readiness = float(self.readiness[plain].max()) if len(plain) else 0.0
+        # Compatibility table of every known mentor style, filled per mentee style
+        self._style_names = list(self.styles)
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    @property
+    def empty_rows(self) -> int:
+        """Rows left behind by mentors removed through apply"""
+        return len(self.ids) - len(self.row_of)
+
+    def apply(self, upserts: Iterable[dict] = (), removals: Iterable[str] = ()) -> 'MentorFeatureMatrix':
+        """A copy with mentors added, replaced or removed, encoding only their rows.
+
+        A replaced mentor keeps its row, a new one is appended and a removed one leaves its
+        row empty. Vocabulary codes are only ever added, and codes new since the build get
+        no bitset bit; both are tidied up by building a matrix anew. This matrix is left
+        untouched for readers still using it.
+        """
+        matrix = copy.copy(self)
+        matrix.profiles, matrix.ids, matrix.row_of = list(self.profiles), list(self.ids), dict(self.row_of)
+        for name in ('industries', 'skills', 'interests', 'styles'):
+            setattr(matrix, name, _Vocab(getattr(self, name)))
+        matrix.exotic = dict(self.exotic)
+        changed = []
+        for mentor_id in removals:
+            row = matrix.row_of.pop(mentor_id, None)
+            if row is not None:
+                matrix.profiles[row] = matrix.ids[row] = None
+                changed.append(row)
+        for mentor in upserts:
+            row = matrix.row_of.get(mentor.get('id'))
+            if row is None:
+                row = matrix.row_of[mentor.get('id')] = len(matrix.ids)
+                matrix.ids.append(mentor.get('id'))
+                matrix.profiles.append(None)
+            matrix.profiles[row] = mentor
+            changed.append(row)
+
+        added = len(matrix.ids) - len(self.ids)
+        for name, fill, dtype in (('industry_codes', -1, np.int32), ('experience', 0, np.float64),
+                                  ('style_codes', -1, np.int32), ('readiness', 0, np.float64), ('live', False, bool)):
+            column = np.concatenate([getattr(self, name), np.full(added, fill, dtype=dtype)])
+            column[changed] = fill
+            setattr(matrix, name, column)
+        changed = np.unique(np.array(changed, dtype=np.int64))
+        pairs = ([], [], [], [])
+        for row in changed:
+            mentor = matrix.profiles[row]
+            matrix.exotic.pop(int(row), None)
+            if mentor is not None:
+                matrix.live[row] = True
+                matrix._encode(int(row), mentor, *pairs)
+        skill_rows, skill_ids, interest_rows, interest_ids = (np.array(values, dtype=np.int32) for values in pairs)
+
+        matrix.skill_postings = self.skill_postings.replace_rows(changed, skill_ids, skill_rows, len(matrix.skills))
+        matrix.interest_postings = self.interest_postings.replace_rows(changed, interest_ids, interest_rows,
+                                                                       len(matrix.interests))
+        for name, ids, rows, vocab in (('skill_bits', skill_ids, skill_rows, matrix.skills),
+                                       ('interest_bits', interest_ids, interest_rows, matrix.interests)):
+            bitsets = getattr(self, name)
+            if bitsets is not None:
+                setattr(matrix, name, bitsets.replace_rows(changed, ids, rows, len(vocab), len(matrix)))
+        matrix._index()
+        return matrix
+
+    # Arrays written by save; postings are stored as their rows and indptr
+    _COLUMNS = ('industry_codes', 'experience', 'style_codes', 'readiness', '_plain_rows')
+    _POSTINGS = ('industry_postings', 'skill_postings', 'interest_postings')
+    _BITSETS = ('skill_bits', 'interest_bits')
+
+    def save(self, directory: Path):
+        """Write the matrix as .npy arrays plus a pickle of the profiles and vocabularies"""
+        directory.mkdir(parents=True, exist_ok=True)
+        for name in self._COLUMNS:
+            np.save(directory / f"{name}.npy", getattr(self, name))
+        for name in self._POSTINGS:
+            np.save(directory / f"{name}.rows.npy", getattr(self, name).rows)
+            np.save(directory / f"{name}.indptr.npy", getattr(self, name).indptr)
+        for name in self._BITSETS:
+            if getattr(self, name) is not None:
+                np.save(directory / f"{name}.npy", getattr(self, name).bits)
+                np.save(directory / f"{name}.slots.npy", getattr(self, name).slots)
+        meta = {
+            "profiles": self.profiles,
+            "vocabularies": {name: list(getattr(self, name)) for name in ('industries', 'skills', 'interests', 'styles')},
+            "exotic": sorted(self.exotic),
+        }
+        with open(directory / "meta.pkl", "wb") as f:
+            pickle.dump(meta, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+    @classmethod
+    def load(cls, directory: Path, mmap_mode: Optional[str] = 'r') -> 'MentorFeatureMatrix':
+        """Matrix written by save, with its arrays memory-mapped read-only by default"""
+        with open(directory / "meta.pkl", "rb") as f:
+            meta = pickle.load(f)
+        matrix = cls.__new__(cls)
+        matrix.profiles = meta["profiles"]
+        matrix.ids = [mentor.get('id') if mentor is not None else None for mentor in matrix.profiles]
+        matrix.row_of = {mentor_id: row for row, mentor_id in enumerate(matrix.ids) if mentor_id is not None}
+        matrix.live = np.array([mentor_id is not None for mentor_id in matrix.ids], dtype=bool)
+        for name, values in meta["vocabularies"].items():
+            setattr(matrix, name, _Vocab((value, code) for code, value in enumerate(values)))
+        matrix.exotic = {row: matrix.profiles[row] for row in meta["exotic"]}
+        for name in cls._COLUMNS:
+            setattr(matrix, name, np.load(directory / f"{name}.npy", mmap_mode=mmap_mode))
+        for name in cls._POSTINGS:
+            setattr(matrix, name, _Postings.from_arrays(
+                np.load(directory / f"{name}.rows.npy", mmap_mode=mmap_mode),
+                np.load(directory / f"{name}.indptr.npy", mmap_mode=mmap_mode),
+            ))
+        for name in cls._BITSETS:
+            path = directory / f"{name}.npy"
+            if not (path.exists() and (directory / f"{name}.slots.npy").exists()):
+                setattr(matrix, name, None)
+                continue
+            setattr(matrix, name, _Bitsets(np.load(path, mmap_mode=mmap_mode),
+                                           np.load(directory / f"{name}.slots.npy", mmap_mode=mmap_mode)))
+        plain = matrix._plain_rows
+        matrix._max_experience = float(matrix.experience[plain].max()) if len(plain) else 0.0
+        matrix._max_readiness = float(matrix.readiness[plain].max()) if len(plain) else 0.0
+        matrix._style_names = list(matrix.styles)
+        matrix.pruning = {"scored": 0, "skipped": 0}
+        return matrix
+
+    def memory_bytes(self) -> int:
+        """Size of the scoring columns, indexes and bitsets, without the profile dicts"""
+        arrays = [self.industry_codes, self.experience, self.style_codes, self.readiness, self._plain_rows]
+        for postings in (self.industry_postings, self.skill_postings, self.interest_postings):
+            arrays += [postings.rows, postings.indptr]
+        for bitsets in (self.skill_bits, self.interest_bits):
+            if bitsets is not None:
+                arrays += [bitsets.bits, bitsets.slots]
+        return sum(array.nbytes for array in arrays)
+
+    def _prepare(self, mentee: dict) -> Optional['_MenteeQuery']:
+        """Mentee side of the score, or None when every pair would fail in calculate_match_score"""
+        try:
+            analysis = mentee.get('ai_analysis', {})
+            mentee_style = analysis.get('communication_style', '')
+            mentee_readiness = analysis.get('mentorship_readiness', 5)
+            mentee_experience = mentee.get('experience_years', 0)
+            goal_words = set()
+            for goal in mentee.get('goals', []):
+                goal_words.update(goal.lower().split())
+            mentee_interests = set(mentee.get('interests', []))
+            if not (_is_number(mentee_readiness) and _is_number(mentee_experience)):
+                raise TypeError("non-numeric mentee readiness or experience")
+        except Exception as e:
+            logging.error(f"Match score calculation error: {e}")
+            return None
+        try:
+            industry_code = self.industries.get(mentee.get('industry'), -2)
+        except TypeError:
+            industry_code = -2
+        skill_codes = _codes(goal_words, self.skills)
+        interest_codes = _codes(mentee_interests, self.interests)
+        compatible = None
+        if mentee_style and self._style_names:
+            compatible = np.array([mentee_style in COMPATIBLE_STYLES.get(style, []) for style in self._style_names])
+        return _MenteeQuery(
+            mentee=mentee,
+            industry_code=industry_code,
+            experience=mentee_experience,
+            readiness=mentee_readiness,
+            compatible=compatible,
+            skill_codes=skill_codes,
+            interest_codes=interest_codes,
+            industry=self.industry_postings.rows_of([industry_code]),
+            skills=None,
+            interests=None,
+        )
+
+    def _skill_counts(self, query: '_MenteeQuery', rows: np.ndarray) -> np.ndarray:
+        if query.skills is None and self.skill_bits is not None and len(rows) * 4 <= len(self):
+            if query.skill_bits is None:
+                query.skill_bits = _bit_query(self.skill_bits, self.skill_postings, query.skill_codes)
+            return _bit_counts(self.skill_bits, rows, *query.skill_bits)
+        if query.skills is None:
+            query.skills = self.skill_postings.counts(query.skill_codes)
+        return _counts_at(rows, *query.skills)
+
+    def _interest_counts(self, query: '_MenteeQuery', rows: np.ndarray) -> np.ndarray:
+        if query.interests is None and self.interest_bits is not None and len(rows) * 4 <= len(self):
+            if query.interest_bits is None:
+                query.interest_bits = _bit_query(self.interest_bits, self.interest_postings, query.interest_codes)
+            return _bit_counts(self.interest_bits, rows, *query.interest_bits)
+        if query.interests is None:
+            query.interests = self.interest_postings.counts(query.interest_codes)
+        return _counts_at(rows, *query.interests)
+
+    def _score_rows(self, query: '_MenteeQuery', rows: np.ndarray, semantic: Optional[np.ndarray],
+                    semantic_weight: float) -> np.ndarray:
+        """Scores of the mentors at the given ascending rows"""
+        size = len(rows)
+        score = np.zeros(size, dtype=np.float64)
+
+        # Industry alignment (20%)
+        score += np.where(self.industry_codes[rows] == query.industry_code, 0.2, 0.0)
+
+        # Experience gap (15%)
+        exp_gap = self.experience[rows] - query.experience
+        score += np.where(exp_gap >= 3, 0.15, np.where(exp_gap >= 1, 0.1, 0.0))
+
+        # Skills overlap (25%)
+        score += np.minimum(self._skill_counts(query, rows) / 5, 0.25)
+
+        # Communication style compatibility (15%)
+        if query.compatible is not None:
+            style_codes = self.style_codes[rows]
+            has_style = style_codes >= 0
+            style_match = np.zeros(size, dtype=bool)
+            style_match[has_style] = query.compatible[style_codes[has_style]]
+            score += np.where(style_match, 0.15, 0.0)
+
+        # Interest alignment (15%)
+        score += np.minimum(self._interest_counts(query, rows) / 3, 0.15)
+
+        # Mentorship readiness (10%)
+        score += (self.readiness[rows] + query.readiness) / 20 * 0.1
+
+        use_semantic = semantic is not None and semantic_weight
+        if use_semantic:
+            score += semantic_weight * semantic[rows]
+        scores = _round2(score)
+        if self.exotic:
+            for i in np.flatnonzero(np.isin(rows, list(self.exotic))):
+                row = int(rows[i])
+                scores[i] = match_score(self.exotic[row], query.mentee)
+                if use_semantic:
+                    scores[i] = round(scores[i] + semantic_weight * semantic[row], 2)
+        return scores
+
+    def score(self, mentee: dict, semantic: Optional[np.ndarray] = None, semantic_weight: float = 0.0,
+              start: int = 0, stop: Optional[int] = None) -> np.ndarray:
+        """Match scores of the mentors in rows ``start:stop`` for a mentee, in pool order.
+
+        ``semantic`` holds per-mentor text similarities for the whole pool; when given with a
+        non-zero weight they are added to the score before rounding.
+        """
+        stop = len(self) if stop is None else min(stop, len(self))
+        query = self._prepare(mentee)
+        if query is None:
+            scores = np.full(stop - start, 0.5)
+        else:
+            scores = self._score_rows(query, np.arange(start, stop), semantic, semantic_weight)
+        # Rows of removed mentors never clear a threshold
+        scores[~self.live[start:stop]] = -np.inf
+        return scores
+
+    def candidate_rows(self, query: '_MenteeQuery', threshold: float, semantic: Optional[np.ndarray] = None,
+                       semantic_weight: float = 0.0) -> np.ndarray:
+        """Rows whose best-case score can clear the threshold, ascending.
+
+        Mentors sharing an industry, skill or interest with the mentee are found through the
+        inverted indexes. All other mentors can at most collect the experience, style,
+        readiness and semantic parts, and are skipped together when that bound cannot clear
+        the threshold.
+        """
+        if query.skills is None:
+            query.skills = self.skill_postings.counts(query.skill_codes)
+        if query.interests is None:
+            query.interests = self.interest_postings.counts(query.interest_codes)
+        touched = np.union1d(query.industry, np.union1d(query.skills[0], query.interests[0]))
+        rows = [touched, np.array(sorted(self.exotic), dtype=np.int64)]
+        bound = 0.0
+        exp_gap = self._max_experience - query.experience
+        bound += 0.15 if exp_gap >= 3 else 0.1 if exp_gap >= 1 else 0.0
+        if query.compatible is not None and query.compatible.any():
+            bound += 0.15
+        bound += (self._max_readiness + query.readiness) / 20 * 0.1
+        if semantic is not None and semantic_weight and len(semantic):
+            bound += semantic_weight * float(semantic.max())
+        # The epsilon absorbs summation-order differences to the exact score
+        if round(bound + 1e-9, 2) > threshold:
+            rows.append(np.setdiff1d(self._plain_rows, touched, assume_unique=True))
+        candidates = np.unique(np.concatenate(rows)).astype(np.int64)
+        self.pruning["scored"] += len(candidates)
+        self.pruning["skipped"] += len(self.row_of) - len(candidates)
+        return candidates
+
+    def top_rows(self, mentee: dict, limit: int, threshold: float = MATCH_THRESHOLD,
+                 semantic: Optional[np.ndarray] = None, semantic_weight: float = 0.0,
+                 batch_size: int = 1000, prune: bool = True, ann=None,
+                 ann_candidates: int = 300) -> List[Tuple[float, int]]:
+        """Best rows above the threshold as (score, row), ordered like a stable sort by score.
+
+        With ``prune`` only mentors whose best-case score clears the threshold are scored; the
+        result is the same as scoring every mentor. With an ``ann`` index (see ann.IVFIndex)
+        only about ``ann_candidates`` retrieved mentors are scored, which is approximate.
+        Candidates are scored ``batch_size`` rows at a time and only the best ``limit`` rows
+        are kept.
+        """
+        query = self._prepare(mentee)
+        if query is None:
+            rows = np.flatnonzero(self.live)
+        elif ann is not None:
+            rows = np.union1d(ann.search(query, ann_candidates), np.array(sorted(self.exotic), dtype=np.int64))
+        elif prune:
+            rows = self.candidate_rows(query, threshold, semantic, semantic_weight)
+        else:
+            rows = np.flatnonzero(self.live)
+        best = TopK(limit)
+        for start in range(0, len(rows), batch_size):
+            batch = rows[start:start + batch_size]
+            scores = np.full(len(batch), 0.5) if query is None else self._score_rows(query, batch, semantic, semantic_weight)
+            candidates = np.flatnonzero(scores > threshold)
+            # Only a batch's own top rows can make it into the overall top
+            for i in candidates[np.argsort(-scores[candidates], kind='stable')][:limit]:
+                best.push(float(scores[i]), int(batch[i]))
+        return best.items()
+
+    def top_matches(self, mentee: dict, limit: int, threshold: float = MATCH_THRESHOLD,
+                    semantic: Optional[np.ndarray] = None, semantic_weight: float = 0.0,
+                    **options) -> List[Tuple[dict, float, List[str]]]:
+        """Best mentors above the threshold as (mentor, score, reasons), see top_rows for the options"""
+        top = self.top_rows(mentee, limit, threshold, semantic, semantic_weight, **options)
+        return self.explain_rows(mentee, top, semantic, semantic_weight)
+
+    def explain_rows(self, mentee: dict, top: List[Tuple[float, int]], semantic: Optional[np.ndarray] = None,
+                     semantic_weight: float = 0.0) -> List[Tuple[dict, float, List[str]]]:
+        """(mentor, score, reasons) of top_rows results; rows of removed mentors are left out"""
+        results = []
+        for score, row in top:
+            mentor = self.profiles[row] if row < len(self.profiles) else None
+            if mentor is None:
+                continue
+            # Reasons are only built for the mentors that are actually returned
+            reasons = explain_match(mentor, mentee)
+            if semantic is not None and semantic_weight and semantic[row] > 0:
+                reasons.append(f"Similar profile focus: {round(float(semantic[row]) * 100)}% text similarity")
+            results.append((mentor, score, reasons))
+        return results
+
+
+class _MenteeQuery:
+    __slots__ = ('mentee', 'industry_code', 'experience', 'readiness', 'compatible', 'skill_codes', 'interest_codes',
+                 'industry', 'skills', 'interests', 'skill_bits', 'interest_bits')
+
+    def __init__(self, **values):
+        self.skill_bits = self.interest_bits = None
+        for name, value in values.items():
+            setattr(self, name, value)
+
+
+class _Postings:
+    """Inverted index from value codes to the ascending mentor rows holding them"""
+
+    def __init__(self, codes: np.ndarray, rows: np.ndarray, size: int):
+        order = np.argsort(codes, kind='stable')
+        self.rows = rows[order]
+        self.indptr = np.zeros(size + 1, dtype=np.int64)
+        self.indptr[1:] = np.cumsum(np.bincount(codes, minlength=size))
+
+    @classmethod
+    def from_arrays(cls, rows: np.ndarray, indptr: np.ndarray) -> '_Postings':
+        postings = cls.__new__(cls)
+        postings.rows = rows
+        postings.indptr = indptr
+        return postings
+
+    def replace_rows(self, changed: np.ndarray, codes: np.ndarray, rows: np.ndarray, size: int) -> '_Postings':
+        """Postings with the entries of the changed rows replaced by the given (code, row) pairs"""
+        old_codes = np.repeat(np.arange(len(self.indptr) - 1, dtype=np.int64), np.diff(self.indptr))
+        keep = ~np.isin(self.rows, changed)
+        # Entries are ordered by (code, row); the few new ones are merged in without a full sort
+        width = int(max(self.rows.max(initial=-1), rows.max(initial=-1))) + 1
+        kept = old_codes[keep] * width + self.rows[keep]
+        added = np.sort(codes.astype(np.int64) * width + rows)
+        keys = np.insert(kept, np.searchsorted(kept, added), added)
+        indptr = np.zeros(size + 1, dtype=np.int64)
+        indptr[1:] = np.cumsum(np.bincount(keys // width, minlength=size))
+        return _Postings.from_arrays((keys % width).astype(np.int32), indptr)
+
+    def rows_of(self, codes) -> np.ndarray:
+        parts = [self.rows[self.indptr[code]:self.indptr[code + 1]] for code in codes if code >= 0]
+        return np.concatenate(parts).astype(np.int64) if parts else np.zeros(0, dtype=np.int64)
+
+    def counts(self, codes: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Rows holding any of the codes, with how many of them each row holds"""
+        rows, counts = np.unique(self.rows_of(codes), return_counts=True)
+        return rows, counts.astype(np.float64)
+
+
+class _Bitsets:
+    """Per-row packed bitsets of the most frequent value codes; overlaps are popcounts of a & b.
+
+    ``slots`` maps each code to its bit, or -1 for codes left out. Codes without a bit are
+    counted from the postings, which are short for rare codes.
+    """
+
+    def __init__(self, bits: np.ndarray, slots: np.ndarray):
+        self.bits = bits
+        self.slots = slots
+
+    @classmethod
+    def build(cls, postings: _Postings, vocab_size: int, size: int,
+              max_codes: int = BITSET_MAX_CODES) -> Optional['_Bitsets']:
+        if not max_codes:
+            return None
+        frequency = np.diff(postings.indptr)
+        kept = np.sort(np.argsort(-frequency, kind='stable')[:max_codes])
+        slots = np.full(vocab_size, -1, dtype=np.int64)
+        slots[kept] = np.arange(len(kept))
+        bits = np.zeros((size, max(1, (len(kept) + 63) // 64)), dtype=np.uint64)
+        entry_slots = slots[np.repeat(np.arange(vocab_size), frequency)]
+        has_bit = entry_slots >= 0
+        np.bitwise_or.at(bits, (postings.rows[has_bit], entry_slots[has_bit] >> 6), _bit(entry_slots[has_bit]))
+        return cls(bits, slots)
+
+    def replace_rows(self, changed: np.ndarray, codes: np.ndarray, rows: np.ndarray, vocab_size: int,
+                     size: int) -> '_Bitsets':
+        """Bitsets with the changed rows set from the given (code, row) pairs; new codes get no bit"""
+        slots = np.concatenate([self.slots, np.full(vocab_size - len(self.slots), -1, dtype=np.int64)])
+        bits = np.zeros((size, self.bits.shape[1]), dtype=np.uint64)
+        bits[:len(self.bits)] = self.bits
+        bits[changed] = 0
+        entry_slots = slots[codes]
+        has_bit = entry_slots >= 0
+        np.bitwise_or.at(bits, (rows[has_bit], entry_slots[has_bit] >> 6), _bit(entry_slots[has_bit]))
+        return _Bitsets(bits, slots)
+
+    def mask(self, codes: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Words and masks holding the bits of the codes that have one, and the codes that do not"""
+        slots = self.slots[codes] if len(codes) else np.zeros(0, dtype=np.int64)
+        kept = slots[slots >= 0]
+        words, inverse = np.unique(kept >> 6, return_inverse=True)
+        mask = np.zeros(len(words), dtype=np.uint64)
+        np.bitwise_or.at(mask, inverse, _bit(kept))
+        return words, mask, codes[slots < 0]
+
+    def counts(self, rows: np.ndarray, words: np.ndarray, mask: np.ndarray) -> np.ndarray:
+        """How many of the masked bits each of the rows holds, reading only the masked words"""
+        if not len(words):
+            return np.zeros(len(rows))
+        return _popcount(self.bits[rows][:, words] & mask).sum(axis=1, dtype=np.int64).astype(np.float64)
+
+
+def _bit_query(bitsets: _Bitsets, postings: _Postings, codes: np.ndarray) -> tuple:
+    """Bit words and masks of a mentee's codes, plus the (row, count) pairs of its codes without a bit"""
+    words, mask, rare = bitsets.mask(codes)
+    return words, mask, postings.counts(rare)
+
+
+def _bit_counts(bitsets: _Bitsets, rows: np.ndarray, words: np.ndarray, mask: np.ndarray,
+                rare: Tuple[np.ndarray, np.ndarray]) -> np.ndarray:
+    counts = bitsets.counts(rows, words, mask)
+    if len(rare[0]):
+        counts += _counts_at(rows, *rare)
+    return counts
+
+
+def _bit(codes: np.ndarray) -> np.ndarray:
+    return np.left_shift(np.uint64(1), (codes & 63).astype(np.uint64))
+
+
+def _popcount(words: np.ndarray) -> np.ndarray:
+    if hasattr(np, 'bitwise_count'):
+        return np.bitwise_count(words)
+    return _POPCOUNT_TABLE[words.view(np.uint8)].reshape(words.shape + (8,)).sum(axis=-1)
+
+
+def _codes(values, vocab: _Vocab) -> np.ndarray:
+    """Codes of the values known to a vocabulary"""
+    return np.array(sorted({vocab[value] for value in values if value in vocab}), dtype=np.int64)
+
+
+def _counts_at(rows: np.ndarray, count_rows: np.ndarray, counts: np.ndarray) -> np.ndarray:
+    """Spread sparse (row, count) pairs over the given ascending rows"""
+    result = np.zeros(len(rows), dtype=np.float64)
+    if len(count_rows) and len(rows):
+        positions = np.searchsorted(rows, count_rows)
+        found = positions < len(rows)
+        found[found] = rows[positions[found]] == count_rows[found]
+        result[positions[found]] = counts[found]
+    return result
+
+
+class TopK:
+    """Bounded min-heap of the ``k`` best scored items; on equal scores the earlier push wins"""
+
+    def __init__(self, k: int):
+        self.k = k
+        self._heap: List[Tuple[float, int, Any]] = []
+        self._pushed = 0
+
+    def __len__(self) -> int:
+        return len(self._heap)
+
+    def push(self, score: float, item: Any):
+        entry = (score, -self._pushed, item)
+        self._pushed += 1
+        if len(self._heap) < self.k:
+            heapq.heappush(self._heap, entry)
+        elif entry[:2] > self._heap[0][:2]:
+            heapq.heapreplace(self._heap, entry)
+
+    def items(self) -> List[Tuple[float, Any]]:
+        """Kept items as (score, item), best first"""
+        ordered = sorted(self._heap, key=lambda entry: entry[:2], reverse=True)
+        return [(score, item) for score, _, item in ordered]
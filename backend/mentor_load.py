@@ -0,0 +1,162 @@
+import asyncio
+import logging
+from typing import Dict, Optional, Tuple
+
+from pymongo.errors import OperationFailure, PyMongoError
+
+from assignment import mentor_capacity
+from feature_store import CHANGE_STREAMS_UNSUPPORTED
+
+# Statuses counted towards a mentor's load, per collection, and how much each one weighs
+COUNTED_STATUSES = {
+    "mentorship_matches": ("pending", "accepted", "active"),
+    "mentorship_sessions": ("scheduled",),
+}
+LOAD_WEIGHTS = {"pending": 0.25, "accepted": 1.0, "active": 1.0, "scheduled": 0.5}
+
+
+class MentorLoadCounters:
+    """Per-mentor counts of pending, accepted and active matches and scheduled sessions.
+
+    The counts are aggregated once at startup, then kept up to date from change streams on
+    mentorship_matches and mentorship_sessions; the mentor and status of every counted
+    document are remembered so that updates and deletes move the right counter. Without
+    change streams the counts are re-aggregated every ``poll_interval`` seconds instead.
+    Reading a mentor's load never touches the database.
+    """
+
+    def __init__(self, db, poll_interval: float = 60.0):
+        self.db = db
+        self.poll_interval = poll_interval
+        self.mode = "stopped"
+        self.counts: Dict[str, Dict[str, int]] = {}
+        self._docs: Dict[str, Dict[object, Tuple[str, str]]] = {name: {} for name in COUNTED_STATUSES}
+        self._loaded = {name: asyncio.Event() for name in COUNTED_STATUSES}
+        self._task: Optional[asyncio.Task] = None
+
+    # Counters
+
+    def _set(self, collection: str, object_id, mentor_id: Optional[str], status: Optional[str]):
+        """Move a document's contribution to its current mentor and status"""
+        docs = self._docs[collection]
+        previous = docs.pop(object_id, None)
+        if previous is not None:
+            counts = self.counts[previous[0]]
+            counts[previous[1]] -= 1
+            if not any(counts.values()):
+                del self.counts[previous[0]]
+        if mentor_id is not None and status in COUNTED_STATUSES[collection]:
+            docs[object_id] = (mentor_id, status)
+            counts = self.counts.setdefault(mentor_id, {})
+            counts[status] = counts.get(status, 0) + 1
+
+    def apply_change(self, collection: str, change: dict):
+        """Apply one change stream event of mentorship_matches or mentorship_sessions"""
+        object_id = change["documentKey"]["_id"]
+        doc = change.get("fullDocument")
+        if change.get("operationType") == "delete" or doc is None:
+            self._set(collection, object_id, None, None)
+        else:
+            self._set(collection, object_id, doc.get("mentor_id"), doc.get("status"))
+
+    def load(self, mentor_id: str) -> float:
+        """Weighted number of mentorships and sessions a mentor is taking on"""
+        return sum(LOAD_WEIGHTS[status] * count for status, count in self.counts.get(mentor_id, {}).items())
+
+    def taken(self, mentor_id: str) -> int:
+        """Mentorships already accepted or active, which use up capacity"""
+        counts = self.counts.get(mentor_id, {})
+        return counts.get("accepted", 0) + counts.get("active", 0)
+
+    def penalty(self, mentor: dict, weight: float) -> float:
+        """Score deduction growing with the mentor's load relative to its capacity, at most ``weight``"""
+        capacity = mentor_capacity(mentor)
+        if capacity == 0:
+            # A mentor taking no mentees ranks as if at full capacity
+            return weight
+        return weight * min(self.load(mentor["id"]) / capacity, 1.0)
+
+    # Loading and refreshing
+
+    async def _recount(self, collection: str):
+        """Recount the contributions of one collection, applied at once after the read"""
+        found = {}
+        cursor = self.db[collection].find(
+            {"status": {"$in": list(COUNTED_STATUSES[collection])}}, {"_id": 1, "mentor_id": 1, "status": 1}
+        )
+        async for doc in cursor:
+            found[doc["_id"]] = (doc.get("mentor_id"), doc.get("status"))
+        for object_id in set(self._docs[collection]) - set(found):
+            self._set(collection, object_id, None, None)
+        for object_id, (mentor_id, status) in found.items():
+            self._set(collection, object_id, mentor_id, status)
+        self._loaded[collection].set()
+
+    async def _watch(self, collection: str):
+        resume_token = None
+        pipeline = [
+            {"$match": {"operationType": {"$in": ["insert", "update", "replace", "delete"]}}},
+            {"$project": {"operationType": 1, "documentKey": 1, "fullDocument.mentor_id": 1, "fullDocument.status": 1}},
+        ]
+        while True:
+            try:
+                async with self.db[collection].watch(pipeline, full_document="updateLookup", resume_after=resume_token) as stream:
+                    if resume_token is None:
+                        # Counting after the stream is open means no change can fall in between
+                        await self._recount(collection)
+                    async for change in stream:
+                        self.apply_change(collection, change)
+                        resume_token = stream.resume_token
+            except OperationFailure as e:
+                if e.code == CHANGE_STREAMS_UNSUPPORTED:
+                    raise
+                logging.error(f"Mentor load change stream error on {collection}: {e}")
+                resume_token = None
+            except PyMongoError as e:
+                logging.error(f"Mentor load change stream error on {collection}: {e}")
+            await asyncio.sleep(1)
+
+    async def _run(self):
+        self.mode = "change_stream"
+        watches = [asyncio.ensure_future(self._watch(collection)) for collection in COUNTED_STATUSES]
+        try:
+            await asyncio.gather(*watches)
+        except OperationFailure as e:
+            for watch in watches:
+                watch.cancel()
+            if e.code != CHANGE_STREAMS_UNSUPPORTED:
+                raise
+            logging.info("Change streams unavailable, recounting mentor load periodically instead")
+        self.mode = "polling"
+        while True:
+            for collection in COUNTED_STATUSES:
+                try:
+                    await self._recount(collection)
+                except PyMongoError as e:
+                    logging.error(f"Mentor load recount error on {collection}: {e}")
+            await asyncio.sleep(self.poll_interval)
+
+    async def start(self, timeout: float = 30.0):
+        """Keep the counters fresh in the background and wait for the initial counts"""
+        self._task = asyncio.create_task(self._run())
+        try:
+            await asyncio.wait_for(asyncio.gather(*(event.wait() for event in self._loaded.values())), timeout)
+        except asyncio.TimeoutError:
+            logging.error("Mentor load counters did not finish loading, loads count as zero until then")
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        self.mode = "stopped"
+
+    def stats(self) -> dict:
+        totals: Dict[str, int] = {}
+        for counts in self.counts.values():
+            for status, count in counts.items():
+                totals[status] = totals.get(status, 0) + count
+        return {"mode": self.mode, "mentors": len(self.counts), "totals": totals}
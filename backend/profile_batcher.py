@@ -0,0 +1,153 @@
+import asyncio
+import json
+import logging
+import time
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+# Fields every analysis must hold to be accepted from a batched reply
+REQUIRED_FIELDS = ("communication_style", "mentorship_readiness")
+
+
+def batch_analysis_prompt(profiles: List[dict], describe: Callable[[dict], str]) -> str:
+    """One prompt asking for the analyses of several profiles, keyed by their position"""
+    blocks = "\n".join(f"### Profile {i}\n{describe(profile)}" for i, profile in enumerate(profiles, 1))
+    return f"""
+        Analyze each of these {len(profiles)} professional profiles and provide insights:
+
+        {blocks}
+
+        Provide a JSON object whose keys are the profile numbers ("1", "2", ...) and whose values hold:
+        1. "communication_style": Inferred communication style (collaborative, direct, analytical, creative)
+        2. "skill_strengths": Top 3 skill areas
+        3. "growth_areas": 3 areas for improvement
+        4. "career_stage": Assessment of career stage
+        5. "mentorship_readiness": Score 1-10 for giving/receiving mentorship
+        6. "personality_traits": 3 key professional traits
+        """
+
+
+def parse_batch_analysis(response: str, count: int) -> Dict[int, dict]:
+    """Usable analyses of a batched reply by profile position; anything malformed is left out"""
+    try:
+        parsed = json.loads(response)
+    except (TypeError, ValueError):
+        return {}
+    if isinstance(parsed, list):
+        parsed = {str(i): item for i, item in enumerate(parsed, 1)}
+    if not isinstance(parsed, dict):
+        return {}
+    analyses = {}
+    for i in range(1, count + 1):
+        analysis = parsed.get(str(i))
+        if isinstance(analysis, dict) and all(field in analysis for field in REQUIRED_FIELDS):
+            analyses[i] = analysis
+    return analyses
+
+
+class ProfileAnalysisBatcher:
+    """Collects profile analysis requests and sends them to the model a batch at a time.
+
+    Requests are gathered for up to ``window`` seconds or until ``max_batch`` are waiting,
+    then described in one prompt by ``send(prompt)``. The reply is split back to the callers
+    by profile position; profiles missing from it or malformed are analyzed on their own
+    with ``analyze_one``, as is every profile of a batch whose call fails.
+
+    ``lookup(profile)`` and ``store(profile, analysis)`` connect the batcher to the cache of
+    single-profile analyses: a profile analyzed before is answered without queueing, and
+    every analysis split from a batched reply is stored as if it had been asked for alone.
+    """
+
+    def __init__(self, send: Callable[[str], Awaitable[str]], describe: Callable[[dict], str],
+                 analyze_one: Callable[[dict], Awaitable[dict]], max_batch: int = 16, window: float = 0.05,
+                 lookup: Optional[Callable[[dict], Awaitable[Optional[dict]]]] = None,
+                 store: Optional[Callable[[dict, dict], Awaitable]] = None):
+        self.send = send
+        self.describe = describe
+        self.analyze_one = analyze_one
+        self.max_batch = max_batch
+        self.window = window
+        self.lookup = lookup
+        self.store = store
+        self._waiting: List[Tuple[dict, asyncio.Future]] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._flushes = set()
+        self.batches = 0
+        self.batched_profiles = 0
+        self.fallbacks = 0
+        self.cache_hits = 0
+        self.batch_seconds = 0.0
+
+    async def analyze(self, profile: dict) -> dict:
+        """AI analysis of one profile, sent along with the others waiting"""
+        if self.max_batch <= 1:
+            return await self.analyze_one(profile)
+        if self.lookup is not None:
+            cached = await self.lookup(profile)
+            if cached is not None:
+                self.cache_hits += 1
+                return cached
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._waiting.append((profile, future))
+        if len(self._waiting) >= self.max_batch:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.window, self._flush)
+        return await future
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._waiting = self._waiting[:self.max_batch], self._waiting[self.max_batch:]
+        if self._waiting:
+            self._timer = asyncio.get_running_loop().call_later(self.window, self._flush)
+        if batch:
+            task = asyncio.create_task(self._run(batch))
+            self._flushes.add(task)
+            task.add_done_callback(self._flushes.discard)
+
+    async def _run(self, batch: List[Tuple[dict, asyncio.Future]]):
+        started = time.perf_counter()
+        profiles = [profile for profile, _ in batch]
+        analyses = {}
+        if len(batch) > 1:
+            try:
+                response = await self.send(batch_analysis_prompt(profiles, self.describe))
+                analyses = parse_batch_analysis(response, len(batch))
+            except Exception as e:
+                logging.error(f"Batched profile analysis error: {e}")
+        self.batches += 1
+        self.batched_profiles += len(analyses)
+        missing = [(profile, future) for i, (profile, future) in enumerate(batch, 1) if i not in analyses]
+        self.fallbacks += len(missing) if len(batch) > 1 else 0
+        for i, (_, future) in enumerate(batch, 1):
+            if i in analyses and not future.done():
+                future.set_result(analyses[i])
+        if self.store is not None:
+            for i, analysis in analyses.items():
+                try:
+                    await self.store(profiles[i - 1], analysis)
+                except Exception as e:
+                    logging.error(f"Profile analysis cache write error: {e}")
+        results = await asyncio.gather(*(self.analyze_one(profile) for profile, _ in missing), return_exceptions=True)
+        for (_, future), result in zip(missing, results):
+            if future.done():
+                continue
+            if isinstance(result, BaseException):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
+        self.batch_seconds += time.perf_counter() - started
+
+    def stats(self) -> dict:
+        return {
+            "max_batch": self.max_batch,
+            "window_seconds": self.window,
+            "waiting": len(self._waiting),
+            "batches": self.batches,
+            "profiles_from_batches": self.batched_profiles,
+            "fallbacks": self.fallbacks,
+            "cache_hits": self.cache_hits,
+            "mean_batch_seconds": round(self.batch_seconds / self.batches, 3) if self.batches else 0.0,
+        }
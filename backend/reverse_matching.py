@@ -0,0 +1,340 @@
+import asyncio
+import time
+from datetime import datetime
+from typing import Dict, List, Optional, Set, Tuple
+
+import numpy as np
+from pymongo import DeleteOne
+
+from match_jobs import MENTEE_FIELDS, match_upsert, session_match_ids
+from matching import (COMPATIBLE_STYLES, MATCH_THRESHOLD, _is_number, _is_plain_mentor, _is_str_list, _round2,
+                      _Vocab, explain_match, match_score)
+
+
+def _is_plain_mentee(mentee: dict) -> bool:
+    """Whether a mentee only holds values the vectorized scorer reproduces exactly"""
+    analysis = mentee.get('ai_analysis', {})
+    if not isinstance(analysis, dict):
+        return False
+    style = analysis.get('communication_style', '')
+    return (
+        isinstance(mentee.get('industry'), (str, type(None)))
+        and _is_number(mentee.get('experience_years', 0))
+        and _is_str_list(mentee.get('goals', []))
+        and _is_str_list(mentee.get('interests', []))
+        and (isinstance(style, str) or not style)
+        and _is_number(analysis.get('mentorship_readiness', 5))
+    )
+
+
+class MenteeFeatureMatrix:
+    """Mentees encoded as NumPy columns so one mentor is scored against all of them in one pass.
+
+    The mirror image of MentorFeatureMatrix: goal words and interests become (row, code)
+    pairs, and scores are identical to calculate_match_score. Mentees the columns cannot
+    represent exactly are scored with match_score directly.
+
+    ``upsert`` and ``remove`` keep the matrix up to date one mentee at a time: a mentee keeps
+    its row when edited, removed rows are reused, and the pairs of changed rows are replaced
+    once before the next scoring pass instead of on every change.
+    """
+
+    def __init__(self, mentees: List[dict]):
+        self.profiles: List[Optional[dict]] = []
+        self.ids: List[Optional[str]] = []
+        self.row_of: Dict[str, int] = {}
+        self.industries = _Vocab()
+        self.words = _Vocab()
+        self.interests = _Vocab()
+        self.exotic: Dict[int, dict] = {}
+        self._free: List[int] = []
+
+        size = len(mentees)
+        self.industry_codes = np.full(size, -1, dtype=np.int32)
+        self.experience = np.zeros(size, dtype=np.float64)
+        self.styles = np.empty(size, dtype=object)
+        self.readiness = np.zeros(size, dtype=np.float64)
+        self.word_rows = np.zeros(0, dtype=np.int64)
+        self.word_ids = np.zeros(0, dtype=np.int64)
+        self.interest_rows = np.zeros(0, dtype=np.int64)
+        self.interest_ids = np.zeros(0, dtype=np.int64)
+        # Rows whose stored pairs are out of date, and the (word, interest) codes replacing them
+        self._stale: Set[int] = set()
+        self._pending: Dict[int, Tuple[List[int], List[int]]] = {}
+        for mentee in mentees:
+            self.upsert(mentee)
+        self._flush()
+
+    def __len__(self) -> int:
+        return len(self.row_of)
+
+    def upsert(self, mentee: dict):
+        """Add a mentee or replace the one with the same id"""
+        row = self.row_of.get(mentee.get('id'))
+        if row is None:
+            row = self._free.pop() if self._free else len(self.ids)
+            if row == len(self.ids):
+                self.ids.append(None)
+                self.profiles.append(None)
+                self._grow(row + 1)
+            self.row_of[mentee.get('id')] = row
+        self.ids[row] = mentee.get('id')
+        self.profiles[row] = mentee
+        self._stale.add(row)
+        self._pending.pop(row, None)
+        if not _is_plain_mentee(mentee):
+            self.exotic[row] = mentee
+            self.industry_codes[row] = -1
+            return
+        self.exotic.pop(row, None)
+        analysis = mentee.get('ai_analysis', {})
+        self.industry_codes[row] = self.industries.code(mentee.get('industry'))
+        self.experience[row] = mentee.get('experience_years', 0)
+        self.styles[row] = analysis.get('communication_style', '') or ''
+        self.readiness[row] = analysis.get('mentorship_readiness', 5)
+        words = set()
+        for goal in mentee.get('goals', []):
+            words.update(goal.lower().split())
+        self._pending[row] = ([self.words.code(word) for word in words],
+                              [self.interests.code(interest) for interest in set(mentee.get('interests', []))])
+
+    def remove(self, mentee_id: str):
+        row = self.row_of.pop(mentee_id, None)
+        if row is None:
+            return
+        self.ids[row] = None
+        self.profiles[row] = None
+        self.exotic.pop(row, None)
+        self.industry_codes[row] = -1
+        self.styles[row] = None
+        self._stale.add(row)
+        self._pending.pop(row, None)
+        self._free.append(row)
+
+    def _grow(self, size: int):
+        if size <= len(self.industry_codes):
+            return
+        capacity = max(size, 2 * len(self.industry_codes))
+        extra = capacity - len(self.industry_codes)
+        self.industry_codes = np.concatenate([self.industry_codes, np.full(extra, -1, dtype=np.int32)])
+        self.experience = np.concatenate([self.experience, np.zeros(extra)])
+        self.styles = np.concatenate([self.styles, np.empty(extra, dtype=object)])
+        self.readiness = np.concatenate([self.readiness, np.zeros(extra)])
+
+    def _flush(self):
+        """Replace the pairs of the rows changed since the last scoring pass"""
+        if not self._stale:
+            return
+        stale = np.fromiter(self._stale, dtype=np.int64, count=len(self._stale))
+        for kind, index in (('word', 0), ('interest', 1)):
+            rows, ids = getattr(self, f'{kind}_rows'), getattr(self, f'{kind}_ids')
+            keep = ~np.isin(rows, stale)
+            new_rows = [row for row, codes in self._pending.items() for _ in codes[index]]
+            new_ids = [code for codes in self._pending.values() for code in codes[index]]
+            setattr(self, f'{kind}_rows', np.concatenate([rows[keep], np.array(new_rows, dtype=np.int64)]))
+            setattr(self, f'{kind}_ids', np.concatenate([ids[keep], np.array(new_ids, dtype=np.int64)]))
+        self._stale.clear()
+        self._pending.clear()
+
+    def _overlap(self, values, vocab: _Vocab, rows: np.ndarray, ids: np.ndarray) -> np.ndarray:
+        """How many of the values each mentee holds"""
+        codes = np.array(sorted({vocab[value] for value in values if value in vocab}), dtype=np.int64)
+        if not len(codes):
+            return np.zeros(len(self.ids), dtype=np.float64)
+        return np.bincount(rows[np.isin(ids, codes)], minlength=len(self.ids)).astype(np.float64)
+
+    def score(self, mentor: dict) -> np.ndarray:
+        """Match scores of a mentor against every row, -inf for rows of removed mentees"""
+        if not _is_plain_mentor(mentor):
+            return np.array([match_score(mentor, mentee) if mentee is not None else -np.inf
+                             for mentee in self.profiles], dtype=np.float64)
+        self._flush()
+        size = len(self.ids)
+        analysis = mentor.get('ai_analysis', {})
+        score = np.zeros(size, dtype=np.float64)
+
+        # Industry alignment (20%)
+        score += np.where(self.industry_codes[:size] == self.industries.get(mentor.get('industry'), -2), 0.2, 0.0)
+
+        # Experience gap (15%)
+        exp_gap = mentor.get('experience_years', 0) - self.experience[:size]
+        score += np.where(exp_gap >= 3, 0.15, np.where(exp_gap >= 1, 0.1, 0.0))
+
+        # Skills overlap (25%)
+        skills = self._overlap(set(mentor.get('skills', [])), self.words, self.word_rows, self.word_ids)
+        score += np.minimum(skills / 5, 0.25)
+
+        # Communication style compatibility (15%)
+        mentor_style = analysis.get('communication_style', '')
+        if mentor_style:
+            compatible = COMPATIBLE_STYLES.get(mentor_style, [])
+            score += np.where(np.isin(self.styles[:size], [s for s in compatible if s]), 0.15, 0.0)
+
+        # Interest alignment (15%)
+        interests = self._overlap(set(mentor.get('interests', [])), self.interests, self.interest_rows, self.interest_ids)
+        score += np.minimum(interests / 3, 0.15)
+
+        # Mentorship readiness (10%)
+        score += (analysis.get('mentorship_readiness', 5) + self.readiness[:size]) / 20 * 0.1
+
+        scores = _round2(score)
+        for row, mentee in self.exotic.items():
+            scores[row] = match_score(mentor, mentee)
+        scores[self._free] = -np.inf
+        return scores
+
+
+class MenteePool:
+    """The mentee matrix of a worker, loaded once and brought up to date from updated_at.
+
+    ``refresh`` reads only the profiles edited since the newest update time seen so far and
+    applies them to the resident matrix; a profile that is no longer a mentee leaves it. Hold
+    ``lock`` while using ``matrix`` across awaits so a refresh cannot move rows under a caller.
+    """
+
+    def __init__(self, db, batch_size: int = 1000):
+        self.db = db
+        self.batch_size = batch_size
+        self.matrix: Optional[MenteeFeatureMatrix] = None
+        self.watermark: Optional[datetime] = None
+        self.lock = asyncio.Lock()
+        self.refreshes = 0
+        self.mentees_applied = 0
+
+    def _fields(self) -> dict:
+        return {f: 1 for f in MENTEE_FIELDS} | {"_id": 0, "role": 1, "updated_at": 1}
+
+    async def refresh(self) -> List[Tuple[str, Optional[datetime]]]:
+        """Apply the profiles edited since the last refresh; the (id, updated_at) of each changed mentee"""
+        if self.matrix is None:
+            query = {"role": "mentee"}
+        elif self.watermark is None:
+            query = {"updated_at": {"$exists": True}}
+        else:
+            query = {"updated_at": {"$gt": self.watermark}}
+        changed = []
+        profiles = []
+        cursor = self.db.user_profiles.find(query, self._fields()).batch_size(self.batch_size)
+        async for profile in cursor:
+            updated_at = profile.pop("updated_at", None)
+            if updated_at is not None and (self.watermark is None or updated_at > self.watermark):
+                self.watermark = updated_at
+            profiles.append((profile, profile.pop("role", None), updated_at))
+        if self.matrix is None:
+            self.matrix = MenteeFeatureMatrix([profile for profile, _, _ in profiles])
+        else:
+            for profile, role, _ in profiles:
+                if role == "mentee":
+                    self.matrix.upsert(profile)
+                else:
+                    self.matrix.remove(profile.get("id"))
+        self.refreshes += 1
+        self.mentees_applied += len(profiles)
+        return [(profile.get("id"), updated_at) for profile, _, updated_at in profiles
+                if profile.get("id") in self.matrix.row_of]
+
+    def stats(self) -> dict:
+        return {
+            "mentees": len(self.matrix) if self.matrix is not None else 0,
+            "refreshes": self.refreshes,
+            "mentees_applied": self.mentees_applied,
+        }
+
+
+def _chunks(items: list, size: int):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+async def update_mentor_matches(db, mentor: dict, matrix: MenteeFeatureMatrix, top_n: int = 5,
+                                threshold: float = MATCH_THRESHOLD, batch_size: int = 1000,
+                                semantic_weight: float = 0.0) -> dict:
+    """Bring the stored matches of every mentee up to date with one new or edited mentor.
+
+    The mentor enters a mentee's stored top N when fewer than N other matches are stored or
+    it beats the N-th of them (ties keep the existing mentor, like the pool order in
+    find_matches); a pending match pushed out of the top N is removed unless it has
+    sessions. A stored match whose score did not drop is rescored in place. When it dropped,
+    another mentor may now rank higher, so the mentee is listed under ``recompute`` for a
+    full recomputation. Stored matches are read and written ``batch_size`` mentees at a time.
+
+    The mentee matrix carries no text, so with a ``semantic_weight`` the scores would differ
+    from the ones find_matches serves; it refuses to run then.
+    """
+    if semantic_weight:
+        raise ValueError("Reverse matching has no semantic component, unset SEMANTIC_MATCH_WEIGHT to use it")
+    started = time.perf_counter()
+    scores = matrix.score(mentor)
+    candidates = np.flatnonzero(scores > threshold)
+    scoring_seconds = time.perf_counter() - started
+
+    stored: Dict[str, list] = {}
+    fields = {"_id": 0, "id": 1, "mentee_id": 1, "mentor_id": 1, "match_score": 1, "status": 1}
+    queries = [{"mentor_id": mentor["id"]}] + [
+        {"mentee_id": {"$in": mentee_ids}} for mentee_ids in _chunks([matrix.ids[row] for row in candidates], batch_size)
+    ]
+    seen = set()
+    for query in queries:
+        async for row in db.mentorship_matches.find(query, fields):
+            if row["id"] not in seen:
+                seen.add(row["id"])
+                stored.setdefault(row["mentee_id"], []).append(row)
+
+    row_of = matrix.row_of
+    now = datetime.utcnow()
+    operations = []
+    surfaced = 0
+    recompute = []
+    pushed_out = []
+    for mentee_id, matches in stored.items():
+        if mentee_id not in row_of:
+            continue
+        row = row_of[mentee_id]
+        score = float(scores[row])
+        current = next((match for match in matches if match["mentor_id"] == mentor["id"]), None)
+        if current is not None:
+            if score >= current.get("match_score", 0):
+                operations.append(match_upsert(mentor["id"], mentee_id, score, explain_match(mentor, matrix.profiles[row]), now))
+            else:
+                recompute.append(mentee_id)
+            continue
+        if score <= threshold:
+            continue
+        top = sorted(matches, key=lambda match: match.get("match_score", 0), reverse=True)[:top_n]
+        if len(top) == top_n and score <= top[-1].get("match_score", 0):
+            continue
+        operations.append(match_upsert(mentor["id"], mentee_id, score, explain_match(mentor, matrix.profiles[row]), now))
+        if len(top) == top_n and top[-1].get("status") == "pending":
+            pushed_out.append(top[-1]["id"])
+        surfaced += 1
+    # Mentees without any stored match take the mentor right away
+    for row in candidates:
+        mentee_id = matrix.ids[row]
+        if mentee_id not in stored:
+            operations.append(match_upsert(mentor["id"], mentee_id, float(scores[row]),
+                                           explain_match(mentor, matrix.profiles[row]), now))
+            surfaced += 1
+    # Pushed-out matches with sessions stay
+    for match_ids in _chunks(pushed_out, batch_size):
+        keep_ids = await session_match_ids(db, {"match_id": {"$in": match_ids}})
+        operations.extend(DeleteOne({"id": match_id}) for match_id in match_ids if match_id not in keep_ids)
+    for chunk in _chunks(operations, batch_size):
+        await db.mentorship_matches.bulk_write(chunk, ordered=False)
+    return {
+        "mentor_id": mentor["id"],
+        "mentees_scored": len(matrix),
+        "above_threshold": int(len(candidates)),
+        "surfaced_to": surfaced,
+        "recompute": recompute,
+        "scoring_seconds": round(scoring_seconds, 4),
+        "elapsed_seconds": round(time.perf_counter() - started, 4),
+    }
+
+
+async def surface_new_mentor(db, mentor: dict, pool: MenteePool, top_n: int = 5,
+                             threshold: float = MATCH_THRESHOLD, semantic_weight: float = 0.0) -> dict:
+    """Add a new mentor to the stored matches of the mentees whose top N it enters"""
+    async with pool.lock:
+        await pool.refresh()
+        return await update_mentor_matches(db, mentor, pool.matrix, top_n, threshold, pool.batch_size,
+                                           semantic_weight)
@@ -0,0 +1,158 @@
+import logging
+import os
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import joblib
+import numpy as np
+from scipy import sparse
+from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.metrics.pairwise import cosine_similarity
+
+
+def profile_text(profile: dict) -> str:
+    """Free text of a profile used for semantic matching"""
+    parts = [profile.get('bio') or '']
+    for field in ('skills', 'goals', 'interests'):
+        values = profile.get(field) or []
+        if isinstance(values, list):
+            parts.extend(str(value) for value in values)
+    return ' '.join(parts)
+
+
+class SemanticIndex:
+    """TF-IDF index over mentor bios, skills, goals and interests.
+
+    New or edited mentors are transformed with the fitted vocabulary and appended without
+    refitting; the index is refitted once the appended rows outgrow ``refit_ratio`` of the
+    fitted ones. A mentee is compared to every mentor with one sparse matrix-vector product.
+    """
+
+    def __init__(self, path: Optional[Path] = None, refit_ratio: float = 0.5):
+        self.path = path
+        self.refit_ratio = refit_ratio
+        self.vectorizer: Optional[TfidfVectorizer] = None
+        self.matrix = None
+        self.row_of: Dict[str, int] = {}
+        self.fitted_rows = 0
+        self.build_seconds = 0.0
+
+    def __len__(self) -> int:
+        return len(self.row_of)
+
+    def fit(self, mentors: List[dict]):
+        """Fit the vocabulary on the given mentors and rebuild the matrix"""
+        started = time.perf_counter()
+        vectorizer = TfidfVectorizer(stop_words='english', sublinear_tf=True, dtype=np.float32)
+        texts = [profile_text(mentor) for mentor in mentors]
+        try:
+            matrix = vectorizer.fit_transform(texts)
+        except ValueError:
+            # Empty pool or no usable terms yet
+            vectorizer, matrix = None, None
+        self.vectorizer = vectorizer
+        self.matrix = matrix
+        self.row_of = {mentor['id']: row for row, mentor in enumerate(mentors)} if matrix is not None else {}
+        self.fitted_rows = len(self.row_of)
+        self.build_seconds = time.perf_counter() - started
+
+    def add(self, mentors: List[dict]):
+        """Add or replace mentors using the fitted vocabulary"""
+        if not mentors:
+            return
+        if self.vectorizer is None:
+            self.fit(mentors)
+            return
+        started = time.perf_counter()
+        rows = self.vectorizer.transform([profile_text(mentor) for mentor in mentors])
+        offset = self.matrix.shape[0]
+        self.matrix = sparse.vstack([self.matrix, rows], format='csr')
+        for i, mentor in enumerate(mentors):
+            # Replaced rows stay in the matrix until the next refit
+            self.row_of[mentor['id']] = offset + i
+        self.build_seconds += time.perf_counter() - started
+
+    def sync(self, mentors: List[dict], updated: Optional[List[dict]] = None, save: bool = True):
+        """Bring the index up to date with the current mentor pool and re-index edited mentors"""
+        missing = [mentor for mentor in mentors if mentor.get('id') not in self.row_of]
+        missing.extend(mentor for mentor in updated or [] if mentor.get('id') in self.row_of)
+        if not missing:
+            return
+        if self.vectorizer is None or self.matrix.shape[0] + len(missing) > self.fitted_rows * (1 + self.refit_ratio):
+            self.fit(mentors)
+        else:
+            self.add(missing)
+        if save:
+            self.save()
+
+    def rows(self, ids: List[str]) -> np.ndarray:
+        """Index rows of the given mentor ids, -1 for mentors that are not indexed"""
+        return np.array([self.row_of.get(mentor_id, -1) for mentor_id in ids], dtype=np.int64)
+
+    def similarity(self, profile: dict, rows: np.ndarray) -> np.ndarray:
+        """Cosine similarity between a profile and the indexed mentors at ``rows``"""
+        result = np.zeros(len(rows), dtype=np.float64)
+        if self.vectorizer is None:
+            return result
+        query = self.vectorizer.transform([profile_text(profile)])
+        similarities = cosine_similarity(self.matrix, query, dense_output=False).toarray().ravel()
+        indexed = rows >= 0
+        result[indexed] = similarities[rows[indexed]]
+        return result
+
+    def stats(self) -> dict:
+        matrix_bytes = 0
+        if self.matrix is not None:
+            matrix_bytes = self.matrix.data.nbytes + self.matrix.indices.nbytes + self.matrix.indptr.nbytes
+        return {
+            "mentors": len(self.row_of),
+            "rows": 0 if self.matrix is None else self.matrix.shape[0],
+            "stale_rows": 0 if self.matrix is None else self.matrix.shape[0] - len(self.row_of),
+            "vocabulary_size": 0 if self.vectorizer is None else len(self.vectorizer.vocabulary_),
+            "build_seconds": round(self.build_seconds, 4),
+            "memory_bytes": matrix_bytes,
+        }
+
+    def save(self, state: Optional[dict] = None):
+        """Write the index, or a get_state() taken earlier, e.g. from a thread while it keeps changing"""
+        if self.path is None:
+            return
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            state = {**(state or self.get_state()), "build_seconds": self.build_seconds}
+            # Written aside and renamed, so other workers never read a partial file
+            tmp = self.path.with_name(f"{self.path.name}.{os.getpid()}.tmp")
+            joblib.dump(state, tmp)
+            os.replace(tmp, self.path)
+        except Exception as e:
+            logging.error(f"Semantic index save error: {e}")
+
+    def load(self) -> bool:
+        """Load a previously saved index, returns False when there is none"""
+        if self.path is None or not self.path.exists():
+            return False
+        try:
+            state = joblib.load(self.path)
+        except Exception as e:
+            logging.error(f"Semantic index load error: {e}")
+            return False
+        self.set_state(state["vectorizer"], state["matrix"], state["row_of"], state["fitted_rows"])
+        self.build_seconds = state["build_seconds"]
+        return True
+
+    def get_state(self) -> dict:
+        """Current contents for set_state, safe to write out while the index keeps changing"""
+        return {
+            "vectorizer": self.vectorizer,
+            "matrix": self.matrix,
+            "row_of": dict(self.row_of),
+            "fitted_rows": self.fitted_rows,
+        }
+
+    def set_state(self, vectorizer: Optional[TfidfVectorizer], matrix, row_of: Dict[str, int], fitted_rows: int):
+        """Replace the index contents, e.g. with the ones of a feature snapshot"""
+        self.vectorizer = vectorizer
+        self.matrix = matrix
+        self.row_of = row_of
+        self.fitted_rows = fitted_rows
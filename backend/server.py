@@ -1,4 +1,4 @@
-from fastapi import FastAPI, APIRouter, HTTPException, BackgroundTasks
+from fastapi import FastAPI, APIRouter, HTTPException, BackgroundTasks, Query
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
 from motor.motor_asyncio import AsyncIOMotorClient
@@ -13,9 +13,22 @@ import asyncio
 from emergentintegrations.llm.chat import LlmChat, UserMessage
 import json
 import random
-import numpy as np
-from sklearn.metrics.pairwise import cosine_similarity
-from sklearn.feature_extraction.text import TfidfVectorizer
+from matching import MATCH_THRESHOLD, explain_match
+from semantic import SemanticIndex
+from feature_store import MentorFeatureStore
+from snapshot import FeatureSnapshots
+from match_jobs import MENTEE_FIELDS, ensure_match_indexes, match_upsert, mentee_match_writes, run_periodically, session_match_ids
+from match_cache import MatchCache
+from reverse_matching import MenteePool, surface_new_mentor
+from match_scheduler import IncrementalMatchScheduler
+from match_executor import LoopLagMonitor, MatchExecutor, MatchQueueFull
+from mentor_load import MentorLoadCounters
+from assignment import mentor_capacity, solve_assignment
+from cohorts import build_cohorts
+from llm_client import LlmClient
+from llm_cache import LlmResponseCache
+from single_flight import LeaderLease, SingleFlight
+from profile_batcher import ProfileAnalysisBatcher
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
@@ -25,8 +38,82 @@ mongo_url = os.environ['MONGO_URL']
 client = AsyncIOMotorClient(mongo_url)
 db = client[os.environ['DB_NAME']]
 
+# In-memory mentor features used by the matcher, optionally blended with TF-IDF text similarity
+SEMANTIC_MATCH_WEIGHT = float(os.environ.get('SEMANTIC_MATCH_WEIGHT', '0'))
+semantic_index = SemanticIndex(Path(os.environ.get('SEMANTIC_INDEX_PATH', ROOT_DIR / 'data' / 'semantic_index.joblib')))
+# Matching runs off the event loop in a thread or process pool with a bounded queue
+match_executor = MatchExecutor(
+    mode=os.environ.get('MATCH_EXECUTOR', 'thread'),
+    workers=int(os.environ.get('MATCH_WORKERS', '0')) or None,
+    max_queue=int(os.environ.get('MATCH_QUEUE_SIZE', '32')),
+    queue_timeout=float(os.environ.get('MATCH_QUEUE_TIMEOUT_SECONDS', '2'))
+)
+loop_lag = LoopLagMonitor()
+mentor_store = MentorFeatureStore(
+    db.user_profiles,
+    semantic_index=semantic_index,
+    semantic_weight=SEMANTIC_MATCH_WEIGHT,
+    poll_interval=float(os.environ.get('MENTOR_STORE_POLL_SECONDS', '30')),
+    ann_min_mentors=int(os.environ.get('MATCH_ANN_MIN_MENTORS', '0')),
+    ann_candidates=int(os.environ.get('MATCH_ANN_CANDIDATES', '1000')),
+    executor=match_executor,
+    shards=int(os.environ.get('MATCH_SHARDS', '0')),
+    # Shared by the uvicorn workers of a host: one publishes, the others memory-map it
+    snapshots=FeatureSnapshots(Path(os.environ['MENTOR_SNAPSHOT_DIR'])) if os.environ.get('MENTOR_SNAPSHOT_DIR') else None,
+    snapshot_interval=float(os.environ.get('MENTOR_SNAPSHOT_SECONDS', '1'))
+)
+# Results of find_matches, invalidated by mentee versions and relevant mentor changes
+match_cache = MatchCache(
+    max_bytes=int(os.environ.get('MATCH_CACHE_MAX_BYTES', 64 * 1024 * 1024)),
+    exact_rescoring=SEMANTIC_MATCH_WEIGHT == 0
+)
+mentor_store.listeners.append(match_cache.mentor_changed)
+# Recomputes only the stored matches touched by profile changes, when enabled
+MATCH_SCHEDULER_SECONDS = float(os.environ.get('MATCH_SCHEDULER_SECONDS', '0'))
+# Mentees encoded once per worker for scoring new mentors, refreshed from updated_at
+mentee_pool = MenteePool(db)
+match_scheduler = IncrementalMatchScheduler(
+    db, mentor_store,
+    interval_seconds=MATCH_SCHEDULER_SECONDS,
+    max_pairs=int(os.environ.get('MATCH_SCHEDULER_MAX_PAIRS', '2000000')),
+    # One worker across every process and host recomputes; the lease outlives a few intervals
+    lease=LeaderLease(db.job_leases, "match_scheduler", lease_seconds=max(60.0, 3 * MATCH_SCHEDULER_SECONDS)),
+    mentees=mentee_pool,
+    semantic_weight=SEMANTIC_MATCH_WEIGHT
+)
+if MATCH_SCHEDULER_SECONDS > 0:
+    mentor_store.listeners.append(match_scheduler.mentor_changed)
+# Live pending/accepted/active match and scheduled session counts per mentor
+mentor_load = MentorLoadCounters(db, poll_interval=float(os.environ.get('MENTOR_LOAD_POLL_SECONDS', '60')))
+# Largest score deduction find_matches gives a mentor at full capacity, 0 disables it
+MATCH_LOAD_PENALTY = float(os.environ.get('MATCH_LOAD_PENALTY', '0'))
+
 # AI Chat setup
 EMERGENT_LLM_KEY = os.environ.get('EMERGENT_LLM_KEY')
+AI_SYSTEM_MESSAGE = """You are an AI career advisor and mentorship expert. You help analyze professional profiles, 
+        match mentors with mentees, provide career insights, and generate personalized recommendations. 
+        Always provide practical, actionable advice focused on professional growth and career development."""
+# Replies of identical AI requests are reused for a time chosen per call site, in seconds
+LLM_CACHE_TTLS = {
+    "profile_analysis": 30 * 24 * 3600,
+    "session_agenda": 7 * 24 * 3600,
+    "career_insights": 24 * 3600,
+    "goal_recommendations": 30 * 24 * 3600,
+}
+llm_cache = LlmResponseCache(
+    db.llm_cache if os.environ.get('LLM_CACHE_PERSIST', 'true').lower() == 'true' else None,
+    max_entries=int(os.environ.get('LLM_CACHE_MAX_ENTRIES', '4096')),
+    ttls=LLM_CACHE_TTLS
+)
+# Concurrent identical AI work runs once, in this process and across workers through leases
+single_flight = SingleFlight(db.ai_leases, lease_seconds=float(os.environ.get('AI_LEASE_SECONDS', '60')))
+# Every AI call borrows a chat from one pool of long-lived clients, started with the app
+llm_client = LlmClient(
+    lambda session_id, system_message: LlmChat(api_key=EMERGENT_LLM_KEY, session_id=session_id, system_message=system_message),
+    AI_SYSTEM_MESSAGE, "openai", "gpt-4o-mini",
+    size=int(os.environ.get('LLM_POOL_SIZE', '8')),
+    cache=llm_cache
+)
 
 # Create the main app without a prefix
 app = FastAPI(title="MentorMatch AI", description="AI-Powered Career Mentorship Platform")
@@ -49,6 +136,8 @@ class UserProfile(BaseModel):
     interests: List[str]
     communication_style: Optional[str] = None
     ai_analysis: Optional[Dict[str, Any]] = None
+    analysis_status: str = "complete"  # "pending", "complete", "failed"
+    capacity: Optional[int] = Field(None, ge=0)  # mentors only: how many mentees they take at once
     created_at: datetime = Field(default_factory=datetime.utcnow)
     updated_at: datetime = Field(default_factory=datetime.utcnow)
 
@@ -63,6 +152,7 @@ class UserProfileCreate(BaseModel):
     goals: List[str]
     bio: str
     interests: List[str]
+    capacity: Optional[int] = Field(None, ge=0)
 
 class Goal(BaseModel):
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
@@ -142,25 +232,9 @@ def clean_mongo_list(docs):
     return [clean_mongo_doc(doc) for doc in docs]
 
 # AI Helper Functions
-async def get_ai_chat():
-    """Initialize AI chat with system message"""
-    chat = LlmChat(
-        api_key=EMERGENT_LLM_KEY,
-        session_id=f"mentormatch_{datetime.now().timestamp()}",
-        system_message="""You are an AI career advisor and mentorship expert. You help analyze professional profiles, 
-        match mentors with mentees, provide career insights, and generate personalized recommendations. 
-        Always provide practical, actionable advice focused on professional growth and career development."""
-    ).with_model("openai", "gpt-4o-mini")
-    return chat
-
-async def analyze_user_profile_ai(profile_data: dict) -> dict:
-    """AI analysis of user profile for insights and recommendations"""
-    try:
-        chat = await get_ai_chat()
-        
-        prompt = f"""
-        Analyze this professional profile and provide insights:
-        
+def describe_profile(profile_data: dict) -> str:
+    """The profile fields given to the model for analysis"""
+    return f"""
         Name: {profile_data['name']}
         Role: {profile_data['role']}
         Position: {profile_data['current_position']}
@@ -170,7 +244,13 @@ async def analyze_user_profile_ai(profile_data: dict) -> dict:
         Goals: {', '.join(profile_data['goals'])}
         Bio: {profile_data['bio']}
         Interests: {', '.join(profile_data['interests'])}
-        
+        """
+
+def profile_analysis_prompt(profile_data: dict) -> str:
+    """The prompt asking for the AI analysis of one profile"""
+    return f"""
+        Analyze this professional profile and provide insights:
+        {describe_profile(profile_data)}
         Provide a JSON response with:
         1. "communication_style": Inferred communication style (collaborative, direct, analytical, creative)
         2. "skill_strengths": Top 3 skill areas
@@ -179,9 +259,12 @@ async def analyze_user_profile_ai(profile_data: dict) -> dict:
         5. "mentorship_readiness": Score 1-10 for giving/receiving mentorship
         6. "personality_traits": 3 key professional traits
         """
-        
-        message = UserMessage(text=prompt)
-        response = await chat.send_message(message)
+
+async def analyze_user_profile_ai(profile_data: dict) -> dict:
+    """AI analysis of user profile for insights and recommendations"""
+    try:
+        message = UserMessage(text=profile_analysis_prompt(profile_data))
+        response = await llm_client.send(message, site="profile_analysis")
         
         # Parse AI response
         try:
@@ -209,77 +292,9 @@ async def analyze_user_profile_ai(profile_data: dict) -> dict:
             "personality_traits": []
         }
 
-def calculate_match_score(mentor_profile: dict, mentee_profile: dict) -> tuple[float, List[str]]:
-    """Calculate mentorship match score using AI and similarity algorithms"""
-    try:
-        reasons = []
-        score = 0.0
-        
-        # Industry alignment (20%)
-        if mentor_profile.get('industry') == mentee_profile.get('industry'):
-            score += 0.2
-            reasons.append(f"Same industry: {mentor_profile.get('industry')}")
-        
-        # Experience gap (15%) - mentor should have more experience
-        exp_gap = mentor_profile.get('experience_years', 0) - mentee_profile.get('experience_years', 0)
-        if exp_gap >= 3:
-            score += 0.15
-            reasons.append(f"Good experience gap: {exp_gap} years")
-        elif exp_gap >= 1:
-            score += 0.1
-            reasons.append(f"Moderate experience gap: {exp_gap} years")
-        
-        # Skills overlap (25%)
-        mentor_skills = set(mentor_profile.get('skills', []))
-        mentee_goals_skills = set()
-        for goal in mentee_profile.get('goals', []):
-            mentee_goals_skills.update(goal.lower().split())
-        
-        skill_overlap = len(mentor_skills.intersection(mentee_goals_skills))
-        if skill_overlap > 0:
-            skill_score = min(skill_overlap / 5, 0.25)
-            score += skill_score
-            reasons.append(f"Skills alignment: {skill_overlap} matching areas")
-        
-        # Communication style compatibility (15%)
-        mentor_style = mentor_profile.get('ai_analysis', {}).get('communication_style', '')
-        mentee_style = mentee_profile.get('ai_analysis', {}).get('communication_style', '')
-        if mentor_style and mentee_style:
-            compatible_styles = {
-                'collaborative': ['collaborative', 'analytical'],
-                'direct': ['direct', 'analytical'],
-                'analytical': ['analytical', 'collaborative', 'direct'],
-                'creative': ['creative', 'collaborative']
-            }
-            if mentee_style in compatible_styles.get(mentor_style, []):
-                score += 0.15
-                reasons.append(f"Compatible communication styles: {mentor_style}-{mentee_style}")
-        
-        # Interest alignment (15%)
-        mentor_interests = set(mentor_profile.get('interests', []))
-        mentee_interests = set(mentee_profile.get('interests', []))
-        interest_overlap = len(mentor_interests.intersection(mentee_interests))
-        if interest_overlap > 0:
-            interest_score = min(interest_overlap / 3, 0.15)
-            score += interest_score
-            reasons.append(f"Shared interests: {interest_overlap} common areas")
-        
-        # Mentorship readiness (10%)
-        mentor_readiness = mentor_profile.get('ai_analysis', {}).get('mentorship_readiness', 5)
-        mentee_readiness = mentee_profile.get('ai_analysis', {}).get('mentorship_readiness', 5)
-        readiness_score = (mentor_readiness + mentee_readiness) / 20
-        score += readiness_score * 0.1
-        
-        return round(score, 2), reasons
-    except Exception as e:
-        logging.error(f"Match score calculation error: {e}")
-        return 0.5, ["Basic compatibility assessment"]
-
 async def generate_session_agenda_ai(mentor_profile: dict, mentee_profile: dict, session_number: int = 1) -> List[str]:
     """Generate AI-powered session agenda"""
     try:
-        chat = await get_ai_chat()
-        
         prompt = f"""
         Create a mentorship session agenda for:
         
@@ -294,7 +309,7 @@ async def generate_session_agenda_ai(mentor_profile: dict, mentee_profile: dict,
         """
         
         message = UserMessage(text=prompt)
-        response = await chat.send_message(message)
+        response = await llm_client.send(message, site="session_agenda")
         
         try:
             agenda = json.loads(response)
@@ -314,8 +329,6 @@ async def generate_session_agenda_ai(mentor_profile: dict, mentee_profile: dict,
 async def generate_career_insights_ai(user_profile: dict) -> List[dict]:
     """Generate AI-powered career insights"""
     try:
-        chat = await get_ai_chat()
-        
         prompt = f"""
         Generate career insights for this professional:
         
@@ -335,7 +348,7 @@ async def generate_career_insights_ai(user_profile: dict) -> List[dict]:
         """
         
         message = UserMessage(text=prompt)
-        response = await chat.send_message(message)
+        response = await llm_client.send(message, site="career_insights")
         
         try:
             insights = json.loads(response)
@@ -354,14 +367,71 @@ async def generate_career_insights_ai(user_profile: dict) -> List[dict]:
         logging.error(f"AI insights generation error: {e}")
         return []
 
+async def send_ai_prompt(prompt: str) -> str:
+    """Send one prompt on a pooled chat and return the reply"""
+    return await llm_client.send(UserMessage(text=prompt))
+
+async def cached_profile_analysis(profile_data: dict) -> Optional[dict]:
+    """The cached single-profile analysis of a profile, if any"""
+    response = await llm_client.cached(profile_analysis_prompt(profile_data), "profile_analysis")
+    if response is None:
+        return None
+    try:
+        return json.loads(response)
+    except ValueError:
+        return None
+
+async def cache_profile_analysis(profile_data: dict, analysis: dict):
+    """Cache an analysis split from a batched reply under the profile's single-profile prompt"""
+    await llm_client.remember(profile_analysis_prompt(profile_data), json.dumps(analysis), "profile_analysis")
+
+# Profiles created together are analyzed a batch per LLM call
+profile_batcher = ProfileAnalysisBatcher(
+    send_ai_prompt, describe_profile, analyze_user_profile_ai,
+    max_batch=int(os.environ.get('PROFILE_ANALYSIS_BATCH_SIZE', '16')),
+    window=float(os.environ.get('PROFILE_ANALYSIS_BATCH_SECONDS', '0.05')),
+    lookup=cached_profile_analysis,
+    store=cache_profile_analysis
+)
+
 # API Endpoints
+async def complete_profile_analysis(profile: dict):
+    """Fill in the AI analysis of a new profile, then surface it if it is a mentor"""
+    try:
+        ai_analysis = await profile_batcher.analyze(profile)
+        update = {
+            "ai_analysis": ai_analysis,
+            "communication_style": ai_analysis.get('communication_style'),
+            "analysis_status": "complete",
+            # A new version: cached matches of the profile are recomputed with the analysis
+            "updated_at": datetime.utcnow()
+        }
+        result = await db.user_profiles.update_one({"id": profile["id"]}, {"$set": update})
+        if result.matched_count == 0:
+            return  # Deleted while being analyzed
+        profile.update(update)
+        mentor_store.upsert(profile)
+        if profile['role'] == 'mentor':
+            await surface_mentor(profile)
+    except Exception as e:
+        logging.error(f"Profile analysis error: {e}")
+        await db.user_profiles.update_one({"id": profile["id"]}, {"$set": {"analysis_status": "failed"}})
+
+async def surface_mentor(mentor: dict):
+    """Add a new mentor to the stored matches of the mentees it suits best"""
+    try:
+        summary = await surface_new_mentor(db, mentor, mentee_pool, semantic_weight=SEMANTIC_MATCH_WEIGHT)
+        logging.info(f"Reverse matching finished: {summary}")
+    except Exception as e:
+        logging.error(f"Reverse matching error: {e}")
+
 @api_router.get("/")
 async def root():
     return {"message": "MentorMatch AI - Your Intelligent Career Mentorship Platform"}
 
 @api_router.post("/profiles", response_model=UserProfile)
-async def create_profile(profile_data: UserProfileCreate):
-    """Create a new user profile with AI analysis"""
+async def create_profile(profile_data: UserProfileCreate, background_tasks: BackgroundTasks):
+    """Create a new user profile; its AI analysis follows in the background"""
     try:
         # Create profile
         profile_dict = profile_data.dict()
@@ -369,13 +439,17 @@ async def create_profile(profile_data: UserProfileCreate):
         profile_dict['created_at'] = datetime.utcnow()
         profile_dict['updated_at'] = datetime.utcnow()
         
-        # Get AI analysis
-        ai_analysis = await analyze_user_profile_ai(profile_dict)
-        profile_dict['ai_analysis'] = ai_analysis
-        profile_dict['communication_style'] = ai_analysis.get('communication_style')
+        # Until the analysis is done the scorer sees no style and the default readiness
+        profile_dict['ai_analysis'] = {}
+        profile_dict['communication_style'] = None
+        profile_dict['analysis_status'] = "pending"
         
         # Save to database
         await db.user_profiles.insert_one(profile_dict)
+        # Visible to this worker right away (with the next snapshot on a follower), other workers
+        # pick it up from the change stream or the snapshot
+        mentor_store.upsert(profile_dict)
+        background_tasks.add_task(complete_profile_analysis, dict(profile_dict))
         
         return UserProfile(**profile_dict)
     except Exception as e:
@@ -404,51 +478,207 @@ async def get_profile(profile_id: str):
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error fetching profile: {str(e)}")
 
+@api_router.get("/profiles/{profile_id}/analysis")
+async def get_profile_analysis(profile_id: str):
+    """Poll the AI analysis of a profile"""
+    try:
+        profile = await db.user_profiles.find_one(
+            {"id": profile_id}, {"_id": 0, "analysis_status": 1, "ai_analysis": 1, "communication_style": 1, "updated_at": 1}
+        )
+        if not profile:
+            raise HTTPException(status_code=404, detail="Profile not found")
+        return {
+            "profile_id": profile_id,
+            "status": profile.get("analysis_status", "complete"),
+            "ai_analysis": profile.get("ai_analysis"),
+            "communication_style": profile.get("communication_style"),
+            "updated_at": profile.get("updated_at")
+        }
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error fetching profile analysis: {str(e)}")
+
 @api_router.post("/matches/{mentee_id}")
-async def find_matches(mentee_id: str):
-    """Find mentor matches for a mentee using AI"""
+async def find_matches(mentee_id: str, top_k: int = Query(10, ge=1, le=100), batch_size: int = Query(1000, ge=1, le=10000),
+                       mmr_lambda: Optional[float] = Query(None, ge=0, le=1),
+                       mmr_candidates: int = Query(200, ge=1, le=1000),
+                       load_penalty: Optional[float] = Query(None, ge=0, le=1)):
+    """Find mentor matches for a mentee using AI; mmr_lambda < 1 trades score for a more diverse list"""
     try:
         # Get mentee profile
         mentee = await db.user_profiles.find_one({"id": mentee_id, "role": "mentee"})
         if not mentee:
             raise HTTPException(status_code=404, detail="Mentee profile not found")
         
-        # Get all mentors
-        mentors = await db.user_profiles.find({"role": "mentor"}).to_list(1000)
-        
+        # Repeat calls for an unchanged mentee and mentor pool are served from the cache
+        version = mentee.get("updated_at")
+        # Busy mentors rank lower; loads change with every match, so penalized lists are not cached
+        load_penalty = MATCH_LOAD_PENALTY if load_penalty is None else load_penalty
+        penalty = (lambda mentor: mentor_load.penalty(mentor, load_penalty)) if load_penalty > 0 else None
+        plain = mmr_lambda is None and penalty is None
+        cached = match_cache.get(mentee_id, version, top_k) if plain else None
+        if cached is not None:
+            return {"matches": cached}
+        generation = match_cache.generation
+        
+        # Score the mentee against the in-memory mentor pool at once
         matches = []
-        for mentor in mentors:
-            score, reasons = calculate_match_score(mentor, mentee)
-            if score > 0.3:  # Minimum match threshold
-                match = {
-                    "id": str(uuid.uuid4()),
-                    "mentor_id": mentor["id"],
-                    "mentee_id": mentee_id,
-                    "match_score": score,
-                    "match_reasons": reasons,
-                    "status": "pending",
-                    "created_at": datetime.utcnow(),
-                    "mentor_name": mentor["name"],
-                    "mentor_position": mentor["current_position"],
-                    "mentor_industry": mentor["industry"],
-                    "mentor_experience": mentor["experience_years"]
-                }
-                matches.append(match)
-        
-        # Sort by match score descending
-        matches.sort(key=lambda x: x["match_score"], reverse=True)
-        
-        # Save top 5 matches to database
-        for match in matches[:5]:
-            match_data = {k: v for k, v in match.items() if k not in ["mentor_name", "mentor_position", "mentor_industry", "mentor_experience"]}
-            await db.mentorship_matches.insert_one(match_data)
-        
-        return {"matches": matches[:10]}  # Return top 10 for display
+        top = await mentor_store.top_matches(mentee, top_k, MATCH_THRESHOLD, batch_size,
+                                             diversity=mmr_lambda, diversity_candidates=mmr_candidates,
+                                             penalty=penalty)
+        for mentor, score, reasons in top:
+            match = {
+                "id": str(uuid.uuid4()),
+                "mentor_id": mentor["id"],
+                "mentee_id": mentee_id,
+                "match_score": score,
+                "match_reasons": reasons,
+                "status": "pending",
+                "created_at": datetime.utcnow(),
+                "mentor_name": mentor["name"],
+                "mentor_position": mentor["current_position"],
+                "mentor_industry": mentor["industry"],
+                "mentor_experience": mentor["experience_years"]
+            }
+            if penalty is not None:
+                match["load_penalty"] = round(penalty(mentor), 4)
+            matches.append(match)
+        
+        # Save top 5 matches to database, one upsert per (mentor, mentee) pair keeping accepted and active rows.
+        # Only the plain score ranking replaces the stored matches; diversified or penalized lists are
+        # views of it and show the stored rows of their mentors where there are any
+        stored = matches[:5]
+        if plain:
+            await db.mentorship_matches.bulk_write(mentee_match_writes(
+                mentee_id, [(m["mentor_id"], m["match_score"], m["match_reasons"]) for m in stored], datetime.utcnow(),
+                await session_match_ids(db, {"mentee_id": mentee_id})
+            ), ordered=False)
+        rows = await db.mentorship_matches.find(
+            {"mentee_id": mentee_id, "mentor_id": {"$in": [m["mentor_id"] for m in stored]}},
+            {"_id": 0, "mentor_id": 1, "id": 1, "status": 1, "created_at": 1}
+        ).to_list(len(stored))
+        existing = {row["mentor_id"]: row for row in rows}
+        for match in stored:
+            row = existing.get(match["mentor_id"], {})
+            match.update({k: row[k] for k in ("id", "status", "created_at") if k in row})
+        
+        # The cache holds the plain score ranking only, and only when ranked on the current pool:
+        # process workers may still hold a pool missing mentors the cache was invalidated for
+        if plain and top.version == mentor_store.version:
+            match_cache.put(mentee, version, top_k, matches, generation)
+        return {"matches": matches}  # Return top k for display
     except HTTPException:
         raise
+    except MatchQueueFull as e:
+        raise HTTPException(status_code=503, detail=f"Matching is busy, retry shortly: {str(e)}", headers={"Retry-After": "1"})
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error finding matches: {str(e)}")
 
+@api_router.get("/matches/{mentee_id}")
+async def get_matches(mentee_id: str, limit: int = Query(10, ge=1, le=100)):
+    """Get the stored matches of a mentee, best first"""
+    try:
+        matches = await db.mentorship_matches.find({"mentee_id": mentee_id}, {"_id": 0}).sort("match_score", -1).limit(limit).to_list(limit)
+        for match in matches:
+            mentor = mentor_store.profiles.get(match["mentor_id"])
+            if mentor:
+                match.update({
+                    "mentor_name": mentor.get("name"),
+                    "mentor_position": mentor.get("current_position"),
+                    "mentor_industry": mentor.get("industry"),
+                    "mentor_experience": mentor.get("experience_years")
+                })
+        return {"matches": matches}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error fetching matches: {str(e)}")
+
+@api_router.post("/assignments")
+async def assign_mentors(candidates_per_mentee: int = Query(20, ge=1, le=200), persist: bool = False):
+    """Assign every mentee one mentor, maximizing the total match score within mentor capacities"""
+    try:
+        fields = MENTEE_FIELDS + (["bio", "skills"] if mentor_store.uses_semantic else [])
+        mentees = await db.user_profiles.find({"role": "mentee"}, {f: 1 for f in fields} | {"_id": 0}).to_list(None)
+        
+        # Free slots: a mentor's capacity minus the mentorships already accepted or active
+        capacities = {
+            mentor_id: mentor_capacity(mentor) - mentor_load.taken(mentor_id)
+            for mentor_id, mentor in mentor_store.profiles.items()
+        }
+        
+        matrix = mentor_store.matrix()
+        result = await asyncio.to_thread(
+            solve_assignment, matrix, mentees, capacities,
+            candidates_per_mentee=candidates_per_mentee,
+            semantic=mentor_store.semantic_similarity if mentor_store.uses_semantic else None,
+            semantic_weight=SEMANTIC_MATCH_WEIGHT
+        )
+        
+        if persist and result["assignments"]:
+            now = datetime.utcnow()
+            reasons_of = {}
+            mentees_by_id = {mentee["id"]: mentee for mentee in mentees}
+            for assignment in result["assignments"]:
+                mentor = mentor_store.profiles[assignment["mentor_id"]]
+                reasons_of[assignment["mentee_id"]] = explain_match(mentor, mentees_by_id[assignment["mentee_id"]])
+            await db.mentorship_matches.bulk_write([
+                match_upsert(a["mentor_id"], a["mentee_id"], a["match_score"], reasons_of[a["mentee_id"]], now)
+                for a in result["assignments"]
+            ], ordered=False)
+        return result
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error assigning mentors: {str(e)}")
+
+@api_router.post("/cohorts")
+async def create_cohorts(cohort_size: int = Query(8, ge=2, le=100), text_weight: float = Query(0.2, ge=0, le=1),
+                         mentor_candidates: int = Query(3, ge=1, le=50), cohorts_per_mentor: int = Query(1, ge=1, le=20),
+                         persist: bool = False):
+    """Group mentees into cohorts of similar profiles and give each cohort a mentor"""
+    try:
+        mentees = await db.user_profiles.find(
+            {"role": "mentee"}, {f: 1 for f in MENTEE_FIELDS + ["bio", "skills"]} | {"_id": 0}
+        ).to_list(None)
+        result = await asyncio.to_thread(
+            build_cohorts, mentees, list(mentor_store.profiles.values()),
+            cohort_size=cohort_size, text_weight=text_weight,
+            vectorizer=semantic_index.vectorizer if mentor_store.uses_semantic else None,
+            mentor_candidates=mentor_candidates, cohorts_per_mentor=cohorts_per_mentor
+        )
+        
+        if persist and result["cohorts"]:
+            run_id = str(uuid.uuid4())
+            now = datetime.utcnow()
+            for cohort in result["cohorts"]:
+                cohort.update({"id": str(uuid.uuid4()), "run_id": run_id, "created_at": now})
+            await db.cohorts.insert_many([dict(cohort) for cohort in result["cohorts"]])
+            result["run_id"] = run_id
+        return result
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error building cohorts: {str(e)}")
+
+@api_router.get("/matching/stats")
+async def get_matching_stats():
+    """Get statistics of the matching indexes"""
+    return {
+        "semantic_weight": SEMANTIC_MATCH_WEIGHT,
+        "semantic_index": semantic_index.stats(),
+        "mentor_store": mentor_store.stats(),
+        "match_cache": match_cache.stats(),
+        "event_loop_lag": loop_lag.stats(),
+        "mentor_load": mentor_load.stats(),
+        "match_scheduler": match_scheduler.stats() if MATCH_SCHEDULER_SECONDS > 0 else None
+    }
+
+@api_router.get("/ai/stats")
+async def get_ai_stats():
+    """Get statistics of the LLM client pool and response cache"""
+    return {
+        "llm_client": llm_client.stats(),
+        "llm_cache": llm_cache.stats(),
+        "single_flight": single_flight.stats(),
+        "profile_batcher": profile_batcher.stats()
+    }
+
 @api_router.post("/goals", response_model=Goal)
 async def create_goal(goal_data: GoalCreate):
     """Create a new goal with AI recommendations"""
@@ -458,7 +688,6 @@ async def create_goal(goal_data: GoalCreate):
         goal_dict['created_at'] = datetime.utcnow()
         
         # Get AI recommendations
-        chat = await get_ai_chat()
         prompt = f"""
         Generate 3-5 specific, actionable recommendations for this career goal:
         
@@ -471,7 +700,7 @@ async def create_goal(goal_data: GoalCreate):
         """
         
         message = UserMessage(text=prompt)
-        response = await chat.send_message(message)
+        response = await llm_client.send(message, site="goal_recommendations")
         
         try:
             recommendations = json.loads(response)
@@ -538,31 +767,35 @@ async def get_career_insights(user_id: str):
         if not profile:
             raise HTTPException(status_code=404, detail="Profile not found")
         
-        # Check if insights exist and are recent (less than 7 days old)
-        week_ago = datetime.utcnow() - timedelta(days=7)
-        existing_insights = await db.career_insights.find({
-            "user_id": user_id,
-            "created_at": {"$gte": week_ago}
-        }).to_list(100)
-        
-        if existing_insights:
-            return {"insights": clean_mongo_list(existing_insights)}
-        
-        # Generate new insights
-        ai_insights = await generate_career_insights_ai(profile)
-        
-        # Save insights
-        insights = []
-        for insight_data in ai_insights:
-            insight = {
-                "id": str(uuid.uuid4()),
+        async def recent_or_new_insights():
+            # Check if insights exist and are recent (less than 7 days old)
+            week_ago = datetime.utcnow() - timedelta(days=7)
+            existing_insights = await db.career_insights.find({
                 "user_id": user_id,
-                "created_at": datetime.utcnow(),
-                **insight_data
-            }
-            await db.career_insights.insert_one(insight)
-            insights.append(clean_mongo_doc(insight))
+                "created_at": {"$gte": week_ago}
+            }).to_list(100)
+            
+            if existing_insights:
+                return clean_mongo_list(existing_insights)
+            
+            # Generate new insights
+            ai_insights = await generate_career_insights_ai(profile)
+            
+            # Save insights
+            insights = []
+            for insight_data in ai_insights:
+                insight = {
+                    "id": str(uuid.uuid4()),
+                    "user_id": user_id,
+                    "created_at": datetime.utcnow(),
+                    **insight_data
+                }
+                await db.career_insights.insert_one(insight)
+                insights.append(clean_mongo_doc(insight))
+            return insights
         
+        # Concurrent requests for the same user share one check and generation
+        insights = await single_flight.run(f"insights:{user_id}", recent_or_new_insights)
         return {"insights": insights}
     except HTTPException:
         raise
@@ -711,6 +944,42 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+background_jobs = []
+
+@app.on_event("startup")
+async def load_matching_indexes():
+    if SEMANTIC_MATCH_WEIGHT > 0:
+        semantic_index.load()
+    await ensure_match_indexes(db)
+    loop_lag.start()
+    await mentor_store.start()
+    await mentor_load.start()
+    await llm_cache.ensure_indexes()
+    await single_flight.ensure_indexes()
+    await llm_client.start()
+    # Optional scheduled recomputation of every mentee's stored matches
+    match_job_minutes = float(os.environ.get('MATCH_JOB_INTERVAL_MINUTES', '0'))
+    if match_job_minutes > 0:
+        # One worker across every process and host runs the job, like the match scheduler
+        lease = LeaderLease(db.job_leases, "match_job", lease_seconds=3 * match_job_minutes * 60)
+        await lease.ensure_indexes()
+        background_jobs.append(asyncio.create_task(run_periodically(
+            db, match_job_minutes * 60, lease=lease,
+            semantic_index=semantic_index if SEMANTIC_MATCH_WEIGHT > 0 else None, semantic_weight=SEMANTIC_MATCH_WEIGHT
+        )))
+    if MATCH_SCHEDULER_SECONDS > 0:
+        await match_scheduler.lease.ensure_indexes()
+        background_jobs.append(asyncio.create_task(match_scheduler.run_forever()))
+
 @app.on_event("shutdown")
 async def shutdown_db_client():
+    for job in background_jobs:
+        job.cancel()
+    # Lets the match job and scheduler release their leases before the client closes
+    await asyncio.gather(*background_jobs, return_exceptions=True)
+    await mentor_store.stop()
+    await mentor_load.stop()
+    await loop_lag.stop()
+    await llm_client.close()
+    match_executor.shutdown()
     client.close()
\ No newline at end of file
@@ -0,0 +1,172 @@
+import asyncio
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Dict, List, Optional, Tuple
+
+from matching import MATCH_THRESHOLD, MentorFeatureMatrix
+
+# Mentors of the shard owned by this worker process, keyed by id with their global sequence
+_shard_profiles: Dict[str, Tuple[int, dict]] = {}
+_shard_matrix: Optional[MentorFeatureMatrix] = None
+_shard_seqs: List[int] = []
+
+
+def _shard_apply(upserts: List[Tuple[int, dict]], removals: List[str], reset: bool = False) -> int:
+    global _shard_matrix
+    if reset:
+        _shard_profiles.clear()
+    for mentor_id in removals:
+        _shard_profiles.pop(mentor_id, None)
+    for seq, mentor in upserts:
+        _shard_profiles[mentor["id"]] = (seq, mentor)
+    _shard_matrix = None
+    return len(_shard_profiles)
+
+
+def _shard_top(mentee: dict, limit: int, threshold: float, batch_size: int) -> List[Tuple[float, int, str]]:
+    """Shard top-k as (score, seq, mentor_id); rows follow seq so ties resolve like one pool"""
+    global _shard_matrix, _shard_seqs
+    if _shard_matrix is None:
+        ordered = sorted(_shard_profiles.values(), key=lambda item: item[0])
+        _shard_seqs = [seq for seq, _ in ordered]
+        _shard_matrix = MentorFeatureMatrix([mentor for _, mentor in ordered])
+    top = _shard_matrix.top_rows(mentee, limit, threshold, batch_size=batch_size)
+    return [(score, _shard_seqs[row], _shard_matrix.ids[row]) for score, row in top]
+
+
+def _shard_key(industry) -> str:
+    return industry if isinstance(industry, str) else repr(industry)
+
+
+class ShardedMatcher:
+    """Mentor pool partitioned by industry over long-lived worker processes.
+
+    Each industry is placed on the least loaded shard when first seen, and every shard is a
+    single worker process holding the feature matrix of its mentors, so a uvicorn worker keeps
+    only the compact profiles. A query first runs on the mentee's own industry shard, which
+    holds the mentors getting the industry bonus; its k-th score then raises the threshold for
+    the other shards, which are queried in parallel and mostly pruned. Results are merged by
+    score and insertion order, giving the same top-k as one unsharded pool.
+
+    Plug ``mentor_changed`` into MentorFeatureStore.listeners; changes are buffered and sent
+    to the shards before the next query.
+    """
+
+    def __init__(self, shards: int, profiles: Callable[[], Dict[str, dict]]):
+        self.shards = shards
+        self._profiles = profiles
+        context = multiprocessing.get_context("spawn")
+        self._workers = [ProcessPoolExecutor(max_workers=1, mp_context=context) for _ in range(shards)]
+        self._industry_shard: Dict[str, int] = {}
+        self._mentor_shard: Dict[str, int] = {}
+        self._seq: Dict[str, int] = {}
+        self._next_seq = 0
+        self._sizes = [0] * shards
+        self._upserts: List[Dict[str, Tuple[int, dict]]] = [{} for _ in range(shards)]
+        self._removals: List[set] = [set() for _ in range(shards)]
+        self._reset = [False] * shards
+        self.queries = 0
+        self.shard_queries = 0
+
+    def _shard_for(self, industry) -> int:
+        key = _shard_key(industry)
+        if key not in self._industry_shard:
+            self._industry_shard[key] = min(range(self.shards), key=lambda i: self._sizes[i])
+        return self._industry_shard[key]
+
+    def _place(self, mentor: dict):
+        mentor_id = mentor["id"]
+        shard = self._shard_for(mentor.get("industry"))
+        previous = self._mentor_shard.get(mentor_id)
+        if previous is not None and previous != shard:
+            self._drop(mentor_id, previous)
+        if mentor_id not in self._seq:
+            self._seq[mentor_id] = self._next_seq
+            self._next_seq += 1
+        if previous != shard:
+            self._sizes[shard] += 1
+        self._mentor_shard[mentor_id] = shard
+        self._upserts[shard][mentor_id] = (self._seq[mentor_id], mentor)
+
+    def _drop(self, mentor_id: str, shard: int):
+        self._sizes[shard] -= 1
+        self._upserts[shard].pop(mentor_id, None)
+        self._removals[shard].add(mentor_id)
+
+    def mentor_changed(self, mentor_id: Optional[str], mentor: Optional[dict]):
+        if mentor_id is None:
+            self._reload()
+        elif mentor is None:
+            shard = self._mentor_shard.pop(mentor_id, None)
+            self._seq.pop(mentor_id, None)
+            if shard is not None:
+                self._drop(mentor_id, shard)
+        else:
+            self._place(mentor)
+
+    def _reload(self):
+        self._industry_shard.clear()
+        self._mentor_shard.clear()
+        self._seq.clear()
+        self._next_seq = 0
+        self._sizes = [0] * self.shards
+        self._upserts = [{} for _ in range(self.shards)]
+        self._removals = [set() for _ in range(self.shards)]
+        self._reset = [True] * self.shards
+        for mentor in self._profiles().values():
+            self._place(mentor)
+
+    async def _flush(self):
+        loop = asyncio.get_running_loop()
+        sends = []
+        for shard in range(self.shards):
+            if self._upserts[shard] or self._removals[shard] or self._reset[shard]:
+                sends.append(loop.run_in_executor(
+                    self._workers[shard], _shard_apply,
+                    list(self._upserts[shard].values()), list(self._removals[shard]), self._reset[shard]
+                ))
+                self._upserts[shard], self._removals[shard], self._reset[shard] = {}, set(), False
+        if sends:
+            await asyncio.gather(*sends)
+
+    async def _query(self, shards: List[int], mentee: dict, limit: int, threshold: float,
+                     batch_size: int) -> List[Tuple[float, int, str]]:
+        loop = asyncio.get_running_loop()
+        self.shard_queries += len(shards)
+        parts = await asyncio.gather(*(
+            loop.run_in_executor(self._workers[shard], _shard_top, mentee, limit, threshold, batch_size)
+            for shard in shards
+        ))
+        return [item for part in parts for item in part]
+
+    async def top_rows(self, mentee: dict, limit: int, threshold: float = MATCH_THRESHOLD,
+                       batch_size: int = 1000) -> List[Tuple[float, str]]:
+        """Best mentors above the threshold over all shards as (score, mentor_id)"""
+        await self._flush()
+        self.queries += 1
+        shards = [shard for shard in range(self.shards) if self._sizes[shard]]
+        own = self._industry_shard.get(_shard_key(mentee.get("industry")))
+        found = []
+        if own in shards:
+            found = await self._query([own], mentee, limit, threshold, batch_size)
+            shards.remove(own)
+            if len(found) == limit:
+                # Scores are rounded to cents: only mentors tying the k-th score or better can enter
+                threshold = max(threshold, found[-1][0] - 0.005)
+        if shards:
+            found += await self._query(shards, mentee, limit, threshold, batch_size)
+        found.sort(key=lambda item: (-item[0], item[1]))
+        return [(score, mentor_id) for score, _, mentor_id in found[:limit]]
+
+    def shutdown(self):
+        for worker in self._workers:
+            worker.shutdown(wait=False)
+
+    def stats(self) -> dict:
+        return {
+            "shards": self.shards,
+            "mentors_per_shard": list(self._sizes),
+            "industries": len(self._industry_shard),
+            "queries": self.queries,
+            "shard_queries": self.shard_queries,
+        }
@@ -0,0 +1,157 @@
+import asyncio
+import logging
+import os
+import socket
+import uuid
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, Dict, Optional
+
+from pymongo.errors import DuplicateKeyError, PyMongoError
+
+
+class SingleFlight:
+    """Runs concurrent calls for the same key once and shares the result.
+
+    Within a process, callers arriving while a call for their key is in flight await the
+    same task. Across uvicorn workers a lease document in ``collection`` serializes the
+    work: the worker holding it runs the call, the others wait until it is released and
+    then run their own call, which is expected to find the stored result first (check, then
+    compute). A lease expires after ``lease_seconds`` so a crashed worker cannot block the
+    key; it is renewed while the call runs.
+    """
+
+    def __init__(self, collection=None, lease_seconds: float = 60.0, poll_interval: float = 0.1):
+        self.collection = collection
+        self.lease_seconds = lease_seconds
+        self.poll_interval = poll_interval
+        self.owner = f"{socket.gethostname()}:{os.getpid()}"
+        self._flights: Dict[str, asyncio.Task] = {}
+        self.calls = 0
+        self.shared = 0
+        self.lease_waits = 0
+
+    async def ensure_indexes(self):
+        if self.collection is not None:
+            await self.collection.create_index("expires_at", expireAfterSeconds=0)
+
+    async def run(self, key: str, fn: Callable[[], Awaitable]):
+        """Result of ``fn()``, shared with every concurrent caller using the same key"""
+        self.calls += 1
+        flight = self._flights.get(key)
+        if flight is not None:
+            self.shared += 1
+        else:
+            flight = asyncio.create_task(self._leased(key, fn))
+            self._flights[key] = flight
+            flight.add_done_callback(lambda _: self._flights.pop(key, None))
+        # A cancelled caller must not cancel the call the others wait for
+        return await asyncio.shield(flight)
+
+    async def _acquire(self, key: str, token: str) -> bool:
+        now = datetime.utcnow()
+        expires_at = now + timedelta(seconds=self.lease_seconds)
+        try:
+            await self.collection.insert_one({"_id": key, "token": token, "owner": self.owner, "expires_at": expires_at})
+            return True
+        except DuplicateKeyError:
+            # Take over a lease its holder did not release in time
+            result = await self.collection.update_one(
+                {"_id": key, "expires_at": {"$lt": now}},
+                {"$set": {"token": token, "owner": self.owner, "expires_at": expires_at}}
+            )
+            return result.modified_count == 1
+
+    async def _renew(self, key: str, token: str):
+        while True:
+            await asyncio.sleep(self.lease_seconds / 3)
+            try:
+                await self.collection.update_one(
+                    {"_id": key, "token": token},
+                    {"$set": {"expires_at": datetime.utcnow() + timedelta(seconds=self.lease_seconds)}}
+                )
+            except PyMongoError as e:
+                logging.error(f"Single-flight lease renewal error for {key}: {e}")
+
+    async def _leased(self, key: str, fn: Callable[[], Awaitable]):
+        if self.collection is None:
+            return await fn()
+        token = uuid.uuid4().hex
+        renew: Optional[asyncio.Task] = None
+        try:
+            waited = False
+            while not await self._acquire(key, token):
+                waited = True
+                await asyncio.sleep(self.poll_interval)
+            if waited:
+                self.lease_waits += 1
+            renew = asyncio.create_task(self._renew(key, token))
+        except PyMongoError as e:
+            # Without the lease the call still runs, possibly twice across workers
+            logging.error(f"Single-flight lease error for {key}: {e}")
+            return await fn()
+        try:
+            return await fn()
+        finally:
+            renew.cancel()
+            try:
+                await self.collection.delete_one({"_id": key, "token": token})
+            except PyMongoError as e:
+                logging.error(f"Single-flight lease release error for {key}: {e}")
+
+    def stats(self) -> dict:
+        return {
+            "calls": self.calls,
+            "shared": self.shared,
+            "in_flight": len(self._flights),
+            "lease_waits": self.lease_waits,
+            "distributed": self.collection is not None,
+        }
+
+
+class LeaderLease:
+    """Elects the one worker, across processes and hosts, that runs a background job.
+
+    The lease is a document ``key`` in ``collection`` naming its holder until ``expires_at``.
+    ``hold()`` takes it when it is free or expired and renews it when already held, so a
+    worker calling it at least every ``lease_seconds`` keeps the job; when the holder stops
+    or crashes another worker takes over once the lease expires.
+    """
+
+    def __init__(self, collection, key: str, lease_seconds: float = 60.0):
+        self.collection = collection
+        self.key = key
+        self.lease_seconds = lease_seconds
+        self.owner = f"{socket.gethostname()}:{os.getpid()}"
+        self.token = uuid.uuid4().hex
+        self.held = False
+
+    async def ensure_indexes(self):
+        await self.collection.create_index("expires_at", expireAfterSeconds=0)
+
+    async def hold(self) -> bool:
+        """Take or renew the lease; whether this worker holds it now"""
+        now = datetime.utcnow()
+        lease = {"token": self.token, "owner": self.owner, "expires_at": now + timedelta(seconds=self.lease_seconds)}
+        try:
+            result = await self.collection.update_one(
+                {"_id": self.key, "$or": [{"token": self.token}, {"expires_at": {"$lt": now}}]}, {"$set": lease}
+            )
+            if result.matched_count == 0:
+                await self.collection.insert_one({"_id": self.key, **lease})
+            self.held = True
+        except DuplicateKeyError:
+            self.held = False
+        except PyMongoError as e:
+            # Unsure whether the lease is still ours, so step down rather than risk two holders
+            logging.error(f"Leader lease error for {self.key}: {e}")
+            self.held = False
+        return self.held
+
+    async def release(self):
+        if not self.held:
+            return
+        self.held = False
+        try:
+            await self.collection.delete_one({"_id": self.key, "token": self.token})
+        except PyMongoError as e:
+            logging.error(f"Leader lease release error for {self.key}: {e}")
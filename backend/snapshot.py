@@ -0,0 +1,106 @@
+import fcntl
+import logging
+import os
+import shutil
+from pathlib import Path
+from typing import Optional, Tuple
+
+import joblib
+import numpy as np
+from scipy import sparse
+
+from matching import MentorFeatureMatrix
+
+CURRENT_FILE = "CURRENT"
+LEADER_LOCK = "leader.lock"
+
+
+class FeatureSnapshots:
+    """Versioned on-disk mentor feature snapshots shared by the workers of a host.
+
+    Each version is a directory ``v000042`` holding the arrays of a MentorFeatureMatrix and,
+    optionally, the TF-IDF matrix of the semantic index as .npy files that readers
+    memory-map, so every worker shares the same page cache. A version is written to a
+    temporary directory and renamed into place before CURRENT is atomically replaced with its
+    number; readers only ever see complete versions. One worker, the holder of an exclusive
+    lock on ``leader.lock``, publishes; the others follow CURRENT. The newest ``keep``
+    versions are kept, older ones are removed (readers still mapping them are unaffected).
+    """
+
+    def __init__(self, directory: Path, keep: int = 3):
+        self.directory = directory
+        self.keep = keep
+        self._lock_file = None
+
+    def acquire_leader(self) -> bool:
+        """Try to become the publishing worker; the lock is held until the process exits"""
+        if self._lock_file is not None:
+            return True
+        self.directory.mkdir(parents=True, exist_ok=True)
+        lock_file = open(self.directory / LEADER_LOCK, "a")
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            return False
+        self._lock_file = lock_file
+        return True
+
+    def current(self) -> Optional[int]:
+        """Number of the newest published version"""
+        try:
+            return int((self.directory / CURRENT_FILE).read_text().strip())
+        except (OSError, ValueError):
+            return None
+
+    def _path(self, version: int) -> Path:
+        return self.directory / f"v{version:06d}"
+
+    def publish(self, matrix: MentorFeatureMatrix, semantic: Optional[dict] = None) -> int:
+        """Write a new version and make it current; ``semantic`` is a SemanticIndex.get_state()"""
+        version = (self.current() or 0) + 1
+        tmp = self.directory / f".v{version:06d}.{os.getpid()}.tmp"
+        shutil.rmtree(tmp, ignore_errors=True)
+        matrix.save(tmp / "matrix")
+        if semantic is not None and semantic["matrix"] is not None:
+            csr = semantic["matrix"].tocsr()
+            for name in ("data", "indices", "indptr"):
+                np.save(tmp / f"semantic.{name}.npy", getattr(csr, name))
+            joblib.dump({
+                "vectorizer": semantic["vectorizer"],
+                "row_of": semantic["row_of"],
+                "fitted_rows": semantic["fitted_rows"],
+                "shape": csr.shape,
+            }, tmp / "semantic.joblib")
+        os.rename(tmp, self._path(version))
+        current_tmp = self.directory / f"{CURRENT_FILE}.{os.getpid()}.tmp"
+        current_tmp.write_text(str(version))
+        os.replace(current_tmp, self.directory / CURRENT_FILE)
+        self._prune(version)
+        return version
+
+    def _prune(self, version: int):
+        for path in self.directory.glob("v*"):
+            try:
+                old = int(path.name[1:])
+            except ValueError:
+                continue
+            if old <= version - self.keep:
+                shutil.rmtree(path, ignore_errors=True)
+
+    def load(self, version: int) -> Tuple[MentorFeatureMatrix, Optional[dict]]:
+        """Memory-mapped matrix of a version and the semantic index state, if it has one"""
+        path = self._path(version)
+        matrix = MentorFeatureMatrix.load(path / "matrix")
+        semantic = None
+        if (path / "semantic.joblib").exists():
+            meta = joblib.load(path / "semantic.joblib")
+            arrays = [np.load(path / f"semantic.{name}.npy", mmap_mode="r") for name in ("data", "indices", "indptr")]
+            semantic = {
+                "vectorizer": meta["vectorizer"],
+                "matrix": sparse.csr_matrix(tuple(arrays), shape=meta["shape"], copy=False),
+                "row_of": meta["row_of"],
+                "fitted_rows": meta["fitted_rows"],
+            }
+        logging.info(f"Loaded mentor feature snapshot {version} with {len(matrix)} mentors")
+        return matrix, semantic
@@ -0,0 +1,68 @@
+import random
+from typing import Callable, List
+
+import pytest
+
+from matching import MATCH_THRESHOLD, calculate_match_score
+
+INDUSTRIES = ["Technology", "Finance", "Healthcare", "Education", None]
+STYLES = ["collaborative", "direct", "analytical", "creative", ""]
+WORDS = [f"skill{i}" for i in range(25)]
+INTERESTS = [f"interest{i}" for i in range(12)]
+
+
+def _exotic(rng: random.Random, profile: dict):
+    """Values calculate_match_score handles without the vectorized scorer's fast path"""
+    kind = rng.randrange(5)
+    if kind == 0:
+        profile["skills"] = " ".join(profile["skills"])
+    elif kind == 1:
+        profile["ai_analysis"]["mentorship_readiness"] = "high"
+    elif kind == 2:
+        profile["industry"] = ["Technology"]
+    elif kind == 3:
+        profile["ai_analysis"] = None
+    else:
+        profile["experience_years"] = 2.5
+
+
+def make_profiles(count: int, role: str, seed: int = 0, exotic: float = 0.0) -> List[dict]:
+    """Small random profiles; the narrow vocabularies give many overlaps and tied scores"""
+    rng = random.Random(seed)
+    profiles = []
+    for i in range(count):
+        profile = {
+            "id": f"{role}-{seed}-{i}",
+            "role": role,
+            "industry": rng.choice(INDUSTRIES),
+            "experience_years": rng.randint(0, 20) if role == "mentor" else rng.randint(0, 6),
+            "skills": sorted(rng.sample(WORDS, rng.randint(0, 6))),
+            "goals": [" ".join(rng.sample(WORDS, 3)).title() for _ in range(rng.randint(0, 3))],
+            "interests": sorted(rng.sample(INTERESTS, rng.randint(0, 4))),
+            "ai_analysis": {"communication_style": rng.choice(STYLES), "mentorship_readiness": rng.randint(1, 10)},
+        }
+        if rng.random() < exotic:
+            _exotic(rng, profile)
+        profiles.append(profile)
+    return profiles
+
+
+def reference_top(mentors: List[dict], mentee: dict, limit: int, threshold: float = MATCH_THRESHOLD) -> List[tuple]:
+    """Top (mentor_id, score, reasons) the old per-mentor loop returns, ties in pool order"""
+    scored = []
+    for mentor in mentors:
+        score, reasons = calculate_match_score(mentor, mentee)
+        if score > threshold:
+            scored.append((mentor["id"], score, reasons))
+    scored.sort(key=lambda item: -item[1])
+    return scored[:limit]
+
+
+@pytest.fixture
+def profiles() -> Callable[..., List[dict]]:
+    return make_profiles
+
+
+@pytest.fixture
+def reference() -> Callable[..., List[tuple]]:
+    return reference_top
@@ -0,0 +1,312 @@
+"""In-memory stand-in for the Motor collections the tests touch.
+
+Supports the queries, updates and bulk operations the backend sends: equality and the
+$in, $nin, $gt, $gte, $lt, $lte, $ne, $exists and $or operators, the $set, $setOnInsert,
+$unset and $inc updates, unique indexes and the $match/$group aggregation of
+compact_matches. Change streams are reported as unsupported, like on a standalone mongod,
+so stores fall back to polling.
+"""
+import copy
+import uuid
+from typing import Any, Dict, List, Optional
+
+from pymongo import DeleteMany, DeleteOne, InsertOne, ReplaceOne, UpdateMany, UpdateOne
+from pymongo.errors import DuplicateKeyError, OperationFailure
+
+from feature_store import CHANGE_STREAMS_UNSUPPORTED
+
+_MISSING = object()
+
+
+def _get(doc: dict, path: str) -> Any:
+    value = doc
+    for part in path.split("."):
+        if not isinstance(value, dict) or part not in value:
+            return _MISSING
+        value = value[part]
+    return value
+
+
+def _compare(value, op: str, operand) -> bool:
+    if op == "$exists":
+        return (value is not _MISSING) == bool(operand)
+    if op == "$in":
+        values = value if isinstance(value, list) else [value]
+        return any(item in operand for item in values) or (value is _MISSING and None in operand)
+    if op == "$nin":
+        return not _compare(value, "$in", operand)
+    if op == "$ne":
+        return not _equal(value, operand)
+    if value is _MISSING or value is None:
+        return False
+    try:
+        return {"$gt": value > operand, "$gte": value >= operand, "$lt": value < operand, "$lte": value <= operand}[op]
+    except TypeError:
+        return False
+
+
+def _equal(value, operand) -> bool:
+    if value is _MISSING:
+        return operand is None
+    if isinstance(value, list) and not isinstance(operand, list):
+        return operand in value
+    return value == operand
+
+
+def matches(doc: dict, query: Optional[dict]) -> bool:
+    for key, condition in (query or {}).items():
+        if key == "$or":
+            if not any(matches(doc, part) for part in condition):
+                return False
+        elif isinstance(condition, dict) and condition and all(op.startswith("$") for op in condition):
+            value = _get(doc, key)
+            if not all(_compare(value, op, operand) for op, operand in condition.items()):
+                return False
+        elif not _equal(_get(doc, key), condition):
+            return False
+    return True
+
+
+def _project(doc: dict, projection: Optional[dict]) -> dict:
+    if not projection:
+        return copy.deepcopy(doc)
+    included = [field for field, keep in projection.items() if keep and field != "_id"]
+    if not included:
+        result = copy.deepcopy(doc)
+        for field, keep in projection.items():
+            if not keep:
+                result.pop(field, None)
+        return result
+    result = {}
+    for field in included:
+        value = _get(doc, field)
+        if value is _MISSING:
+            continue
+        *parents, name = field.split(".")
+        target = result
+        for parent in parents:
+            target = target.setdefault(parent, {})
+        target[name] = copy.deepcopy(value)
+    if projection.get("_id", 1) and "_id" in doc:
+        result["_id"] = doc["_id"]
+    return result
+
+
+def _update(doc: dict, update: dict, inserting: bool = False):
+    if not any(key.startswith("$") for key in update):
+        object_id = doc.get("_id")
+        doc.clear()
+        doc.update(copy.deepcopy(update))
+        if object_id is not None:
+            doc["_id"] = object_id
+        return
+    for op, fields in update.items():
+        for field, value in fields.items():
+            *parents, name = field.split(".")
+            target = doc
+            for parent in parents:
+                target = target.setdefault(parent, {})
+            if op == "$set" or (op == "$setOnInsert" and inserting):
+                target[name] = copy.deepcopy(value)
+            elif op == "$unset":
+                target.pop(name, None)
+            elif op == "$inc":
+                target[name] = target.get(name, 0) + value
+
+
+def _sort_key(value) -> tuple:
+    # Missing and null values sort first, like in MongoDB
+    return (0, 0) if value is _MISSING or value is None else (1, value)
+
+
+class Result:
+    def __init__(self, **values):
+        self.__dict__.update(values)
+
+
+class Cursor:
+    def __init__(self, docs: List[dict]):
+        self.docs = docs
+
+    def sort(self, key, direction: int = 1) -> "Cursor":
+        keys = key if isinstance(key, list) else [(key, direction)]
+        for field, order in reversed(keys):
+            self.docs.sort(key=lambda doc: _sort_key(_get(doc, field)), reverse=order < 0)
+        return self
+
+    def limit(self, count: int) -> "Cursor":
+        if count:
+            self.docs = self.docs[:count]
+        return self
+
+    def batch_size(self, size: int) -> "Cursor":
+        return self
+
+    async def to_list(self, length: Optional[int] = None) -> List[dict]:
+        return self.docs if length is None else self.docs[:length]
+
+    def __aiter__(self):
+        self._iter = iter(self.docs)
+        return self
+
+    async def __anext__(self) -> dict:
+        try:
+            return next(self._iter)
+        except StopIteration:
+            raise StopAsyncIteration
+
+
+class Collection:
+    def __init__(self, name: str):
+        self.name = name
+        self.docs: List[dict] = []
+        self._unique: List[List[str]] = []
+
+    async def create_index(self, keys, unique: bool = False, **options):
+        if unique:
+            self._unique.append([field for field, _ in keys] if isinstance(keys, list) else [keys])
+
+    def _check_unique(self, doc: dict, ignore: Optional[dict] = None):
+        for fields in [["_id"]] + self._unique:
+            for other in self.docs:
+                if other is not ignore and all(_get(other, f) == _get(doc, f) for f in fields):
+                    raise DuplicateKeyError(f"E11000 duplicate key {fields}", code=11000)
+
+    def find(self, query: Optional[dict] = None, projection: Optional[dict] = None, **options) -> Cursor:
+        return Cursor([_project(doc, projection) for doc in self.docs if matches(doc, query)])
+
+    async def find_one(self, query: Optional[dict] = None, projection: Optional[dict] = None, **options):
+        docs = self.find(query, projection).docs
+        return docs[0] if docs else None
+
+    async def insert_one(self, doc: dict) -> Result:
+        doc.setdefault("_id", uuid.uuid4().hex)
+        self._check_unique(doc)
+        self.docs.append(copy.deepcopy(doc))
+        return Result(inserted_id=doc["_id"])
+
+    async def insert_many(self, docs: List[dict], **options) -> Result:
+        return Result(inserted_ids=[(await self.insert_one(doc)).inserted_id for doc in docs])
+
+    async def _upsert(self, query: dict, update: dict) -> Result:
+        doc = {key: value for key, value in query.items() if not key.startswith("$") and not isinstance(value, dict)}
+        _update(doc, update, inserting=True)
+        await self.insert_one(doc)
+        return Result(matched_count=0, modified_count=0, upserted_id=doc["_id"])
+
+    async def update_one(self, query: dict, update: dict, upsert: bool = False, **options) -> Result:
+        for doc in self.docs:
+            if matches(doc, query):
+                changed = copy.deepcopy(doc)
+                _update(changed, update)
+                self._check_unique(changed, ignore=doc)
+                doc.clear()
+                doc.update(changed)
+                return Result(matched_count=1, modified_count=1, upserted_id=None)
+        if upsert:
+            return await self._upsert(query, update)
+        return Result(matched_count=0, modified_count=0, upserted_id=None)
+
+    async def replace_one(self, query: dict, replacement: dict, upsert: bool = False, **options) -> Result:
+        return await self.update_one(query, replacement, upsert=upsert)
+
+    async def update_many(self, query: dict, update: dict, upsert: bool = False, **options) -> Result:
+        count = 0
+        for doc in self.docs:
+            if matches(doc, query):
+                _update(doc, update)
+                count += 1
+        return Result(matched_count=count, modified_count=count)
+
+    async def delete_one(self, query: dict) -> Result:
+        for doc in self.docs:
+            if matches(doc, query):
+                self.docs.remove(doc)
+                return Result(deleted_count=1)
+        return Result(deleted_count=0)
+
+    async def delete_many(self, query: dict) -> Result:
+        kept = [doc for doc in self.docs if not matches(doc, query)]
+        deleted, self.docs = len(self.docs) - len(kept), kept
+        return Result(deleted_count=deleted)
+
+    async def count_documents(self, query: dict) -> int:
+        return sum(1 for doc in self.docs if matches(doc, query))
+
+    async def distinct(self, field: str, query: Optional[dict] = None) -> list:
+        values = []
+        for doc in self.docs:
+            value = _get(doc, field)
+            if matches(doc, query) and value is not _MISSING and value not in values:
+                values.append(value)
+        return values
+
+    async def bulk_write(self, operations: list, ordered: bool = True) -> Result:
+        for operation in operations:
+            if isinstance(operation, UpdateOne):
+                await self.update_one(operation._filter, operation._doc, upsert=bool(operation._upsert))
+            elif isinstance(operation, UpdateMany):
+                await self.update_many(operation._filter, operation._doc)
+            elif isinstance(operation, ReplaceOne):
+                await self.replace_one(operation._filter, operation._doc, upsert=bool(operation._upsert))
+            elif isinstance(operation, DeleteOne):
+                await self.delete_one(operation._filter)
+            elif isinstance(operation, DeleteMany):
+                await self.delete_many(operation._filter)
+            elif isinstance(operation, InsertOne):
+                await self.insert_one(operation._doc)
+        return Result()
+
+    def aggregate(self, pipeline: List[dict], **options) -> Cursor:
+        docs = [copy.deepcopy(doc) for doc in self.docs]
+        for stage in pipeline:
+            if "$match" in stage:
+                docs = [doc for doc in docs if matches(doc, stage["$match"])]
+            elif "$group" in stage:
+                docs = _group(docs, stage["$group"])
+            else:
+                raise NotImplementedError(stage)
+        return Cursor(docs)
+
+    def watch(self, *args, **kwargs):
+        raise OperationFailure("Change streams need a replica set", code=CHANGE_STREAMS_UNSUPPORTED)
+
+
+def _value(doc: dict, expression):
+    if isinstance(expression, str) and expression.startswith("$"):
+        value = _get(doc, expression[1:])
+        return None if value is _MISSING else value
+    if isinstance(expression, dict):
+        return {key: _value(doc, part) for key, part in expression.items()}
+    return expression
+
+
+def _group(docs: List[dict], spec: dict) -> List[dict]:
+    groups: Dict[str, dict] = {}
+    for doc in docs:
+        key = _value(doc, spec["_id"])
+        group = groups.setdefault(repr(key), {"_id": key})
+        for field, accumulator in spec.items():
+            if field == "_id":
+                continue
+            (op, expression), = accumulator.items()
+            if op == "$push":
+                group.setdefault(field, []).append(_value(doc, expression))
+            elif op == "$sum":
+                group[field] = group.get(field, 0) + _value(doc, expression)
+            else:
+                raise NotImplementedError(op)
+    return list(groups.values())
+
+
+class Database:
+    def __init__(self):
+        self._collections: Dict[str, Collection] = {}
+
+    def __getattr__(self, name: str) -> Collection:
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return self._collections.setdefault(name, Collection(name))
+
+    def __getitem__(self, name: str) -> Collection:
+        return getattr(self, name)
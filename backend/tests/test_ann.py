@@ -0,0 +1,24 @@
+from ann import IVFIndex
+from matching import MentorFeatureMatrix
+
+
+def _top(matrix: MentorFeatureMatrix, mentee: dict, limit: int, **options):
+    return [(mentor["id"], score, reasons) for mentor, score, reasons in matrix.top_matches(mentee, limit, **options)]
+
+
+def test_ann_probing_every_list_is_exact(profiles, reference):
+    mentors = profiles(500, "mentor", seed=16)
+    matrix = MentorFeatureMatrix(mentors)
+    index = IVFIndex(matrix, lists=8)
+    mentees = profiles(10, "mentee", seed=17)
+    for mentee in mentees:
+        assert _top(matrix, mentee, 10, ann=index, ann_candidates=len(mentors)) == reference(mentors, mentee, 10)
+
+    # Rows changed through apply are reassigned to the existing lists
+    added = profiles(50, "mentor", seed=18)
+    removed = {mentor["id"] for mentor in mentors[:50]}
+    updated = matrix.apply(added, removed)
+    index = index.apply(updated, list(range(50)) + list(range(len(matrix), len(updated))))
+    pool = mentors[50:] + added
+    for mentee in mentees:
+        assert _top(updated, mentee, 10, ann=index, ann_candidates=len(updated)) == reference(pool, mentee, 10)
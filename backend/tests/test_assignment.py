@@ -0,0 +1,70 @@
+import random
+
+import numpy as np
+import pytest
+from scipy.optimize import linear_sum_assignment
+
+from assignment import DEFAULT_MENTOR_CAPACITY, mentor_capacity, solve_assignment
+from matching import MATCH_THRESHOLD, MentorFeatureMatrix, match_score
+
+
+def _optimal_total(mentors, mentees, capacities, threshold=MATCH_THRESHOLD) -> float:
+    """Best total score from a dense assignment over every mentor slot"""
+    slots = [mentor for mentor in mentors for _ in range(capacities.get(mentor["id"], DEFAULT_MENTOR_CAPACITY))]
+    gains = np.zeros((len(mentees), len(slots) + len(mentees)))
+    for i, mentee in enumerate(mentees):
+        for j, mentor in enumerate(slots):
+            score = match_score(mentor, mentee)
+            gains[i, j] = score if score > threshold else -1.0
+    rows, columns = linear_sum_assignment(gains, maximize=True)
+    return sum(max(gains[i, j], 0.0) for i, j in zip(rows, columns))
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_assignment_is_optimal(profiles, seed):
+    rng = random.Random(seed)
+    mentors = profiles(25, "mentor", seed=seed)
+    mentees = profiles(60, "mentee", seed=100 + seed)
+    capacities = {mentor["id"]: rng.randint(0, 3) for mentor in mentors}
+    result = solve_assignment(MentorFeatureMatrix(mentors), mentees, capacities, candidates_per_mentee=len(mentors))
+
+    assert result["stats"]["total_score"] == pytest.approx(_optimal_total(mentors, mentees, capacities), abs=1e-6)
+    assert len(result["assignments"]) + len(result["unassigned"]) == len(mentees)
+    load = {}
+    for assignment in result["assignments"]:
+        load[assignment["mentor_id"]] = load.get(assignment["mentor_id"], 0) + 1
+        mentor = next(mentor for mentor in mentors if mentor["id"] == assignment["mentor_id"])
+        mentee = next(mentee for mentee in mentees if mentee["id"] == assignment["mentee_id"])
+        assert assignment["match_score"] == match_score(mentor, mentee) > MATCH_THRESHOLD
+    assert all(count <= capacities[mentor_id] for mentor_id, count in load.items())
+
+
+def test_no_capacity_assigns_nobody(profiles):
+    mentors = profiles(10, "mentor", seed=1)
+    mentees = profiles(5, "mentee", seed=2)
+    result = solve_assignment(MentorFeatureMatrix(mentors), mentees, {mentor["id"]: 0 for mentor in mentors})
+    assert result["assignments"] == []
+    assert sorted(result["unassigned"]) == sorted(mentee["id"] for mentee in mentees)
+
+
+def test_mentor_capacity():
+    assert mentor_capacity({}) == DEFAULT_MENTOR_CAPACITY
+    assert mentor_capacity({"capacity": None}) == DEFAULT_MENTOR_CAPACITY
+    assert mentor_capacity({"capacity": 0}) == 0
+    assert mentor_capacity({"capacity": 5}) == 5
+
+
+def test_removed_mentors_take_no_mentees(profiles):
+    mentors = profiles(20, "mentor", seed=3)
+    mentees = profiles(40, "mentee", seed=4)
+    removed = [mentor["id"] for mentor in mentors[:8]]
+    matrix = MentorFeatureMatrix(mentors).apply([], removed)
+    live = [mentor for mentor in mentors if mentor["id"] not in removed]
+    capacities = {mentor["id"]: 2 for mentor in mentors}
+
+    result = solve_assignment(matrix, mentees, capacities, candidates_per_mentee=len(mentors))
+
+    assert result["stats"]["mentors"] == len(live)
+    assert result["stats"]["mentor_slots"] == 2 * len(live)
+    assert not {assignment["mentor_id"] for assignment in result["assignments"]} & set(removed)
+    assert result["stats"]["total_score"] == pytest.approx(_optimal_total(live, mentees, capacities), abs=1e-6)
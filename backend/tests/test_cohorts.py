@@ -0,0 +1,66 @@
+import numpy as np
+import pytest
+
+from cohorts import balanced_assign, balanced_kmeans, build_cohorts
+from matching import match_score
+
+
+def _blobs(count: int, centers: int, seed: int = 0) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    means = rng.normal(size=(centers, 6)) * 5
+    return (means[rng.integers(centers, size=count)] + rng.normal(size=(count, 6))).astype(np.float32)
+
+
+def test_balanced_assign_fills_clusters_to_their_capacity():
+    vectors = _blobs(300, 3, seed=1)
+    centroids = vectors[:10].copy()
+    capacities = np.array([50, 40, 40, 30, 30, 30, 20, 20, 20, 20])
+    labels = balanced_assign(vectors, centroids, capacities, nearest=3)
+    assert np.bincount(labels, minlength=10).tolist() == capacities.tolist()
+
+
+def test_balanced_assign_picks_the_nearest_cluster_when_there_is_room():
+    vectors = _blobs(200, 4, seed=2)
+    centroids = vectors[:6].copy()
+    labels = balanced_assign(vectors, centroids, np.full(6, len(vectors)))
+    nearest = ((vectors[:, None, :] - centroids[None]) ** 2).sum(axis=2).argmin(axis=1)
+    assert labels.tolist() == nearest.tolist()
+
+
+@pytest.mark.parametrize("leaf", [256, 4])
+def test_balanced_kmeans_sizes(leaf):
+    vectors = _blobs(1003, 8, seed=3)
+    capacities = np.full(126, 1003 // 126)
+    capacities[:1003 % 126] += 1
+    labels = balanced_kmeans(vectors, capacities, leaf=leaf)
+    assert np.bincount(labels, minlength=len(capacities)).tolist() == capacities.tolist()
+
+
+def test_build_cohorts(profiles):
+    mentees = profiles(203, "mentee", seed=4)
+    mentors = profiles(12, "mentor", seed=5)
+    result = build_cohorts(mentees, mentors, cohort_size=8, mentor_candidates=4, cohorts_per_mentor=2)
+    cohorts = result["cohorts"]
+
+    assert sorted(mentee_id for cohort in cohorts for mentee_id in cohort["mentee_ids"]) == \
+        sorted(mentee["id"] for mentee in mentees)
+    assert len(cohorts) == 26
+    assert {len(cohort["mentee_ids"]) for cohort in cohorts} <= {7, 8}
+    led = [cohort["mentor_id"] for cohort in cohorts if cohort["mentor_id"] is not None]
+    # 12 mentors leading at most 2 cohorts each run out before the 26 cohorts do
+    assert len(led) == 24 and max(led.count(mentor_id) for mentor_id in set(led)) == 2
+    by_id = {profile["id"]: profile for profile in mentees + mentors}
+    for cohort in cohorts:
+        if cohort["mentor_id"] is not None:
+            scores = [match_score(by_id[cohort["mentor_id"]], by_id[mentee_id]) for mentee_id in cohort["mentee_ids"]]
+            assert cohort["mean_match_score"] == round(sum(scores) / len(scores), 4)
+    quality = result["quality"]
+    assert (quality["min_size"], quality["max_size"], quality["cohorts_with_mentor"]) == (7, 8, 24)
+    assert quality["mean_distance_to_centroid"] < quality["random_partition_distance"]
+
+
+def test_build_cohorts_without_mentees_or_mentors(profiles):
+    assert build_cohorts([], profiles(3, "mentor"))["cohorts"] == []
+    cohorts = build_cohorts(profiles(10, "mentee"), [], cohort_size=4)["cohorts"]
+    assert sorted(len(cohort["mentee_ids"]) for cohort in cohorts) == [3, 3, 4]
+    assert all(cohort["mentor_id"] is None for cohort in cohorts)
@@ -0,0 +1,73 @@
+import asyncio
+
+import numpy as np
+import pytest
+
+from diversity import feature_vectors, mmr_order
+
+
+def _naive_mmr(relevance: np.ndarray, vectors: np.ndarray, k: int, lam: float) -> list:
+    """MMR recomputing every similarity to the picks, first maximum on ties"""
+    picks = []
+    for _ in range(min(k, len(relevance))):
+        best, best_gain = None, -np.inf
+        for i in range(len(relevance)):
+            if i in picks:
+                continue
+            closest = max((float(vectors[i] @ vectors[j]) for j in picks), default=0.0)
+            gain = lam * relevance[i] - (1 - lam) * max(closest, 0.0)
+            if gain > best_gain:
+                best, best_gain = i, gain
+        picks.append(best)
+    return picks
+
+
+@pytest.mark.parametrize("lam", [0.0, 0.3, 0.7, 1.0])
+def test_mmr_order_equals_naive_mmr(profiles, lam):
+    mentors = profiles(60, "mentor", seed=1)
+    vectors = feature_vectors(mentors)
+    relevance = np.random.default_rng(2).random(len(mentors))
+    assert mmr_order(relevance, vectors, 10, lam) == _naive_mmr(relevance, vectors, 10, lam)
+
+
+def test_mmr_order_edge_cases(profiles):
+    vectors = feature_vectors(profiles(5, "mentor", seed=3))
+    relevance = np.array([0.5, 0.9, 0.9, 0.1, 0.7])
+    # lam = 1 keeps the relevance order, ties in input order
+    assert mmr_order(relevance, vectors, 10, 1.0) == [1, 2, 4, 0, 3]
+    assert mmr_order(relevance, vectors, 0, 0.5) == []
+    assert mmr_order(relevance[:0], vectors[:0], 3, 0.5) == []
+
+
+def test_duplicates_are_spread_out(profiles):
+    mentor, other = profiles(2, "mentor", seed=4)
+    vectors = feature_vectors([mentor, {**mentor, "id": "copy"}, other])
+    relevance = np.array([0.9, 0.89, 0.6])
+    assert mmr_order(relevance, vectors, 2, 1.0) == [0, 1]
+    assert mmr_order(relevance, vectors, 2, 0.5) == [0, 2]
+
+
+def test_store_reranks_its_best_candidates(profiles, reference):
+    pytest.importorskip("pymongo")
+    from feature_store import MentorFeatureStore
+    from tests.mongo import Database
+
+    db = Database()
+    db.user_profiles.docs = [{**mentor, "_id": mentor["id"]} for mentor in profiles(300, "mentor", seed=5)]
+    store = MentorFeatureStore(db.user_profiles)
+    mentees = profiles(5, "mentee", seed=6)
+
+    async def run():
+        await store.load()
+        return [(await store.top_matches(mentee, 5, diversity=0.5, diversity_candidates=40),
+                 await store.top_matches(mentee, 5, diversity=1.0),
+                 await store.top_matches(mentee, 5)) for mentee in mentees]
+
+    results = asyncio.run(run())
+    pool = list(store.profiles.values())
+    for mentee, (diverse, pure, plain) in zip(mentees, results):
+        candidates = reference(pool, mentee, 40)
+        vectors = feature_vectors([store.profiles[mentor_id] for mentor_id, _, _ in candidates])
+        picks = mmr_order(np.array([score for _, score, _ in candidates]), vectors, 5, 0.5)
+        assert [(mentor["id"], score, reasons) for mentor, score, reasons in diverse] == [candidates[i] for i in picks]
+        assert pure == plain
@@ -0,0 +1,87 @@
+import asyncio
+
+import pytest
+
+pytest.importorskip("pymongo")
+
+import matching  # noqa: E402
+from feature_store import MentorFeatureStore  # noqa: E402
+from match_executor import MatchExecutor  # noqa: E402
+from tests.mongo import Database  # noqa: E402
+
+
+def _store(mentors, **options) -> MentorFeatureStore:
+    db = Database()
+    db.user_profiles.docs = [{**mentor, "_id": mentor["id"]} for mentor in mentors]
+    return MentorFeatureStore(db.user_profiles, **options)
+
+
+def _ids(top) -> list:
+    return [(mentor["id"], score, reasons) for mentor, score, reasons in top]
+
+
+def test_top_matches_equal_calculate_match_score(profiles, reference):
+    mentors = profiles(300, "mentor", seed=1, exotic=0.05)
+    store = _store(mentors)
+
+    mentees = profiles(10, "mentee", seed=2)
+
+    async def run():
+        await store.load()
+        return [_ids(await store.top_matches(mentee, 10)) for mentee in mentees]
+
+    results = asyncio.run(run())
+    # The store keeps the projected fields of each profile
+    pool = list(store.profiles.values())
+    for mentee, top in zip(mentees, results):
+        assert top == reference(pool, mentee, 10)
+
+
+@pytest.mark.parametrize("options", [{"penalty": lambda mentor: 0.05 * (int(mentor["id"].split("-")[-1]) % 4)},
+                                     {"diversity": 0.7},
+                                     {"diversity": 0.7, "penalty": lambda mentor: 0.1}])
+def test_reasons_are_built_for_returned_mentors_only(profiles, monkeypatch, options):
+    mentors = profiles(300, "mentor", seed=3)
+    mentee = profiles(1, "mentee", seed=4)[0]
+    store = _store(mentors)
+    explained = []
+
+    def explain_match(mentor, mentee):
+        explained.append(mentor["id"])
+        return matching.calculate_match_score(mentor, mentee)[1]
+
+    async def run():
+        await store.load()
+        monkeypatch.setattr(matching, "explain_match", explain_match)
+        return await store.top_matches(mentee, 5, **options)
+
+    top = asyncio.run(run())
+    assert len(top) == 5
+    assert explained == [mentor["id"] for mentor, _, _ in top]
+    assert all(reasons == matching.calculate_match_score(mentor, mentee)[1] for mentor, _, reasons in top)
+
+
+def test_results_of_stale_process_workers_carry_their_version(profiles, reference):
+    mentors = profiles(100, "mentor", seed=5)
+    mentee = profiles(1, "mentee", seed=6)[0]
+    executor = MatchExecutor(mode="process", workers=1)
+    store = _store(mentors, executor=executor, reconfigure_interval=3600)
+    added = {**profiles(1, "mentor", seed=7)[0], "_id": "added"}
+
+    async def run():
+        await store.load()
+        fresh = await store.top_matches(mentee, 5)
+        assert fresh.version == store.version
+        store.upsert(added)
+        stale = await store.top_matches(mentee, 5)
+        assert stale.version < store.version
+        store.reconfigure_interval = 0
+        current = await store.top_matches(mentee, 5)
+        assert current.version == store.version
+        return current
+
+    try:
+        current = asyncio.run(run())
+    finally:
+        executor.shutdown()
+    assert _ids(current) == reference(list(store.profiles.values()), mentee, 5)
@@ -0,0 +1,93 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+
+pytest.importorskip("pymongo")
+
+import llm_cache  # noqa: E402
+from llm_cache import LlmResponseCache, cache_key  # noqa: E402
+from llm_client import LlmClient  # noqa: E402
+from tests.mongo import Database  # noqa: E402
+
+
+class Message:
+    def __init__(self, text: str):
+        self.text = text
+
+
+class Chat:
+    """Fake LlmChat answering each prompt with its reply table, counting the calls"""
+
+    calls = []
+
+    def __init__(self, session_id: str, system_message: str):
+        self.session_id = session_id
+        self.messages = [{"role": "system", "content": system_message}]
+
+    def with_model(self, provider: str, model: str):
+        return self
+
+    async def send_message(self, message) -> str:
+        Chat.calls.append(message.text)
+        return {"plain": "not json"}.get(message.text, f'{{"reply": "{message.text}"}}')
+
+
+def test_cache_key_covers_model_system_message_and_prompt():
+    keys = {cache_key("a/m", "system", "prompt"), cache_key("a/n", "system", "prompt"),
+            cache_key("a/m", "other", "prompt"), cache_key("a/m", "system", "other")}
+    assert len(keys) == 4
+    assert cache_key("a/m", "system", "prompt") == cache_key("a/m", "system", "prompt")
+
+
+def test_memory_tier_evicts_least_recently_used_and_expired_entries(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(llm_cache.time, "time", lambda: now[0])
+    cache = LlmResponseCache(max_entries=2, ttls={"site": 60})
+
+    async def run():
+        await cache.put("a", "A", "site")
+        await cache.put("b", "B", "site")
+        assert await cache.get("a", "site") == "A"
+        await cache.put("c", "C", "site")
+        assert [await cache.get(key, "site") for key in "abc"] == ["A", None, "C"]
+        now[0] += 61
+        assert await cache.get("a", "site") is None
+
+    asyncio.run(run())
+    assert cache.sites["site"] == {"memory_hits": 3, "persistent_hits": 0, "misses": 2}
+    assert cache.stats()["entries"] == 1
+
+
+def test_persistent_tier_is_shared_and_promoted_to_memory():
+    db = Database()
+    writer = LlmResponseCache(db.llm_cache, ttls={"site": 60})
+    reader = LlmResponseCache(db.llm_cache, ttls={"site": 60})
+
+    async def run():
+        await writer.put("a", "A", "site")
+        await db.llm_cache.insert_one({"_id": "old", "response": "stale",
+                                       "expires_at": datetime.utcnow() - timedelta(seconds=1)})
+        return [await reader.get("a", "site"), await reader.get("a", "site"), await reader.get("old", "site")]
+
+    assert asyncio.run(run()) == ["A", "A", None]
+    assert reader.sites["site"] == {"memory_hits": 1, "persistent_hits": 1, "misses": 1}
+    assert db.llm_cache.docs[0]["site"] == "site"
+
+
+def test_client_caches_json_replies_of_sites_with_a_ttl():
+    Chat.calls = []
+    client = LlmClient(Chat, "system", "fake", "fake", size=1,
+                       cache=LlmResponseCache(ttls={"cached": 60, "off": 0}))
+
+    async def run():
+        replies = []
+        for site, text in [("cached", "p"), ("cached", "p"), ("off", "p"), (None, "p"),
+                           ("cached", "plain"), ("cached", "plain")]:
+            replies.append(await client.send(Message(text), site=site))
+        return replies
+
+    assert asyncio.run(run()) == ['{"reply": "p"}'] * 4 + ["not json"] * 2
+    # One call for the cached site, one per uncached site and every non-JSON reply
+    assert Chat.calls == ["p", "p", "p", "plain", "plain"]
+    assert client.cache.sites["cached"] == {"memory_hits": 1, "persistent_hits": 0, "misses": 3}
@@ -0,0 +1,105 @@
+import asyncio
+
+import pytest
+
+pytest.importorskip("pymongo")
+
+from llm_client import LlmClient  # noqa: E402
+
+
+class Message:
+    def __init__(self, text: str):
+        self.text = text
+
+
+class Chat:
+    """Fake LlmChat keeping its history, recording what each call could see"""
+
+    created = []
+
+    def __init__(self, session_id: str, system_message: str, fail: bool = False):
+        self.session_id = session_id
+        self.messages = [{"role": "system", "content": system_message}]
+        self.fail = fail
+        self.seen = []
+        self.closed = False
+        self.active = 0
+        Chat.created.append(self)
+
+    def with_model(self, provider: str, model: str):
+        return self
+
+    async def send_message(self, message) -> str:
+        self.seen.append((self.session_id, len(self.messages)))
+        self.active += 1
+        assert self.active == 1
+        self.messages.append({"role": "user", "content": message.text})
+        await asyncio.sleep(0.001)
+        self.active -= 1
+        if self.fail or message.text == "fail":
+            raise RuntimeError("model error")
+        self.messages.append({"role": "assistant", "content": "{}"})
+        return "{}"
+
+    def close(self):
+        self.closed = True
+
+
+@pytest.fixture(autouse=True)
+def reset_chats():
+    Chat.created = []
+
+
+def test_pool_reuses_chats_with_clean_conversations():
+    client = LlmClient(Chat, "system", "fake", "fake", size=3)
+
+    async def run():
+        await client.start()
+        await asyncio.gather(*(client.send(Message(f"prompt {i}")) for i in range(30)))
+        await client.close()
+
+    asyncio.run(run())
+    assert len(Chat.created) == 3
+    calls = [seen for chat in Chat.created for seen in chat.seen]
+    assert len(calls) == 30
+    # Every call saw only the system message, under a session id of its own
+    assert all(length == 1 for _, length in calls)
+    assert len({session_id for session_id, _ in calls}) == 30
+    assert all(chat.closed for chat in Chat.created)
+    assert client.stats()["calls"] == 30
+
+
+def test_failed_call_recycles_its_chat():
+    client = LlmClient(Chat, "system", "fake", "fake", size=2)
+
+    async def run():
+        await client.start()
+        with pytest.raises(RuntimeError):
+            await client.send(Message("fail"))
+        return await client.send(Message("ok"))
+
+    assert asyncio.run(run()) == "{}"
+    failed = [chat for chat in Chat.created if chat.closed]
+    assert len(failed) == 1 and len(Chat.created) == 3
+    assert client.stats()["errors"] == 1 and client.stats()["recycled"] == 1
+    assert client.stats()["idle"] == 2
+
+
+def test_chats_without_history_are_replaced_after_each_call():
+    class Stateless(Chat):
+        def __init__(self, session_id: str, system_message: str):
+            super().__init__(session_id, system_message)
+            del self.messages
+
+        async def send_message(self, message) -> str:
+            return "{}"
+
+    client = LlmClient(Stateless, "system", "fake", "fake", size=1)
+
+    async def run():
+        for _ in range(3):
+            await client.send(Message("prompt"))
+
+    asyncio.run(run())
+    assert len(Chat.created) == 4
+    assert client.stats()["recycled"] == 3
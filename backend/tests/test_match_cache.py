@@ -0,0 +1,75 @@
+import random
+
+from match_cache import MatchCache
+
+
+def _matches(reference, pool: dict, mentee: dict, top_k: int) -> list:
+    return [{"mentor_id": mentor_id, "match_score": score, "match_reasons": reasons}
+            for mentor_id, score, reasons in reference(list(pool.values()), mentee, top_k)]
+
+
+def test_entries_kept_after_mentor_changes_equal_a_recompute(profiles, reference):
+    rng = random.Random(1)
+    pool = {mentor["id"]: mentor for mentor in profiles(150, "mentor", seed=2, exotic=0.05)}
+    fresh = iter(profiles(500, "mentor", seed=3, exotic=0.05))
+    mentees = profiles(60, "mentee", seed=4, exotic=0.05)
+    cache = MatchCache()
+    kept = 0
+    for _ in range(40):
+        for i, mentee in enumerate(mentees):
+            top_k = 3 if i % 2 else 10
+            cached = cache.get(mentee["id"], None, top_k)
+            expected = _matches(reference, pool, mentee, top_k)
+            if cached is None:
+                cache.put(mentee, None, top_k, expected, cache.generation)
+            else:
+                assert cached == expected
+                kept += 1
+        change = rng.random()
+        if change < 0.3:
+            mentor_id = rng.choice(sorted(pool))
+            del pool[mentor_id]
+            cache.mentor_changed(mentor_id, None)
+        elif change < 0.7:
+            mentor_id = rng.choice(sorted(pool))
+            pool[mentor_id] = {**next(fresh), "id": mentor_id}
+            cache.mentor_changed(mentor_id, pool[mentor_id])
+        else:
+            mentor = next(fresh)
+            pool[mentor["id"]] = mentor
+            cache.mentor_changed(mentor["id"], mentor)
+    # Most entries are out of reach of a single mentor change
+    assert kept > len(mentees) * 40 // 2
+
+
+def test_put_of_a_result_computed_before_a_change_is_dropped(profiles, reference):
+    pool = {mentor["id"]: mentor for mentor in profiles(20, "mentor", seed=5)}
+    mentee = profiles(1, "mentee", seed=6)[0]
+    cache = MatchCache()
+    generation = cache.generation
+    mentor = profiles(1, "mentor", seed=7)[0]
+    cache.mentor_changed(mentor["id"], mentor)
+    cache.put(mentee, None, 5, _matches(reference, pool, mentee, 5), generation)
+    assert cache.get(mentee["id"], None, 5) is None
+
+
+def test_mentee_version_and_pool_reload(profiles, reference):
+    pool = {mentor["id"]: mentor for mentor in profiles(20, "mentor", seed=8)}
+    mentee = profiles(1, "mentee", seed=9)[0]
+    cache = MatchCache()
+    cache.put(mentee, "v1", 5, _matches(reference, pool, mentee, 5), cache.generation)
+    assert cache.get(mentee["id"], "v2", 5) is None
+    assert cache.get(mentee["id"], "v1", 5) is not None
+    cache.mentor_changed(None, None)
+    assert cache.get(mentee["id"], "v1", 5) is None
+
+
+def test_without_exact_rescoring_any_change_clears(profiles, reference):
+    pool = {mentor["id"]: mentor for mentor in profiles(20, "mentor", seed=10)}
+    mentees = profiles(5, "mentee", seed=11)
+    cache = MatchCache(exact_rescoring=False)
+    for mentee in mentees:
+        cache.put(mentee, None, 5, _matches(reference, pool, mentee, 5), cache.generation)
+    mentor = profiles(1, "mentor", seed=12)[0]
+    cache.mentor_changed(mentor["id"], mentor)
+    assert len(cache) == 0
@@ -0,0 +1,48 @@
+import asyncio
+
+import match_executor
+from ann import IVFIndex
+from match_executor import MatchExecutor, init_matrix_worker, worker_top_rows
+from matching import MATCH_THRESHOLD, MentorFeatureMatrix
+
+
+def test_worker_matrix_keeps_the_store_codes(profiles):
+    mentors = profiles(300, "mentor", seed=1)
+    matrix = MentorFeatureMatrix(mentors[:200])
+    index = IVFIndex(matrix, lists=8)
+    # Deltas hand out codes in change order and keep the codes of removed values
+    matrix = matrix.apply(mentors[200:], [mentor["id"] for mentor in mentors[:50]])
+    index = index.apply(matrix, list(range(50)) + list(range(200, len(matrix))))
+
+    init_matrix_worker(matrix, index.centroids, index.vocabularies)
+    assert match_executor._worker_ann.fits(match_executor._worker_matrix)
+    assert (match_executor._worker_ann.assignment == index.assignment).all()
+    for mentee in profiles(10, "mentee", seed=2):
+        expected = matrix.top_rows(mentee, 10, ann=index, ann_candidates=100)
+        assert worker_top_rows(mentee, 10, MATCH_THRESHOLD, None, 0.0, ann_candidates=100) == expected
+
+
+def test_worker_retrains_centroids_that_do_not_fit(profiles):
+    trained = MentorFeatureMatrix(profiles(200, "mentor", seed=3))
+    index = IVFIndex(trained, lists=8)
+    matrix = MentorFeatureMatrix(profiles(200, "mentor", seed=4))
+    assert not index.fits(matrix)
+    init_matrix_worker(matrix, index.centroids, index.vocabularies)
+    assert match_executor._worker_ann.fits(matrix)
+    assert match_executor._worker_ann.centroids is not index.centroids
+
+
+def test_process_workers_score_a_copy_of_the_matrix(profiles):
+    matrix = MentorFeatureMatrix(profiles(200, "mentor", seed=5)).apply(removals=["mentor-5-0"])
+    mentees = profiles(5, "mentee", seed=6)
+    executor = MatchExecutor(mode="process", workers=1)
+
+    async def run():
+        executor.configure(1, init_matrix_worker, (matrix,))
+        return [await executor.run(worker_top_rows, mentee, 10, MATCH_THRESHOLD, None, 0.0) for mentee in mentees]
+
+    try:
+        results = asyncio.run(run())
+    finally:
+        executor.shutdown()
+    assert results == [matrix.top_rows(mentee, 10) for mentee in mentees]
@@ -0,0 +1,139 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+
+pytest.importorskip("pymongo")
+
+from pymongo.errors import DuplicateKeyError  # noqa: E402
+
+import match_jobs  # noqa: E402
+from match_jobs import compact_matches, compute_all_matches, mentee_match_writes, run_periodically  # noqa: E402
+from matching import MentorFeatureMatrix  # noqa: E402
+from semantic import SemanticIndex  # noqa: E402
+from single_flight import LeaderLease  # noqa: E402
+from tests.mongo import Database  # noqa: E402
+
+
+def _db(*groups) -> Database:
+    db = Database()
+    db.user_profiles.docs = [{**profile, "_id": profile["id"]} for group in groups for profile in group]
+    return db
+
+
+def test_compute_all_matches_stores_each_mentees_top(profiles, reference):
+    mentors = profiles(200, "mentor", seed=1)
+    mentees = profiles(30, "mentee", seed=2)
+    db = _db(mentors, mentees)
+
+    summary = asyncio.run(compute_all_matches(db, top_n=5, workers=2, chunk_size=7, checkpoint_path=None))
+
+    assert summary["mentees"] == len(mentees)
+    assert summary["pairs_considered"] == len(mentees) * len(mentors)
+    # Pruned mentors are never scored
+    assert 0 < summary["pairs_scored"] < summary["pairs_considered"]
+    for mentee in mentees:
+        stored = sorted((row["match_score"], row["mentor_id"]) for row in db.mentorship_matches.docs
+                        if row["mentee_id"] == mentee["id"])
+        expected = sorted((score, mentor_id) for mentor_id, score, _ in reference(mentors, mentee, 5))
+        assert stored == expected
+
+
+def test_compute_all_matches_blends_in_semantic_similarity(profiles):
+    mentors = profiles(200, "mentor", seed=3)
+    mentees = profiles(20, "mentee", seed=4)
+    db = _db(mentors, mentees)
+    index = SemanticIndex()
+    index.fit(mentors)
+    matrix = MentorFeatureMatrix(mentors)
+    rows = index.rows(matrix.ids)
+
+    asyncio.run(compute_all_matches(db, top_n=5, workers=1, checkpoint_path=None,
+                                    semantic_index=index, semantic_weight=0.3))
+
+    for mentee in mentees:
+        stored = sorted((row["match_score"], row["mentor_id"]) for row in db.mentorship_matches.docs
+                        if row["mentee_id"] == mentee["id"])
+        top = matrix.top_matches(mentee, 5, semantic=index.similarity(mentee, rows), semantic_weight=0.3)
+        assert stored == sorted((score, mentor["id"]) for mentor, score, _ in top)
+    with pytest.raises(ValueError):
+        asyncio.run(compute_all_matches(db, checkpoint_path=None, semantic_weight=0.3))
+
+
+def test_periodic_job_runs_on_the_lease_holder_only(monkeypatch):
+    db = Database()
+    leases = [LeaderLease(db.job_leases, "match_job", lease_seconds=1.0) for _ in range(3)]
+    runs = []
+
+    async def compute_all_matches(db, **kwargs):
+        runs.append(tuple(i for i, lease in enumerate(leases) if lease.held))
+        return {}
+
+    monkeypatch.setattr(match_jobs, "compute_all_matches", compute_all_matches)
+
+    async def run():
+        jobs = [asyncio.create_task(run_periodically(db, 0.01, lease=lease)) for lease in leases]
+        await asyncio.sleep(0.2)
+        for job in jobs:
+            job.cancel()
+        await asyncio.gather(*jobs, return_exceptions=True)
+
+    asyncio.run(run())
+    assert len(runs) > 1
+    # Every run happened while exactly one worker, always the same, held the lease
+    assert len(set(runs)) == 1 and len(runs[0]) == 1
+    # Stopped workers give the lease up
+    assert not any(lease.held for lease in leases)
+    assert db.job_leases.docs == []
+
+
+def test_mentee_match_writes_upsert_pairs_and_drop_stale_pending_rows():
+    db = Database()
+    now = datetime.utcnow()
+
+    async def run():
+        await db.mentorship_matches.insert_many([
+            {"id": "accepted", "mentor_id": "a", "mentee_id": "m", "match_score": 0.9, "status": "accepted"},
+            {"id": "stale", "mentor_id": "b", "mentee_id": "m", "match_score": 0.8, "status": "pending"},
+            {"id": "with-session", "mentor_id": "c", "mentee_id": "m", "match_score": 0.7, "status": "pending"},
+            {"id": "other-mentee", "mentor_id": "b", "mentee_id": "n", "match_score": 0.8, "status": "pending"},
+            {"id": "kept", "mentor_id": "d", "mentee_id": "m", "match_score": 0.5, "status": "pending"},
+        ])
+        top = [("d", 0.75, ["reason"]), ("e", 0.6, [])]
+        await db.mentorship_matches.bulk_write(mentee_match_writes("m", top, now, keep_ids=["with-session"]))
+        # Writing the same top again changes nothing
+        await db.mentorship_matches.bulk_write(mentee_match_writes("m", top, now, keep_ids=["with-session"]))
+
+    asyncio.run(run())
+    rows = {(row["mentee_id"], row["mentor_id"]): row for row in db.mentorship_matches.docs}
+    assert len(rows) == len(db.mentorship_matches.docs)
+    assert sorted(rows) == [("m", "a"), ("m", "c"), ("m", "d"), ("m", "e"), ("n", "b")]
+    # Accepted matches out of the top are never removed
+    assert rows["m", "a"]["status"] == "accepted"
+    assert rows["m", "d"]["id"] == "kept"
+    assert (rows["m", "d"]["match_score"], rows["m", "d"]["match_reasons"]) == (0.75, ["reason"])
+    assert rows["m", "e"]["status"] == "pending" and rows["m", "e"]["created_at"] == now
+
+
+def test_compact_matches_keeps_the_most_advanced_row_of_each_pair():
+    db = Database()
+    old, new = datetime(2024, 1, 1), datetime(2024, 1, 1) + timedelta(days=1)
+
+    async def run():
+        await db.mentorship_matches.insert_many([
+            {"id": "p1", "mentor_id": "a", "mentee_id": "m", "status": "pending", "created_at": new},
+            {"id": "a1", "mentor_id": "a", "mentee_id": "m", "status": "accepted", "created_at": old},
+            {"id": "p2", "mentor_id": "b", "mentee_id": "m", "status": "pending", "created_at": old},
+            {"id": "p3", "mentor_id": "b", "mentee_id": "m", "status": "pending", "created_at": new},
+            {"id": "p4", "mentor_id": "c", "mentee_id": "m", "status": "pending", "created_at": old},
+        ])
+        await db.mentorship_sessions.insert_many([{"id": "s1", "match_id": "p1"}, {"id": "s2", "match_id": "p2"}])
+        summary = await compact_matches(db)
+        with pytest.raises(DuplicateKeyError):
+            await db.mentorship_matches.insert_one({"id": "dup", "mentor_id": "c", "mentee_id": "m"})
+        return summary
+
+    summary = asyncio.run(run())
+    assert summary == {"duplicate_pairs": 2, "rows_removed": 2, "sessions_repointed": 2, "unique_index": True}
+    assert sorted(row["id"] for row in db.mentorship_matches.docs) == ["a1", "p3", "p4"]
+    assert sorted(session["match_id"] for session in db.mentorship_sessions.docs) == ["a1", "p3"]
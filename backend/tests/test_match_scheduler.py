@@ -0,0 +1,78 @@
+import asyncio
+from datetime import datetime
+
+import pytest
+
+pytest.importorskip("pymongo")
+
+from feature_store import MentorFeatureStore  # noqa: E402
+from match_scheduler import IncrementalMatchScheduler  # noqa: E402
+from single_flight import LeaderLease  # noqa: E402
+from tests.mongo import Database  # noqa: E402
+
+
+def _setup(profiles):
+    db = Database()
+    mentors = profiles(100, "mentor", seed=1)
+    mentees = profiles(20, "mentee", seed=2)
+    db.user_profiles.docs = [{**profile, "_id": profile["id"]} for profile in mentors + mentees]
+    return db, MentorFeatureStore(db.user_profiles), mentees
+
+
+async def _edit(db, mentee_id: str, edited: dict):
+    fields = {key: value for key, value in edited.items() if key != "id"}
+    await db.user_profiles.update_one({"id": mentee_id}, {"$set": {**fields, "updated_at": datetime.utcnow()}})
+
+
+def _stored(db, mentee_id: str) -> list:
+    return sorted((row["match_score"], row["mentor_id"]) for row in db.mentorship_matches.docs
+                  if row["mentee_id"] == mentee_id)
+
+
+def _expected(store, reference, mentee: dict) -> list:
+    return sorted((score, mentor_id) for mentor_id, score, _ in reference(list(store.profiles.values()), mentee, 5))
+
+
+def test_mentees_refreshed_by_other_callers_are_recomputed(profiles, reference):
+    db, store, mentees = _setup(profiles)
+    scheduler = IncrementalMatchScheduler(db, store)
+    edited = {**profiles(1, "mentee", seed=3)[0], "id": mentees[0]["id"]}
+
+    async def run():
+        await store.load()
+        await scheduler.tick()
+        await _edit(db, edited["id"], edited)
+        # e.g. surface_new_mentor, which shares the server's MenteePool
+        await scheduler.mentees.refresh()
+        return await scheduler.tick()
+
+    report = asyncio.run(run())
+    assert report["mentees_processed"] == 1
+    assert _stored(db, edited["id"]) == _expected(store, reference, edited)
+
+
+def test_worker_taking_the_lease_over_recomputes_missed_mentees(profiles, reference):
+    db, store, mentees = _setup(profiles)
+    leader = LeaderLease(db.job_leases, "match_scheduler", lease_seconds=5.0)
+    scheduler = IncrementalMatchScheduler(db, store, interval_seconds=0.02,
+                                          lease=LeaderLease(db.job_leases, "match_scheduler", lease_seconds=5.0))
+    edited = {**profiles(1, "mentee", seed=4)[0], "id": mentees[0]["id"]}
+
+    async def run():
+        await store.load()
+        await scheduler.mentees.refresh()
+        assert await leader.hold()
+        job = asyncio.create_task(scheduler.run_forever())
+        await asyncio.sleep(0.1)
+        await _edit(db, edited["id"], edited)
+        await scheduler.mentees.refresh()
+        # The leader stops before its next tick
+        await leader.release()
+        await asyncio.sleep(0.1)
+        job.cancel()
+        await asyncio.gather(job, return_exceptions=True)
+
+    asyncio.run(run())
+    assert scheduler.totals["standby_ticks"] > 0
+    assert _stored(db, edited["id"]) == _expected(store, reference, edited)
+    assert db.job_leases.docs == []
@@ -0,0 +1,72 @@
+import random
+
+import pytest
+
+from matching import MATCH_THRESHOLD, MentorFeatureMatrix, calculate_match_score
+
+
+def _top(matrix: MentorFeatureMatrix, mentee: dict, limit: int, threshold: float = MATCH_THRESHOLD, **options):
+    return [(mentor["id"], score, reasons)
+            for mentor, score, reasons in matrix.top_matches(mentee, limit, threshold, **options)]
+
+
+@pytest.mark.parametrize("exotic", [0.0, 0.1])
+@pytest.mark.parametrize("prune", [True, False])
+def test_top_matches_equal_calculate_match_score(profiles, reference, exotic, prune):
+    mentors = profiles(400, "mentor", seed=1, exotic=exotic)
+    mentees = profiles(40, "mentee", seed=2, exotic=exotic)
+    matrix = MentorFeatureMatrix(mentors)
+    for mentee in mentees:
+        for limit in (1, 5, 500):
+            assert _top(matrix, mentee, limit, prune=prune, batch_size=64) == reference(mentors, mentee, limit)
+
+
+def test_scores_equal_calculate_match_score(profiles):
+    mentors = profiles(300, "mentor", seed=3, exotic=0.1)
+    matrix = MentorFeatureMatrix(mentors)
+    for mentee in profiles(20, "mentee", seed=4):
+        expected = [calculate_match_score(mentor, mentee)[0] for mentor in mentors]
+        assert matrix.score(mentee).tolist() == expected
+
+
+@pytest.mark.parametrize("threshold", [0.0, 0.4, 0.7])
+def test_thresholds(profiles, reference, threshold):
+    mentors = profiles(300, "mentor", seed=5)
+    matrix = MentorFeatureMatrix(mentors)
+    for mentee in profiles(20, "mentee", seed=6):
+        assert _top(matrix, mentee, 10, threshold) == reference(mentors, mentee, 10, threshold)
+
+
+def test_apply_equals_rebuild(profiles, reference):
+    rng = random.Random(7)
+    pool = {mentor["id"]: mentor for mentor in profiles(200, "mentor", seed=8, exotic=0.05)}
+    fresh = iter(profiles(400, "mentor", seed=9, exotic=0.05))
+    mentees = profiles(15, "mentee", seed=10)
+    matrix = MentorFeatureMatrix(list(pool.values()))
+    for _ in range(20):
+        upserts, removals = [], []
+        for mentor_id in rng.sample(sorted(pool), 5):
+            if rng.random() < 0.5:
+                removals.append(mentor_id)
+                del pool[mentor_id]
+            else:
+                edited = {**next(fresh), "id": mentor_id}
+                upserts.append(edited)
+                pool[mentor_id] = edited
+        for _ in range(rng.randint(0, 6)):
+            mentor = next(fresh)
+            upserts.append(mentor)
+            pool[mentor["id"]] = mentor
+        matrix = matrix.apply(upserts, removals)
+        assert len(matrix.row_of) == len(pool)
+        for mentee in mentees:
+            assert _top(matrix, mentee, 8) == reference(list(pool.values()), mentee, 8)
+
+
+def test_apply_leaves_original_unchanged(profiles, reference):
+    mentors = profiles(100, "mentor", seed=11)
+    mentee = profiles(1, "mentee", seed=12)[0]
+    matrix = MentorFeatureMatrix(mentors)
+    before = _top(matrix, mentee, 10)
+    matrix.apply(profiles(20, "mentor", seed=13), [mentor["id"] for mentor in mentors[:30]])
+    assert _top(matrix, mentee, 10) == before == reference(mentors, mentee, 10)
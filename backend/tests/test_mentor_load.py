@@ -0,0 +1,96 @@
+import asyncio
+
+import pytest
+
+pytest.importorskip("pymongo")
+
+from feature_store import MentorFeatureStore  # noqa: E402
+from mentor_load import LOAD_WEIGHTS, MentorLoadCounters  # noqa: E402
+from tests.mongo import Database  # noqa: E402
+
+
+def _counts(load: MentorLoadCounters) -> dict:
+    return {mentor_id: {status: count for status, count in counts.items() if count}
+            for mentor_id, counts in load.counts.items()}
+
+
+def _change(operation: str, object_id, **doc) -> dict:
+    return {"operationType": operation, "documentKey": {"_id": object_id}, "fullDocument": doc or None}
+
+
+def test_changes_move_counts_between_mentors_and_statuses():
+    load = MentorLoadCounters(Database())
+    load.apply_change("mentorship_matches", _change("insert", 1, mentor_id="a", status="pending"))
+    load.apply_change("mentorship_matches", _change("insert", 2, mentor_id="a", status="accepted"))
+    load.apply_change("mentorship_sessions", _change("insert", 1, mentor_id="a", status="scheduled"))
+    assert _counts(load) == {"a": {"pending": 1, "accepted": 1, "scheduled": 1}}
+    assert load.load("a") == LOAD_WEIGHTS["pending"] + LOAD_WEIGHTS["accepted"] + LOAD_WEIGHTS["scheduled"]
+    assert load.taken("a") == 1
+
+    load.apply_change("mentorship_matches", _change("update", 1, mentor_id="a", status="active"))
+    load.apply_change("mentorship_matches", _change("replace", 2, mentor_id="b", status="accepted"))
+    load.apply_change("mentorship_sessions", _change("update", 1, mentor_id="a", status="completed"))
+    assert _counts(load) == {"a": {"active": 1}, "b": {"accepted": 1}}
+    assert load.taken("a") == load.taken("b") == 1
+
+    load.apply_change("mentorship_matches", _change("delete", 1))
+    load.apply_change("mentorship_matches", _change("delete", 2))
+    assert load.counts == {}
+    assert load.load("a") == 0
+
+
+def test_penalty_grows_with_load_up_to_the_weight():
+    load = MentorLoadCounters(Database())
+    assert load.penalty({"id": "a", "capacity": 2}, 0.2) == 0.0
+    load.apply_change("mentorship_matches", _change("insert", 1, mentor_id="a", status="accepted"))
+    assert load.penalty({"id": "a", "capacity": 2}, 0.2) == pytest.approx(0.1)
+    load.apply_change("mentorship_matches", _change("insert", 2, mentor_id="a", status="active"))
+    load.apply_change("mentorship_matches", _change("insert", 3, mentor_id="a", status="active"))
+    assert load.penalty({"id": "a", "capacity": 2}, 0.2) == 0.2
+    # A mentor taking nobody ranks as if full
+    assert load.penalty({"id": "b", "capacity": 0}, 0.2) == 0.2
+
+
+def test_counters_are_recounted_without_change_streams():
+    db = Database()
+    db.mentorship_matches.docs = [
+        {"_id": 1, "mentor_id": "a", "status": "pending"},
+        {"_id": 2, "mentor_id": "a", "status": "declined"},
+        {"_id": 3, "mentor_id": "b", "status": "active"},
+    ]
+    db.mentorship_sessions.docs = [{"_id": 1, "mentor_id": "b", "status": "scheduled"}]
+    load = MentorLoadCounters(db, poll_interval=0.01)
+
+    async def run():
+        await load.start()
+        assert load.mode == "polling"
+        assert _counts(load) == {"a": {"pending": 1}, "b": {"active": 1, "scheduled": 1}}
+        db.mentorship_matches.docs[0]["status"] = "accepted"
+        db.mentorship_sessions.docs.clear()
+        await asyncio.sleep(0.1)
+        await load.stop()
+
+    asyncio.run(run())
+    assert _counts(load) == {"a": {"accepted": 1}, "b": {"active": 1}}
+
+
+def test_store_ranks_by_score_less_the_penalty(profiles, reference):
+    db = Database()
+    db.user_profiles.docs = [{**mentor, "_id": mentor["id"]} for mentor in profiles(300, "mentor", seed=1)]
+    store = MentorFeatureStore(db.user_profiles)
+    mentees = profiles(10, "mentee", seed=2)
+
+    def penalty(mentor: dict) -> float:
+        return 0.05 * (int(mentor["id"].split("-")[-1]) % 5)
+
+    async def run():
+        await store.load()
+        return [await store.top_matches(mentee, 5, penalty=penalty) for mentee in mentees]
+
+    results = asyncio.run(run())
+    pool = list(store.profiles.values())
+    for mentee, top in zip(mentees, results):
+        ranked = sorted(reference(pool, mentee, len(pool)),
+                        key=lambda item: item[1] - penalty(store.profiles[item[0]]), reverse=True)
+        # Scores are returned unpenalized
+        assert [(mentor["id"], score, reasons) for mentor, score, reasons in top] == ranked[:5]
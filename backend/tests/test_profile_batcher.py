@@ -0,0 +1,125 @@
+import asyncio
+import json
+
+from profile_batcher import ProfileAnalysisBatcher, parse_batch_analysis
+
+
+def _analysis(name: str) -> dict:
+    return {"communication_style": name, "mentorship_readiness": 7}
+
+
+def _describe(profile: dict) -> str:
+    return profile["name"]
+
+
+class Model:
+    """Fake model answering a batched prompt with the analyses of its profiles, minus ``skip``"""
+
+    def __init__(self, skip=(), fail: bool = False):
+        self.skip = set(skip)
+        self.fail = fail
+        self.prompts = []
+        self.single = []
+
+    async def send(self, prompt: str) -> str:
+        self.prompts.append(prompt)
+        if self.fail:
+            raise RuntimeError("model down")
+        names = [block.split("\n")[1] for block in prompt.split("### Profile ")[1:]]
+        return json.dumps({str(i): _analysis(f"batched {name}") for i, name in enumerate(names, 1)
+                           if name not in self.skip})
+
+    async def analyze_one(self, profile: dict) -> dict:
+        self.single.append(profile["name"])
+        if profile["name"] == "broken":
+            raise ValueError("bad profile")
+        return _analysis(f"alone {profile['name']}")
+
+
+def _profiles(*names: str) -> list:
+    return [{"id": name, "name": name} for name in names]
+
+
+def test_parse_batch_analysis_keeps_complete_analyses_only():
+    reply = json.dumps({"1": _analysis("a"), "2": {"communication_style": "b"}, "3": "c", "9": _analysis("d")})
+    assert parse_batch_analysis(reply, 3) == {1: _analysis("a")}
+    assert parse_batch_analysis(json.dumps([_analysis("a"), _analysis("b")]), 2) == {1: _analysis("a"), 2: _analysis("b")}
+    assert parse_batch_analysis("not json", 2) == {}
+    assert parse_batch_analysis(json.dumps("text"), 2) == {}
+
+
+def test_requests_within_the_window_share_one_call():
+    model = Model()
+    batcher = ProfileAnalysisBatcher(model.send, _describe, model.analyze_one, max_batch=10, window=0.02)
+
+    async def run():
+        return await asyncio.gather(*(batcher.analyze(profile) for profile in _profiles("a", "b", "c")))
+
+    assert asyncio.run(run()) == [_analysis("batched a"), _analysis("batched b"), _analysis("batched c")]
+    assert len(model.prompts) == 1 and model.single == []
+    assert batcher.stats()["batches"] == 1 and batcher.stats()["profiles_from_batches"] == 3
+
+
+def test_a_full_batch_is_sent_without_waiting_for_the_window():
+    model = Model()
+    batcher = ProfileAnalysisBatcher(model.send, _describe, model.analyze_one, max_batch=2, window=60)
+
+    async def run():
+        return await asyncio.wait_for(
+            asyncio.gather(*(batcher.analyze(profile) for profile in _profiles("a", "b", "c", "d"))), 1)
+
+    assert asyncio.run(run()) == [_analysis(f"batched {name}") for name in "abcd"]
+    assert len(model.prompts) == 2 and batcher.stats()["waiting"] == 0
+
+
+def test_profiles_missing_from_the_reply_are_analyzed_alone():
+    model = Model(skip={"b"})
+    batcher = ProfileAnalysisBatcher(model.send, _describe, model.analyze_one, max_batch=3, window=0.02)
+
+    async def run():
+        return await asyncio.gather(*(batcher.analyze(profile) for profile in _profiles("a", "b", "c")))
+
+    assert asyncio.run(run()) == [_analysis("batched a"), _analysis("alone b"), _analysis("batched c")]
+    assert model.single == ["b"] and batcher.stats()["fallbacks"] == 1
+
+
+def test_a_failed_batch_falls_back_and_errors_reach_their_caller():
+    model = Model(fail=True)
+    batcher = ProfileAnalysisBatcher(model.send, _describe, model.analyze_one, max_batch=3, window=0.02)
+
+    async def run():
+        return await asyncio.gather(*(batcher.analyze(profile) for profile in _profiles("a", "broken", "c")),
+                                    return_exceptions=True)
+
+    a, broken, c = asyncio.run(run())
+    assert (a, c) == (_analysis("alone a"), _analysis("alone c"))
+    assert isinstance(broken, ValueError)
+    assert sorted(model.single) == ["a", "broken", "c"] and batcher.stats()["fallbacks"] == 3
+
+
+def test_cached_analyses_skip_the_queue_and_batched_ones_are_stored():
+    model = Model()
+    cache = {"a": _analysis("cached a")}
+
+    async def lookup(profile: dict):
+        return cache.get(profile["id"])
+
+    async def store(profile: dict, analysis: dict):
+        cache[profile["id"]] = analysis
+
+    batcher = ProfileAnalysisBatcher(model.send, _describe, model.analyze_one, max_batch=10, window=0.02,
+                                     lookup=lookup, store=store)
+
+    async def run():
+        return await asyncio.gather(*(batcher.analyze(profile) for profile in _profiles("a", "b", "c")))
+
+    assert asyncio.run(run()) == [_analysis("cached a"), _analysis("batched b"), _analysis("batched c")]
+    assert "### Profile 3" not in model.prompts[0]
+    assert cache["b"] == _analysis("batched b") and batcher.stats()["cache_hits"] == 1
+
+
+def test_batch_size_one_analyzes_each_profile_alone():
+    model = Model()
+    batcher = ProfileAnalysisBatcher(model.send, _describe, model.analyze_one, max_batch=1)
+    assert asyncio.run(batcher.analyze(_profiles("a")[0])) == _analysis("alone a")
+    assert model.prompts == [] and batcher.stats()["batches"] == 0
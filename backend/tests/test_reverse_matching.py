@@ -0,0 +1,59 @@
+import asyncio
+import random
+
+import numpy as np
+import pytest
+
+pytest.importorskip("pymongo")
+
+from matching import match_score  # noqa: E402
+from reverse_matching import MenteeFeatureMatrix, update_mentor_matches  # noqa: E402
+from tests.mongo import Database  # noqa: E402
+
+
+def _expected(pool: dict, mentor: dict, matrix: MenteeFeatureMatrix) -> np.ndarray:
+    """Scores of a full recompute, laid out in the rows of the matrix"""
+    expected = np.full(len(matrix.ids), -np.inf)
+    for mentee_id, mentee in pool.items():
+        expected[matrix.row_of[mentee_id]] = match_score(mentor, mentee)
+    return expected
+
+
+def test_scores_equal_match_score(profiles):
+    mentees = profiles(300, "mentee", seed=1, exotic=0.05)
+    pool = {mentee["id"]: mentee for mentee in mentees}
+    matrix = MenteeFeatureMatrix(mentees)
+    for mentor in profiles(30, "mentor", seed=2, exotic=0.1):
+        assert matrix.score(mentor).tolist() == _expected(pool, mentor, matrix).tolist()
+
+
+def test_upserts_and_removals_equal_a_full_recompute(profiles):
+    rng = random.Random(3)
+    pool = {mentee["id"]: mentee for mentee in profiles(200, "mentee", seed=4, exotic=0.05)}
+    fresh = iter(profiles(1000, "mentee", seed=5, exotic=0.05))
+    mentors = profiles(10, "mentor", seed=6)
+    matrix = MenteeFeatureMatrix(list(pool.values()))
+    for _ in range(15):
+        for mentee_id in rng.sample(sorted(pool), 20):
+            if rng.random() < 0.5:
+                del pool[mentee_id]
+                matrix.remove(mentee_id)
+            else:
+                pool[mentee_id] = {**next(fresh), "id": mentee_id}
+                matrix.upsert(pool[mentee_id])
+        for _ in range(rng.randint(0, 20)):
+            mentee = next(fresh)
+            pool[mentee["id"]] = mentee
+            matrix.upsert(mentee)
+        assert len(matrix) == len(pool)
+        for mentor in mentors:
+            assert matrix.score(mentor).tolist() == _expected(pool, mentor, matrix).tolist()
+
+
+def test_update_mentor_matches_refuses_a_semantic_weight(profiles):
+    db = Database()
+    matrix = MenteeFeatureMatrix(profiles(20, "mentee", seed=7))
+    mentor = profiles(1, "mentor", seed=8)[0]
+    with pytest.raises(ValueError):
+        asyncio.run(update_mentor_matches(db, mentor, matrix, semantic_weight=0.3))
+    assert db.mentorship_matches.docs == []
@@ -0,0 +1,49 @@
+import asyncio
+import random
+
+import pytest
+
+from matching import MentorFeatureMatrix
+from sharding import ShardedMatcher
+
+
+def _single(pool: dict, mentee: dict, limit: int) -> list:
+    matrix = MentorFeatureMatrix(list(pool.values()))
+    return [(score, matrix.ids[row]) for score, row in matrix.top_rows(mentee, limit)]
+
+
+@pytest.mark.parametrize("shards", [1, 3])
+def test_sharded_equals_single_pool(profiles, shards):
+    rng = random.Random(shards)
+    pool = {mentor["id"]: mentor for mentor in profiles(300, "mentor", seed=1, exotic=0.05)}
+    fresh = iter(profiles(200, "mentor", seed=2, exotic=0.05))
+    mentees = profiles(15, "mentee", seed=3)
+
+    async def check():
+        for mentee in mentees:
+            for limit in (1, 5, 20):
+                assert await matcher.top_rows(mentee, limit) == _single(pool, mentee, limit)
+
+    async def run():
+        matcher.mentor_changed(None, None)
+        await check()
+        for _ in range(5):
+            # Edits may move a mentor to another industry and so to another shard
+            for mentor_id in rng.sample(sorted(pool), 10):
+                if rng.random() < 0.5:
+                    del pool[mentor_id]
+                    matcher.mentor_changed(mentor_id, None)
+                else:
+                    pool[mentor_id] = {**next(fresh), "id": mentor_id}
+                    matcher.mentor_changed(mentor_id, pool[mentor_id])
+            for _ in range(10):
+                mentor = next(fresh)
+                pool[mentor["id"]] = mentor
+                matcher.mentor_changed(mentor["id"], mentor)
+            await check()
+
+    matcher = ShardedMatcher(shards, lambda: pool)
+    try:
+        asyncio.run(run())
+    finally:
+        matcher.shutdown()
@@ -0,0 +1,94 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+
+pytest.importorskip("pymongo")
+
+from single_flight import SingleFlight  # noqa: E402
+from tests.mongo import Database  # noqa: E402
+
+
+def test_concurrent_calls_for_a_key_run_once():
+    flight = SingleFlight()
+    calls = []
+
+    async def compute(key: str):
+        calls.append(key)
+        await asyncio.sleep(0.01)
+        return key.upper()
+
+    async def run():
+        return await asyncio.gather(*(flight.run(key, lambda key=key: compute(key)) for key in ["a"] * 5 + ["b"] * 3))
+
+    assert asyncio.run(run()) == ["A"] * 5 + ["B"] * 3
+    assert sorted(calls) == ["a", "b"]
+    assert flight.stats()["shared"] == 6 and flight.stats()["in_flight"] == 0
+
+
+def test_cancelled_caller_leaves_the_call_running_for_the_others():
+    flight = SingleFlight()
+
+    async def compute():
+        await asyncio.sleep(0.02)
+        return "done"
+
+    async def run():
+        first = asyncio.create_task(flight.run("key", compute))
+        second = asyncio.create_task(flight.run("key", compute))
+        await asyncio.sleep(0.005)
+        first.cancel()
+        return await second, first.cancelled()
+
+    assert asyncio.run(run()) == ("done", True)
+
+
+def test_errors_reach_every_caller():
+    flight = SingleFlight(Database().ai_leases)
+
+    async def fail():
+        await asyncio.sleep(0.01)
+        raise ValueError("model error")
+
+    async def run():
+        return await asyncio.gather(flight.run("key", fail), flight.run("key", fail), return_exceptions=True)
+
+    results = asyncio.run(run())
+    assert [type(result) for result in results] == [ValueError, ValueError]
+    assert flight.collection.docs == []
+
+
+def test_workers_sharing_a_lease_compute_once():
+    db = Database()
+    workers = [SingleFlight(db.ai_leases, poll_interval=0.005) for _ in range(3)]
+    stored = {}
+    calls = []
+
+    async def check_then_compute():
+        if "insights" in stored:
+            return stored["insights"]
+        calls.append(1)
+        await asyncio.sleep(0.02)
+        stored["insights"] = "computed"
+        return stored["insights"]
+
+    async def run():
+        return await asyncio.gather(*(worker.run("insights:u", check_then_compute) for worker in workers))
+
+    assert asyncio.run(run()) == ["computed"] * 3
+    assert len(calls) == 1
+    assert sum(worker.lease_waits for worker in workers) == 2
+    assert db.ai_leases.docs == []
+
+
+def test_expired_lease_is_taken_over():
+    db = Database()
+    flight = SingleFlight(db.ai_leases, poll_interval=0.005)
+
+    async def run():
+        await db.ai_leases.insert_one({"_id": "key", "token": "crashed", "owner": "gone",
+                                       "expires_at": datetime.utcnow() - timedelta(seconds=1)})
+        return await asyncio.wait_for(flight.run("key", lambda: asyncio.sleep(0, "ran")), 1)
+
+    assert asyncio.run(run()) == "ran"
+    assert flight.lease_waits == 0 and db.ai_leases.docs == []
@@ -0,0 +1,90 @@
+import asyncio
+
+import pytest
+
+from matching import MentorFeatureMatrix
+from semantic import SemanticIndex
+from snapshot import FeatureSnapshots
+
+
+def _top(matrix: MentorFeatureMatrix, mentee: dict, limit: int) -> list:
+    return [(mentor["id"], score, reasons) for mentor, score, reasons in matrix.top_matches(mentee, limit)]
+
+
+def test_save_load_roundtrip(profiles, reference, tmp_path):
+    mentors = profiles(200, "mentor", seed=14, exotic=0.05)
+    matrix = MentorFeatureMatrix(mentors).apply(removals=[mentors[0]["id"]])
+    matrix.save(tmp_path)
+    loaded = MentorFeatureMatrix.load(tmp_path)
+    for mentee in profiles(10, "mentee", seed=15):
+        assert _top(loaded, mentee, 10) == reference(mentors[1:], mentee, 10)
+
+
+def test_published_versions_load_with_the_semantic_index(profiles, tmp_path):
+    mentors = profiles(150, "mentor", seed=1)
+    mentees = profiles(10, "mentee", seed=2)
+    index = SemanticIndex()
+    index.fit(mentors)
+    snapshots = FeatureSnapshots(tmp_path, keep=2)
+    assert snapshots.current() is None
+
+    versions = [snapshots.publish(MentorFeatureMatrix(mentors[:100 + 10 * i]), index.get_state()) for i in range(4)]
+
+    assert versions == [1, 2, 3, 4] and snapshots.current() == 4
+    # Only the newest ``keep`` versions stay on disk
+    assert sorted(path.name for path in tmp_path.glob("v*")) == ["v000003", "v000004"]
+    matrix, semantic = snapshots.load(4)
+    loaded = SemanticIndex()
+    loaded.set_state(**semantic)
+    expected = MentorFeatureMatrix(mentors[:130])
+    rows = index.rows(expected.ids)
+    for mentee in mentees:
+        assert _top(matrix, mentee, 10) == _top(expected, mentee, 10)
+        assert loaded.similarity(mentee, rows).tolist() == index.similarity(mentee, rows).tolist()
+
+
+def test_one_publisher_per_directory(tmp_path):
+    first, second = FeatureSnapshots(tmp_path), FeatureSnapshots(tmp_path)
+    assert first.acquire_leader()
+    assert first.acquire_leader()
+    assert not second.acquire_leader()
+
+
+def test_followers_serve_the_published_pool(profiles, tmp_path):
+    pytest.importorskip("pymongo")
+    from feature_store import MentorFeatureStore
+    from tests.mongo import Database
+
+    db = Database()
+    db.user_profiles.docs = [{**mentor, "_id": mentor["id"]} for mentor in profiles(200, "mentor", seed=3)]
+    mentees = profiles(10, "mentee", seed=4)
+    options = {"poll_interval": 0.01, "snapshot_interval": 0.01}
+    leader = MentorFeatureStore(db.user_profiles, snapshots=FeatureSnapshots(tmp_path), **options)
+    follower = MentorFeatureStore(db.user_profiles, snapshots=FeatureSnapshots(tmp_path), **options)
+    heard = []
+    follower.listeners.append(lambda mentor_id, mentor: heard.append(mentor_id))
+    added = {**profiles(1, "mentor", seed=5)[0], "_id": "added"}
+
+    async def top(store) -> list:
+        return [[(mentor["id"], score) for mentor, score, _ in await store.top_matches(mentee, 10)]
+                for mentee in mentees]
+
+    async def run():
+        await leader.start()
+        await follower.start()
+        assert follower.snapshot_version == leader.snapshot_version is not None
+        assert await top(follower) == await top(leader)
+        await db.user_profiles.insert_one(added)
+        for _ in range(500):
+            if added["id"] in follower.profiles:
+                break
+            await asyncio.sleep(0.01)
+        assert follower.snapshot_version == leader.snapshot_version
+        assert added["id"] in follower.profiles
+        assert await top(follower) == await top(leader)
+        await leader.stop()
+        await follower.stop()
+
+    asyncio.run(run())
+    assert leader.publishing and not follower.publishing
+    assert heard == [None, added["id"]]
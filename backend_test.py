@@ -26,6 +26,17 @@ class MentorMatchAPITester:
             print(f"❌ {name} - FAILED {details}")
         return success
 
+    def wait_for_analysis(self, profile_id, timeout=60):
+        """Poll the background AI analysis of a profile until it is no longer pending"""
+        deadline = time.time() + timeout
+        while True:
+            response = requests.get(f"{self.api_url}/profiles/{profile_id}/analysis", timeout=10)
+            response.raise_for_status()
+            analysis = response.json()
+            if analysis.get('status') != 'pending' or time.time() > deadline:
+                return analysis
+            time.sleep(1)
+
     def test_api_root(self):
         """Test API root endpoint"""
         try:
@@ -61,8 +72,12 @@ class MentorMatchAPITester:
             if success:
                 profile = response.json()
                 self.created_profiles.append(profile)
-                has_ai_analysis = profile.get('ai_analysis') is not None
-                details = f"Status: {response.status_code} | Profile ID: {profile.get('id')} | AI Analysis: {'Yes' if has_ai_analysis else 'No'}"
+                # The AI analysis is filled in in the background after the profile is created
+                analysis = self.wait_for_analysis(profile['id'])
+                success = analysis.get('status') == 'complete'
+                profile['ai_analysis'] = analysis.get('ai_analysis')
+                has_ai_analysis = bool(profile['ai_analysis'])
+                details = f"Status: {response.status_code} | Profile ID: {profile.get('id')} | Analysis: {analysis.get('status')} | AI Analysis: {'Yes' if has_ai_analysis else 'No'}"
                 
                 # Check AI analysis fields
                 if has_ai_analysis:
@@ -102,8 +117,11 @@ class MentorMatchAPITester:
             if success:
                 profile = response.json()
                 self.created_profiles.append(profile)
-                has_ai_analysis = profile.get('ai_analysis') is not None
-                details = f"Status: {response.status_code} | Profile ID: {profile.get('id')} | AI Analysis: {'Yes' if has_ai_analysis else 'No'}"
+                analysis = self.wait_for_analysis(profile['id'])
+                success = analysis.get('status') == 'complete'
+                profile['ai_analysis'] = analysis.get('ai_analysis')
+                has_ai_analysis = bool(profile['ai_analysis'])
+                details = f"Status: {response.status_code} | Profile ID: {profile.get('id')} | Analysis: {analysis.get('status')} | AI Analysis: {'Yes' if has_ai_analysis else 'No'}"
             else:
                 details = f"Status: {response.status_code} | Error: {response.text}"
                 
@@ -448,6 +448,28 @@ const Dashboard = () => {
     fetchDashboardData();
   }, [userId]);
 
+  const analysisPending = dashboardData?.profile?.analysis_status === 'pending';
+
+  // A new profile's AI analysis completes in the background; poll until it is ready
+  useEffect(() => {
+    if (!analysisPending) return;
+    const timer = setInterval(async () => {
+      try {
+        const response = await axios.get(`${API}/profiles/${userId}/analysis`);
+        const { status, ai_analysis, communication_style } = response.data;
+        if (status !== 'pending') {
+          setDashboardData(data => ({
+            ...data,
+            profile: { ...data.profile, analysis_status: status, ai_analysis, communication_style }
+          }));
+        }
+      } catch (error) {
+        console.error('Error fetching profile analysis:', error);
+      }
+    }, 2000);
+    return () => clearInterval(timer);
+  }, [analysisPending, userId]);
+
   const fetchDashboardData = async () => {
     try {
       const response = await axios.get(`${API}/dashboard/${userId}`);
@@ -488,6 +510,11 @@ const Dashboard = () => {
           {profile.current_position} • {profile.industry} • {profile.experience_years} years experience
         </p>
         <div className="flex flex-wrap gap-2">
+          {analysisPending && (
+            <span className="bg-white/20 px-3 py-1 rounded-full text-sm">
+              Analyzing your profile...
+            </span>
+          )}
           {profile.ai_analysis?.skill_strengths?.map((skill, index) => (
             <span key={index} className="bg-white/20 px-3 py-1 rounded-full text-sm">
               {skill}